@@ -0,0 +1,285 @@
+"""
+Benchmarks of the board, game, environment, and renderer hot paths.
+
+Every benchmark uses fixed seeds and is warmed up before it is timed, so the
+results can be compared between commits:
+
+    python Benchmarks/benchmark.py --output before.json
+    python Benchmarks/benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+# The game modules import each other by module name, so both the repository root
+# and the Game directory need to be on the path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GAME_DIR = os.path.join(ROOT, "Game")
+sys.path[:0] = [ROOT, GAME_DIR]
+
+import numpy as np
+from game import Game
+from constants import NO_OWNER
+
+SEED = 1234
+
+
+def seed_everything(seed=SEED):
+    """
+    Seeds every random number generator the game uses.
+
+    :param seed: The seed
+    :return: None
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def _missing_dependency_errors():
+    """
+    Gets the errors raised when a benchmark cannot be set up on this machine:
+    a missing optional module, missing assets, or no display for pygame.
+
+    :return: Tuple of exception types
+    """
+    errors = [ImportError, FileNotFoundError]
+    try:
+        import pygame
+        errors.append(pygame.error)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+class BenchmarkSkipped(Exception):
+    """
+    Raised when a benchmark cannot be set up because of a missing dependency.
+    """
+
+
+class Benchmark:
+    def __init__(self, name, setup, run):
+        """
+        A benchmark of a single operation.
+
+        :param name: Name of the benchmark in the results
+        :param setup: Function called once (after seeding) that returns the state passed to run
+        :param run: Function timed on the state
+        """
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+    def measure(self, warmup, repeats, number):
+        """
+        Times the benchmark: runs it warmup times, then times repeats batches
+        of number calls each.
+
+        :param warmup: Number of untimed calls
+        :param repeats: Number of timed batches
+        :param number: Number of calls in each batch
+        :return: Dict of the results
+        """
+        seed_everything()
+        try:
+            state = self.setup()
+        except _missing_dependency_errors() as error:
+            raise BenchmarkSkipped(f"{type(error).__name__}: {error}") from error
+        run = self.run
+
+        for _ in range(warmup):
+            run(state)
+
+        batch_times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(number):
+                run(state)
+            batch_times.append((time.perf_counter() - start) / number)
+
+        median = statistics.median(batch_times)
+        return {
+            "calls": repeats * number,
+            "best_us": min(batch_times) * 1e6,
+            "median_us": median * 1e6,
+            "stdev_us": (statistics.stdev(batch_times) if repeats > 1 else 0.0) * 1e6,
+            "per_second": 1.0 / median if median > 0 else float("inf")
+        }
+
+
+# --- Benchmarks --- #
+
+def _new_game():
+    game = Game()
+    game.reset()
+    return game
+
+
+def _game_after_setup():
+    game = _new_game()
+    game.run_starting_positions()
+    return game
+
+
+def _new_environment():
+    from Environment.environment import CatanEnvironment
+    environment = CatanEnvironment()
+    environment.reset(seed=SEED)
+    return environment
+
+
+def _environment_step(environment):
+    # A random legal action, chosen with the environment's seeded generator
+    action = environment.np_random.choice(np.flatnonzero(environment.action_mask))
+    _, _, terminated, truncated, _ = environment.step(action)
+    if terminated or truncated:
+        environment.reset()
+
+
+def _environment_get_obs(environment):
+    # Stamp an edge as changed so the observation has something to re-encode. Placing a
+    # road would also time the board's legality, longest road, and Zobrist updates.
+    board = environment.game.board
+    board.version += 1
+    board.edge_version[0] = board.version
+    environment._get_obs()
+
+
+def _new_renderer():
+    # The renderer loads its assets relative to the Game directory and needs a
+    # display, so it draws into a dummy one
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from renderer import Renderer
+
+    game = _game_after_setup()
+    cwd = os.getcwd()
+    os.chdir(GAME_DIR)
+    try:
+        renderer = Renderer(game)
+        renderer.reset()
+    finally:
+        os.chdir(cwd)
+    return renderer
+
+
+def _renderer_render(renderer):
+    # Stamp a settlement and a road as changed, so the frame has pieces to redraw
+    board = renderer.game.board
+    board.version += 1
+    board.node_version[np.argmax(board.node_owner != NO_OWNER)] = board.version
+    board.edge_version[np.argmax(board.edge_owner != NO_OWNER)] = board.version
+    renderer.render()
+
+
+BENCHMARKS = [
+    Benchmark("board.reset", lambda: _new_game().board, lambda board: board.reset()),
+    Benchmark("board.get_all_legal_nodes", lambda: _game_after_setup().board,
+              lambda board: board.get_all_legal_nodes()),
+    Benchmark("game.reset", _new_game, lambda game: game.reset()),
+    Benchmark("environment.reset", _new_environment, lambda environment: environment.reset()),
+    Benchmark("environment.step", _new_environment, _environment_step),
+    Benchmark("environment.get_obs", _new_environment, _environment_get_obs),
+    Benchmark("renderer.render", _new_renderer, _renderer_render)
+]
+
+
+def run_benchmarks(names=None, warmup=100, repeats=7, number=200):
+    """
+    Runs the benchmarks. A benchmark that cannot be set up because of a
+    missing dependency (for example the renderer without pygame) is
+    reported as skipped with the reason. Any other error is raised.
+
+    :param names: Names of the benchmarks to run (None for all)
+    :param warmup: Number of untimed calls before timing
+    :param repeats: Number of timed batches
+    :param number: Number of calls in each batch
+    :return: Dict of the results, keyed by benchmark name
+    """
+    results = {}
+    for benchmark in BENCHMARKS:
+        if names and benchmark.name not in names:
+            continue
+        try:
+            results[benchmark.name] = benchmark.measure(warmup, repeats, number)
+        except BenchmarkSkipped as skipped:
+            results[benchmark.name] = {"skipped": str(skipped)}
+    return results
+
+
+def get_metadata():
+    """
+    Gets what the results were measured on, so results from different
+    commits and machines can be told apart.
+
+    :return: Dict of the metadata
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "seed": SEED
+    }
+
+
+def print_results(results, baseline=None):
+    """
+    Prints the results as a table, with the speedup over the baseline if given.
+
+    :param results: Results from run_benchmarks
+    :param baseline: Results of an earlier run to compare against
+    :return: None
+    """
+    print(f"{'benchmark':<28}{'median us':>12}{'best us':>12}{'calls/s':>14}{'speedup':>10}")
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:<28}  skipped ({result['skipped']})")
+            continue
+
+        speedup = ""
+        previous = (baseline or {}).get(name, {})
+        if "median_us" in previous and result["median_us"] > 0:
+            speedup = f"{previous['median_us'] / result['median_us']:.2f}x"
+        print(f"{name:<28}{result['median_us']:>12.2f}{result['best_us']:>12.2f}"
+              f"{result['per_second']:>14.0f}{speedup:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Catan hot paths")
+    parser.add_argument("names", nargs="*", help="Benchmarks to run (default: all)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of earlier results to compare against")
+    parser.add_argument("--warmup", type=int, default=100, help="Untimed calls before timing")
+    parser.add_argument("--repeats", type=int, default=7, help="Timed batches")
+    parser.add_argument("--number", type=int, default=200, help="Calls in each batch")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names, args.warmup, args.repeats, args.number)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"metadata": get_metadata(), "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
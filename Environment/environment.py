@@ -1,27 +1,54 @@
+import random
+import time
 import gymnasium as gym
 import numpy as np
 from Game.game import Game
 from Game.renderer import Renderer
-from constants import TileType
+from Game.profiling import Profiler, ENVIRONMENT_PHASES, RENDERER_PHASES
+from Environment.observations import (categorical_observation_space, graph_observation_space, graph_static_obs,
+                                      TILE_RESOURCE, TILE_DICE, TILE_ROBBER, NODE_OWNER, NODE_LEVEL)
+from constants import (ActionType, TileType, NO_OWNER, SETTLEMENT, NUM_PLAYERS, NUM_TILES, NUM_SETUP_STEPS,
+                       ROAD_COST, SETTLEMENT_COST, CITY_COST, VICTORY_POINTS_TO_WIN, SETTLEMENT_ACTION_OFFSET,
+                       ROAD_ACTION_OFFSET, CITY_ACTION_OFFSET, END_TURN_ACTION, NUM_ACTIONS)
 
 class CatanEnvironment(gym.Env):
     """
     A Gymnasium environment for the game Catan
+
+    Actions use the flat action layout from constants (settlement per node,
+    road per edge, city per node, end turn), and follow the same rules as
+    VectorCatanEnv: ending the turn rolls the dice for the next player, and a
+    7 moves the robber to a random tile. Illegal actions are ignored, so the
+    action mask in the info should be used.
     """
+    metadata = {"render_modes": ["human", "rgb_array"]}
 
-    def __init__(self, render_mode=None):
+    def __init__(self, render_mode=None, max_turns=500, obs_mode="float"):
         """
         Initialize the Catan environment
 
-        :param render_mode: Rendering mode
+        :param render_mode: Rendering mode ("human", "rgb_array", or None)
+        :param max_turns: Number of turns after which the episode is truncated
+        :param obs_mode: "float" for one-hot float32 observations, "categorical"
+            for int8 indices (see Environment.observations, which can decode them),
+            "graph" for the float observations as the feature matrices of a graph,
+            plus its static edge_index arrays (see Environment.observations)
         """
+        assert obs_mode in ("float", "categorical", "graph")
+        self.obs_mode = obs_mode
+
         # Internal state
         self.game = Game()
+        self._board_rng = random.Random() # Shuffles the board, seeded by reset
 
         # Initialize rendering if required
         self.render_mode = render_mode
-        if self.render_mode == "human":
-            self.game_visual = Renderer(self.game)
+        self.game_visual = None
+        if self.render_mode in self.metadata["render_modes"]:
+            self.game_visual = Renderer(self.game, render_mode=self.render_mode)
+
+        # Profiler timing the environment (None when profiling is disabled)
+        self.profiler = None
 
         # Game constants
         self.NUM_TILES = len(self.game.board.tiles) # Number of tiles on the board
@@ -67,8 +94,8 @@ class CatanEnvironment(gym.Env):
 
         # Edge representation: Each index represents an edge on the board
         # Channels:
-        #   0-4: Owner (One-hot: None, Me, Opponent 1, Opponent 2, Opponent 3)
-        #   Note: uses same indexing as Node Channels
+        #   0-3: Owner (One-hot: Me, Opponent 1, Opponent 2, Opponent 3)
+        #   Note: an unowned edge has no channel set
         self.NUM_EDGE_CHANNELS = 4
         edge_space = gym.spaces.Box(
             low=np.zeros((self.NUM_EDGES, self.NUM_EDGE_CHANNELS), dtype=np.float32),
@@ -77,24 +104,308 @@ class CatanEnvironment(gym.Env):
             dtype=np.float32
         )
 
+        self.observation_space = gym.spaces.Dict({"tiles": tile_space, "nodes": node_space, "edges": edge_space})
+        if self.obs_mode == "categorical":
+            self.observation_space = categorical_observation_space()
+
+        # Graph connectivity for the "graph" mode: the tile, node, and edge observations
+        # are the feature matrices of the node types, and the edge_index of each relation
+        # never changes. The arrays belong to the shared topology index, so every
+        # environment returns the same (read-only) arrays.
+        topology = self.game.board.topology
+        self.graph_edge_index = topology.graph_edge_index
+        self.graph_road_index = topology.graph_road_index
+        if self.obs_mode == "graph":
+            self.observation_space = graph_observation_space(self.observation_space, topology)
+
+        # --- Action Space --- #
+
+        # Flat action index (see the action layout in constants)
+        self.action_space = gym.spaces.Discrete(NUM_ACTIONS)
+        self.max_turns = max_turns
+
+        # Legal actions of the current player, and the dice rolled by the last step (0 if none)
+        self.action_mask = np.zeros(NUM_ACTIONS, dtype=bool)
+        self.dice = 0
+        self._road_cost = np.array(ROAD_COST, dtype=np.int16)
+        self._settlement_cost = np.array(SETTLEMENT_COST, dtype=np.int16)
+        self._city_cost = np.array(CITY_COST, dtype=np.int16)
+
+        # --- Observation Buffers --- #
+
+        # The observation is written into these buffers, which persist across steps.
+        # Only the elements that changed on the board since the last observation are
+        # re-encoded, using the board's version stamps.
+        self._tile_obs = np.zeros((self.NUM_TILES, self.NUM_TILE_CHANNELS), dtype=np.float32)
+        self._node_obs = np.zeros((self.NUM_NODES, self.NUM_NODE_CHANNELS), dtype=np.float32)
+        self._edge_obs = np.zeros((self.NUM_EDGES, self.NUM_EDGE_CHANNELS), dtype=np.float32)
+        self._obs = {"tiles": self._tile_obs, "nodes": self._node_obs, "edges": self._edge_obs}
+        if self.obs_mode == "categorical":
+            self._obs = {name: np.zeros(space.shape, dtype=space.dtype) for name, space in self.observation_space.items()}
+        elif self.obs_mode == "graph":
+            self._obs.update(graph_static_obs(topology))
+        self._obs_version = -1 # Board version last encoded
+        self._obs_player = 0 # Player the owner channels are currently relative to
+
+        # The player whose perspective the observation is encoded from
+        self.obs_player = 0
+
+        # Owner channels are relative to the observing player. When the observing
+        # player changes by a shift, owner channel i takes the old channel (i + shift) % 4.
+        self._owner_perms = [np.array([(i + shift) % NUM_PLAYERS for i in range(NUM_PLAYERS)])
+                             for shift in range(NUM_PLAYERS)]
+        self._node_owner_scratch = np.zeros((self.NUM_NODES, NUM_PLAYERS), dtype=np.float32)
+        self._edge_owner_scratch = np.zeros((self.NUM_EDGES, NUM_PLAYERS), dtype=np.float32)
+
 
     def _get_obs(self):
-        return
+        """
+        Encodes the board from the perspective of obs_player. The returned
+        arrays are the persistent observation buffers, and are overwritten on
+        the next call, so copy them if they need to be kept.
+
+        :return: Dict of the tile, node, and edge observations
+        """
+        if self.obs_mode == "categorical":
+            return self._get_categorical_obs()
+
+        board = self.game.board
+
+        # Re-permute the owner channels if the perspective changed
+        shift = (self.obs_player - self._obs_player) % NUM_PLAYERS
+        if shift:
+            perm = self._owner_perms[shift]
+            node_owners = self._node_obs[:, self.ME_IDX:self.OPP_THREE_IDX + 1]
+            np.take(node_owners, perm, axis=1, out=self._node_owner_scratch, mode="clip")
+            node_owners[:] = self._node_owner_scratch
+            np.take(self._edge_obs, perm, axis=1, out=self._edge_owner_scratch, mode="clip")
+            self._edge_obs[:] = self._edge_owner_scratch
+            self._obs_player = self.obs_player
+
+        # Re-encode whatever changed since the last observation
+        if board.version != self._obs_version:
+            self._encode_tiles(np.flatnonzero(board.tile_version > self._obs_version))
+            self._encode_nodes(np.flatnonzero(board.node_version > self._obs_version))
+            self._encode_edges(np.flatnonzero(board.edge_version > self._obs_version))
+            self._obs_version = board.version
+
+        return self._obs
+
+
+    def _get_categorical_obs(self):
+        """
+        Encodes the board from the perspective of obs_player as int8 indices
+        into the persistent observation buffers.
+
+        :return: Dict of the tile, node, and edge observations
+        """
+        board = self.game.board
+        if board.version == self._obs_version and self.obs_player == self._obs_player:
+            return self._obs
+
+        tiles = np.flatnonzero(board.tile_version > self._obs_version)
+        if self.obs_player != self._obs_player:
+            # Every owner index is relative to the observing player
+            nodes, edges = np.arange(self.NUM_NODES), np.arange(self.NUM_EDGES)
+            self._obs_player = self.obs_player
+        else:
+            nodes = np.flatnonzero(board.node_version > self._obs_version)
+            edges = np.flatnonzero(board.edge_version > self._obs_version)
+        self._obs_version = board.version
+
+        tile_obs, node_obs, edge_obs = self._obs["tiles"], self._obs["nodes"], self._obs["edges"]
+        tile_obs[tiles, TILE_RESOURCE] = board.tile_resource[tiles]
+        tile_obs[tiles, TILE_DICE] = board.tile_dice[tiles]
+        tile_obs[tiles, TILE_ROBBER] = tiles == board.robber_tile
+
+        owner = board.node_owner[nodes]
+        node_obs[nodes, NODE_OWNER] = np.where(owner == NO_OWNER, 0, (owner - self._obs_player) % NUM_PLAYERS + 1)
+        node_obs[nodes, NODE_LEVEL] = board.node_level[nodes]
+
+        owner = board.edge_owner[edges]
+        edge_obs[edges] = np.where(owner == NO_OWNER, 0, (owner - self._obs_player) % NUM_PLAYERS + 1)
+        return self._obs
+
+
+    def _encode_tiles(self, indices):
+        """
+        Encodes the given tiles into the tile observation buffer.
+
+        :param indices: Indices of the tiles to encode
+        :return: None
+        """
+        board = self.game.board
+        self._tile_obs[indices] = 0
+        self._tile_obs[indices, board.tile_resource[indices]] = 1
+        self._tile_obs[indices, self.NUMBER_TOKEN_IDX] = board.tile_dice[indices] / 12
+        self._tile_obs[indices, self.ROBBER_IDX] = indices == board.robber_tile
+
+
+    def _encode_nodes(self, indices):
+        """
+        Encodes the given nodes into the node observation buffer.
+
+        :param indices: Indices of the nodes to encode
+        :return: None
+        """
+        board = self.game.board
+        owner = board.node_owner[indices]
+        owner_channel = np.where(owner == NO_OWNER, self.NONE_IDX, (owner - self._obs_player) % NUM_PLAYERS + self.ME_IDX)
+        self._node_obs[indices] = 0
+        self._node_obs[indices, owner_channel] = 1
+        self._node_obs[indices, self.EMPTY_IDX + board.node_level[indices]] = 1
+
+
+    def _encode_edges(self, indices):
+        """
+        Encodes the given edges into the edge observation buffer.
 
+        :param indices: Indices of the edges to encode
+        :return: None
+        """
+        board = self.game.board
+        owner = board.edge_owner[indices]
+        owned = owner != NO_OWNER
+        self._edge_obs[indices] = 0
+        self._edge_obs[indices[owned], (owner[owned] - self._obs_player) % NUM_PLAYERS] = 1
+
+
+    def _compute_action_mask(self):
+        """
+        Computes the legal actions of the current player into the action mask.
 
-    def _get_info(self):
+        :return: None
+        """
+        game = self.game
+        board = game.board
+        player = game.current_player
+        mask = self.action_mask
+        mask.fill(False)
+
+        if game.setup_step < NUM_SETUP_STEPS:
+            if game.setup_step % 2 == 0:
+                mask[SETTLEMENT_ACTION_OFFSET:ROAD_ACTION_OFFSET] = board.get_legal_settlement_mask()
+            else:
+                # The road must touch the settlement just placed, and is skipped if it can't
+                roads = board.get_legal_road_mask(player, game.last_settlement)
+                mask[ROAD_ACTION_OFFSET:CITY_ACTION_OFFSET] = roads
+                mask[END_TURN_ACTION] = not roads.any()
+            return
+
+        resources = board.resources[player]
+        if (resources >= self._settlement_cost).all():
+            mask[SETTLEMENT_ACTION_OFFSET:ROAD_ACTION_OFFSET] = board.get_legal_settlement_mask(player)
+        if (resources >= self._road_cost).all():
+            mask[ROAD_ACTION_OFFSET:CITY_ACTION_OFFSET] = board.get_legal_road_mask(player)
+        if (resources >= self._city_cost).all():
+            mask[CITY_ACTION_OFFSET:END_TURN_ACTION] = (board.node_owner == player) & (board.node_level == SETTLEMENT)
+        mask[END_TURN_ACTION] = True
+
+
+    def _roll_dice(self):
+        """
+        Rolls the dice for the current player, moving the robber to a
+        different random tile on a 7.
+
+        :return: None
+        """
+        self.dice = int(self.np_random.integers(1, 7, size=2).sum())
+        self.game.play(ActionType.ROLL, self.dice)
+        if self.dice == 7:
+            tile = int(self.np_random.integers(0, NUM_TILES - 1))
+            self.game.play(ActionType.ROBBER, tile + (tile >= self.game.board.robber_tile))
+
+
+    def _get_info(self, acting_player=None):
         """
         Returns diagnostic information for debugging/monitoring.
 
+        :param acting_player: The player who acted this step (None on reset)
         :return: Auxiliary information associated to the current state
         """
-        return
+        info = {
+            "action_mask": self.action_mask,
+            "acting_player": acting_player,
+            "current_player": self.game.current_player,
+            "dice": self.dice
+        }
+        return info
+
+
+    def enable_profiling(self, profiler=None):
+        """
+        Times the environment, game, board, and renderer hot paths. The stats
+        are added to the info as "profile", and can be read from the profiler.
+
+        :param profiler: The Profiler to record into (a new one if None)
+        :return: The profiler
+        """
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.profiler.attach(self, ENVIRONMENT_PHASES)
+        self.game.enable_profiling(self.profiler)
+        if self.game_visual is not None:
+            self.profiler.attach(self.game_visual, RENDERER_PHASES)
+        return self.profiler
+
+
+    def disable_profiling(self):
+        """
+        Stops timing the environment. The profiler keeps its stats, and keeps
+        timing any other environments or games attached to it.
+
+        :return: None
+        """
+        if self.profiler is not None:
+            self.profiler.detach(self)
+            self.game.disable_profiling(self.profiler)
+            if self.game_visual is not None:
+                self.profiler.detach(self.game_visual)
+            self.profiler = None
 
 
     def reset(self, seed=None, options=None):
         """
         Reset the environment to start a new episode.
 
+        :param seed: Random seed for reproducibility
+        :param options: Additional options for environment reset
+        :return: Tuple of (observation, info) for the initial state
+        """
+        obs, info = self._reset(seed, options)
+        self._add_profile(info)
+        return obs, info
+
+
+    def step(self, action):
+        """
+        Executes one timestep of the environment
+
+        :param action: Flat action index of the current player's action
+        :return: Tuple of (observation, reward, terminated, truncated, info).
+            The observation is from the perspective of the next player to act,
+            and the reward is the victory points gained by the acting player.
+        """
+        obs, reward, terminated, truncated, info = self._step(action)
+        self._add_profile(info)
+        return obs, reward, terminated, truncated, info
+
+
+    def _add_profile(self, info):
+        """
+        Adds the profiler's stats to the info. The stats are read after the
+        timed _reset or _step has returned, so they include the current call.
+
+        :param info: The info returned by _reset or _step
+        :return: None
+        """
+        if self.profiler is not None:
+            info["profile"] = self.profiler.stats()
+
+
+    def _reset(self, seed, options):
+        """
+        Resets the game (see reset).
+
         :param seed: Random seed for reproducibility
         :param options: Additional options for environment reset
         :return: Tuple of (observation, info) for the initial state
@@ -102,27 +413,75 @@ class CatanEnvironment(gym.Env):
         super().reset(seed=seed)
 
         # Reset the game
-        self.game.reset()
+        if seed is not None:
+            self._board_rng.seed(seed)
+        self.game.reset(self._board_rng)
+        self.dice = 0
+        self.obs_player = self.game.current_player
+        self._compute_action_mask()
 
         # Render if required
-        if self.render_mode == "human":
+        if self.game_visual is not None:
             self.game_visual.reset()
 
+        return self._get_obs(), self._get_info()
 
-    def step(self, action):
+
+    def _step(self, action):
         """
-        Executes one timestep of the environment
+        Applies the action (see step).
 
-        :param action:
-        :return: Tuple of (observation, reward, done, truncated, info)
+        :param action: Flat action index of the current player's action
+        :return: Tuple of (observation, reward, terminated, truncated, info)
         """
+        game = self.game
+        action = int(action)
+        acting_player = game.current_player
+        points_before = game.board.get_victory_points(acting_player)
+        self.dice = 0
+
+        if self.action_mask[action]:
+            if action < ROAD_ACTION_OFFSET:
+                game.play(ActionType.SETTLEMENT, action - SETTLEMENT_ACTION_OFFSET)
+            elif action < CITY_ACTION_OFFSET:
+                game.play(ActionType.ROAD, action - ROAD_ACTION_OFFSET)
+            elif action < END_TURN_ACTION:
+                game.play(ActionType.CITY, action - CITY_ACTION_OFFSET)
+            else:
+                in_setup = game.setup_step < NUM_SETUP_STEPS
+                game.play(ActionType.END_TURN, 0)
+                if not in_setup:
+                    self._roll_dice()
+
+            # The first player rolls as soon as setup is over
+            if game.setup_step == NUM_SETUP_STEPS and game.turn == 0 and not game.has_rolled:
+                self._roll_dice()
+
+        points = game.board.get_victory_points(acting_player)
+        reward = float(points - points_before)
+        terminated = points >= VICTORY_POINTS_TO_WIN
+        truncated = not terminated and game.turn >= self.max_turns
+
+        self.obs_player = game.current_player
+        self._compute_action_mask()
+        return self._get_obs(), reward, terminated, truncated, self._get_info(acting_player)
 
 
     def render(self, delay=0.0):
         """
         Render the environment.
+
+        :param delay: Seconds to wait after drawing a frame in human mode
+        :return: The frame (rows x columns x RGB) in rgb_array mode, which is
+            overwritten by the next frame, otherwise None
         """
-        return
+        if self.game_visual is None:
+            return None
+
+        frame = self.game_visual.render()
+        if self.render_mode == "human" and delay > 0:
+            time.sleep(delay)
+        return frame
 
 
     def close(self):
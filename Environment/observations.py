@@ -0,0 +1,115 @@
+import gymnasium as gym
+import numpy as np
+from constants import TileType, NUM_TILES, NUM_NODES, NUM_EDGES, NUM_PLAYERS
+
+# --- Categorical observation layout --- #
+#
+# Every channel group of the float observation stored as one int8 index:
+#   tiles (19, 3): resource (TileType value), dice value (0 for the desert), robber (0/1)
+#   nodes (54, 2): owner (0 none, 1 me, 2-4 opponents in turn order), level (0 empty, 1 settlement, 2 city)
+#   edges (72,):   owner (0 none, 1 me, 2-4 opponents in turn order)
+TILE_RESOURCE, TILE_DICE, TILE_ROBBER = 0, 1, 2
+NODE_OWNER, NODE_LEVEL = 0, 1
+
+_TILE_HIGH = np.array([len(TileType) - 1, 12, 1], dtype=np.int8)
+_NODE_HIGH = np.array([NUM_PLAYERS, 2], dtype=np.int8)
+
+# One-hot rows for each index, gathered by the decoder
+_RESOURCE_ONE_HOT = np.eye(len(TileType), dtype=np.float32)
+_NODE_OWNER_ONE_HOT = np.eye(NUM_PLAYERS + 1, dtype=np.float32)
+_NODE_LEVEL_ONE_HOT = np.eye(3, dtype=np.float32)
+_EDGE_OWNER_ONE_HOT = np.eye(NUM_PLAYERS + 1, dtype=np.float32)[:, 1:] # No channel for unowned
+
+
+def categorical_observation_space():
+    """
+    Gets the space of the categorical observations, which hold the same
+    information as the float observations in about a fifteenth of the size.
+
+    :return: Dict space of the tile, node, and edge observations
+    """
+    return gym.spaces.Dict({
+        "tiles": gym.spaces.Box(low=np.zeros((NUM_TILES, 3), dtype=np.int8),
+                                high=np.tile(_TILE_HIGH, (NUM_TILES, 1)), dtype=np.int8),
+        "nodes": gym.spaces.Box(low=np.zeros((NUM_NODES, 2), dtype=np.int8),
+                                high=np.tile(_NODE_HIGH, (NUM_NODES, 1)), dtype=np.int8),
+        "edges": gym.spaces.Box(low=0, high=NUM_PLAYERS, shape=(NUM_EDGES,), dtype=np.int8)
+    })
+
+
+def decode_categorical(obs):
+    """
+    Decodes categorical observations to the float layout of CatanEnvironment.
+    Any leading (batch) dimensions are kept.
+
+    :param obs: Dict of the categorical tile, node, and edge observations
+    :return: Dict of the float tile (..., 19, 8), node (..., 54, 8), and edge (..., 72, 4) observations
+    """
+    tiles, nodes, edges = obs["tiles"], obs["nodes"], obs["edges"]
+
+    tile_obs = np.concatenate([
+        _RESOURCE_ONE_HOT[tiles[..., TILE_RESOURCE]],
+        tiles[..., TILE_DICE:TILE_DICE + 1] / np.float32(12),
+        tiles[..., TILE_ROBBER:TILE_ROBBER + 1].astype(np.float32)
+    ], axis=-1)
+    node_obs = np.concatenate([
+        _NODE_OWNER_ONE_HOT[nodes[..., NODE_OWNER]],
+        _NODE_LEVEL_ONE_HOT[nodes[..., NODE_LEVEL]]
+    ], axis=-1)
+    edge_obs = _EDGE_OWNER_ONE_HOT[edges]
+
+    return {"tiles": tile_obs, "nodes": node_obs, "edges": edge_obs}
+
+
+# --- Graph observation layout --- #
+#
+# The float tile, node, and edge observations are the feature matrices of the
+# graph's node types. The connectivity is added as one (2, num_edges) int64
+# edge_index entry per relation, named edge_index_<source>_<relation>_<target>,
+# and road_index, which maps each directed road to its board edge. These
+# entries are the read-only arrays of the shared topology index, so they are
+# the same objects in every observation of every environment.
+_GRAPH_NODE_COUNTS = {"tile": NUM_TILES, "node": NUM_NODES, "edge": NUM_EDGES}
+
+
+def graph_edge_index_key(relation):
+    """
+    Gets the observation key of a relation's edge_index.
+
+    :param relation: The (source, relation, target) key of TopologyIndex.graph_edge_index
+    :return: The key, such as "edge_index_node_road_node"
+    """
+    return "edge_index_" + "_".join(relation)
+
+
+def graph_static_obs(topology):
+    """
+    Gets the connectivity entries of the graph observations.
+
+    :param topology: The TopologyIndex
+    :return: Dict of the edge_index of each relation and the road_index
+    """
+    obs = {graph_edge_index_key(relation): edge_index for relation, edge_index in topology.graph_edge_index.items()}
+    obs["road_index"] = topology.graph_road_index
+    return obs
+
+
+def graph_observation_space(feature_space, topology):
+    """
+    Gets the space of the graph observations: the feature matrices plus the
+    static connectivity.
+
+    :param feature_space: Dict space of the float tile, node, and edge observations
+    :param topology: The TopologyIndex
+    :return: Dict space of the feature matrices, the edge_index of each relation, and the road_index
+    """
+    spaces = dict(feature_space.spaces)
+    for relation, edge_index in topology.graph_edge_index.items():
+        source, _, target = relation
+        high = np.array([[_GRAPH_NODE_COUNTS[source] - 1], [_GRAPH_NODE_COUNTS[target] - 1]], dtype=np.int64)
+        spaces[graph_edge_index_key(relation)] = gym.spaces.Box(
+            low=np.zeros(edge_index.shape, dtype=np.int64), high=np.broadcast_to(high, edge_index.shape).copy(),
+            dtype=np.int64)
+    spaces["road_index"] = gym.spaces.Box(low=0, high=NUM_EDGES - 1, shape=topology.graph_road_index.shape,
+                                          dtype=np.int64)
+    return gym.spaces.Dict(spaces)
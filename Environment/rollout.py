@@ -0,0 +1,297 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from Environment.vector_environment import VectorCatanEnv
+from constants import NUM_TILES, NUM_NODES, NUM_EDGES, NUM_ACTIONS
+
+# Fields of each ring buffer slot, per game. Slot t holds the observation the
+# action of step t was chosen from, the action, and what the step returned.
+SLOT_FIELDS = [
+    ("tiles", (NUM_TILES, 8), np.float32),
+    ("nodes", (NUM_NODES, 8), np.float32),
+    ("edges", (NUM_EDGES, 4), np.float32),
+    ("action_mask", (NUM_ACTIONS,), bool),
+    ("current_player", (), np.int8),
+    ("action", (), np.int16),
+    ("reward", (), np.float32),
+    ("terminated", (), bool),
+    ("truncated", (), bool)
+]
+_OBS_FIELDS = ("tiles", "nodes", "edges")
+
+# Seconds a blocked process waits before checking whether the runner is stopping
+_POLL_INTERVAL = 0.1
+
+
+def random_policy(obs, action_mask, rng):
+    """
+    Picks a uniformly random legal action in every game. Policies used by
+    async workers must be picklable, so they are module-level functions.
+
+    :param obs: Dict of the batched observations
+    :param action_mask: Boolean array of the legal actions (games x actions)
+    :param rng: The worker's NumPy Generator
+    :return: Array of the action of each game
+    """
+    return np.argmax(rng.random(action_mask.shape) * action_mask, axis=1)
+
+
+def _attach_buffers(buffer, ring_size, num_games):
+    """
+    Creates the field views into the shared buffer. Each field is laid out as
+    (ring_size, num_games, ...), so a slot of a field is contiguous across games.
+
+    :param buffer: The buffer (a SharedMemory's buf)
+    :param ring_size: Number of slots in the ring
+    :param num_games: Number of games over all workers
+    :return: Dict of field name -> array
+    """
+    views, offset = {}, 0
+    for name, shape, dtype in SLOT_FIELDS:
+        shape = (ring_size, num_games) + shape
+        views[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += -(-views[name].nbytes // 64) * 64 # Each field starts on a cache line
+    return views
+
+
+def _buffer_size(ring_size, num_games):
+    return sum(-(-int(np.prod((ring_size, num_games) + shape)) * np.dtype(dtype).itemsize // 64) * 64
+               for _, shape, dtype in SLOT_FIELDS)
+
+
+def worker_seeds(seed, num_workers):
+    """
+    Spawns the seeds of each worker from the runner's seed, so the workers'
+    environments and policies draw from independent streams.
+
+    :param seed: Seed of the runner (None for fresh entropy)
+    :param num_workers: Number of worker processes
+    :return: List of the (environment reset seed, policy SeedSequence) of each worker
+    """
+    seeds = []
+    for sequence in np.random.SeedSequence(seed).spawn(num_workers):
+        env_sequence, policy_sequence = sequence.spawn(2)
+        seeds.append((int(env_sequence.generate_state(1)[0]), policy_sequence))
+    return seeds
+
+
+def _worker(worker_index, memory_name, ring_size, num_games, games_per_worker, lockstep, policy, seeds,
+            max_turns, go, filled, free, stop):
+    """
+    Steps one VectorCatanEnv and writes its games' rows of every slot.
+
+    In lockstep mode the worker waits for go, steps with the actions the
+    runner wrote into the slot, and releases filled. In async mode it picks
+    the actions itself with the policy, releases filled after every step, and
+    waits on free when the ring is full.
+    """
+    memory = shared_memory.SharedMemory(name=memory_name)
+    buffers = None
+    try:
+        buffers = _attach_buffers(memory.buf, ring_size, num_games)
+        rows = slice(worker_index * games_per_worker, (worker_index + 1) * games_per_worker)
+        env = VectorCatanEnv(games_per_worker, max_turns=max_turns)
+        env_seed, policy_seed = seeds
+        rng = np.random.default_rng(policy_seed)
+
+        def write_obs(slot):
+            for name in _OBS_FIELDS:
+                buffers[name][slot, rows] = obs[name]
+            buffers["action_mask"][slot, rows] = info["action_mask"]
+            buffers["current_player"][slot, rows] = info["current_player"]
+
+        obs, info = env.reset(seed=env_seed)
+        step = 0
+        write_obs(0)
+        if lockstep:
+            filled.release()
+
+        while not stop.is_set():
+            slot = step % ring_size
+            if lockstep:
+                if not go.acquire(timeout=_POLL_INTERVAL):
+                    continue
+                if stop.is_set():
+                    break
+                actions = buffers["action"][slot, rows]
+            else:
+                actions = policy(obs, info["action_mask"], rng)
+                buffers["action"][slot, rows] = actions
+
+            obs, reward, terminated, truncated, info = env.step(actions)
+            buffers["reward"][slot, rows] = reward
+            buffers["terminated"][slot, rows] = terminated
+            buffers["truncated"][slot, rows] = truncated
+            step += 1
+
+            if lockstep:
+                write_obs(step % ring_size)
+                filled.release()
+            else:
+                filled.release()
+                while not free.acquire(timeout=_POLL_INTERVAL):
+                    if stop.is_set():
+                        return
+                write_obs(step % ring_size)
+    finally:
+        del buffers
+        memory.close()
+
+
+class RolloutRunner:
+    def __init__(self, num_workers, games_per_worker, ring_size=8, mode="lockstep", policy=random_policy,
+                 seed=None, max_turns=500, start_method=None):
+        """
+        Runs games in a pool of worker processes, each stepping a
+        VectorCatanEnv of games_per_worker games. Workers write observations,
+        masks, actions, and rewards straight into a ring of slots in shared
+        memory, and the runner returns views into it, so nothing is pickled
+        or copied on the way to the learner.
+
+        In "lockstep" mode the learner picks the actions: step writes them into
+        the shared slot and every worker steps once. In "async" mode each worker
+        picks its actions with the policy and runs ahead (by up to ring_size - 1
+        steps), and collect returns the next slot every worker has finished.
+
+        :param num_workers: Number of worker processes
+        :param games_per_worker: Number of games stepped by each worker
+        :param ring_size: Number of slots in the ring
+        :param mode: "lockstep" or "async"
+        :param policy: Picklable function (obs, action_mask, rng) -> actions used in async mode
+        :param seed: Seed the workers' environment and policy seeds are spawned from
+            (see worker_seeds), or None for fresh entropy
+        :param max_turns: Number of turns after which a game is truncated
+        :param start_method: multiprocessing start method (None for the default)
+        """
+        assert mode in ("lockstep", "async")
+        assert ring_size >= 2
+        self.num_workers = num_workers
+        self.games_per_worker = games_per_worker
+        self.num_games = num_workers * games_per_worker
+        self.ring_size = ring_size
+        self.mode = mode
+
+        self._memory = shared_memory.SharedMemory(create=True, size=_buffer_size(ring_size, self.num_games))
+        self.buffers = _attach_buffers(self._memory.buf, ring_size, self.num_games)
+
+        seeds = worker_seeds(seed, num_workers)
+        context = mp.get_context(start_method)
+        self._stop = context.Event()
+        self._go = [context.Semaphore(0) for _ in range(num_workers)]
+        self._filled = [context.Semaphore(0) for _ in range(num_workers)]
+        self._free = [context.Semaphore(ring_size - 1) for _ in range(num_workers)]
+        self._workers = [
+            context.Process(target=_worker, name=f"RolloutWorker-{index}", daemon=True,
+                            args=(index, self._memory.name, ring_size, self.num_games, games_per_worker,
+                                  mode == "lockstep", policy, seeds[index], max_turns,
+                                  self._go[index], self._filled[index], self._free[index], self._stop))
+            for index in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._step = 0 # Slot the learner is at
+        self._started = False
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def reset(self):
+        """
+        Waits for the workers' first observations (lockstep mode).
+
+        :return: Tuple of (observations, info) views of the first slot
+        """
+        assert self.mode == "lockstep" and not self._started
+        self._wait(self._filled)
+        self._started = True
+        return self._obs(0), self._info(0)
+
+
+    def step(self, actions):
+        """
+        Steps every game with the learner's actions (lockstep mode). The
+        returned arrays are views into the ring, valid for ring_size - 1 steps.
+
+        :param actions: Array of the action of every game
+        :return: Tuple of (observations, rewards, terminated, truncated, info)
+        """
+        assert self.mode == "lockstep" and self._started
+        slot = self._step % self.ring_size
+        self.buffers["action"][slot] = actions
+        for go in self._go:
+            go.release()
+        self._wait(self._filled)
+
+        self._step += 1
+        next_slot = self._step % self.ring_size
+        return (self._obs(next_slot), self.buffers["reward"][slot], self.buffers["terminated"][slot],
+                self.buffers["truncated"][slot], self._info(next_slot))
+
+
+    def collect(self):
+        """
+        Waits until every worker has finished the next slot (async mode), and
+        returns its transitions. The views are valid until the next call.
+
+        :return: Dict of field name -> view of the slot (games x ...)
+        """
+        assert self.mode == "async"
+
+        # The slot returned by the previous call can be reused
+        if self._started:
+            for free in self._free:
+                free.release()
+        self._wait(self._filled)
+        self._started = True
+
+        slot = self._step % self.ring_size
+        self._step += 1
+        return {name: buffer[slot] for name, buffer in self.buffers.items()}
+
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory.
+
+        :return: None
+        """
+        if self._memory is None:
+            return
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+        self.buffers = None
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = None
+
+
+    def _wait(self, semaphores):
+        """
+        Acquires one of each semaphore, failing if a worker has died.
+
+        :param semaphores: One semaphore per worker
+        :return: None
+        """
+        for worker, semaphore in zip(self._workers, semaphores):
+            while not semaphore.acquire(timeout=_POLL_INTERVAL):
+                if not worker.is_alive():
+                    raise RuntimeError(f"{worker.name} exited with code {worker.exitcode}")
+
+
+    def _obs(self, slot):
+        return {name: self.buffers[name][slot] for name in _OBS_FIELDS}
+
+
+    def _info(self, slot):
+        return {"action_mask": self.buffers["action_mask"][slot], "current_player": self.buffers["current_player"][slot]}
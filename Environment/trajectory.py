@@ -0,0 +1,273 @@
+import json
+import os
+import queue
+import threading
+import numpy as np
+from constants import NUM_ACTIONS
+
+INDEX_FILE = "index.json"
+
+
+def get_transition_fields(observation_space, num_actions=NUM_ACTIONS):
+    """
+    Gets the fields of a transition for an environment: every observation
+    array, the action mask, the action, the reward, and the done flags.
+
+    :param observation_space: The environment's (single) observation space, a Dict or Box
+    :param num_actions: Number of actions in the flat action layout
+    :return: Dict of field name -> (shape, dtype)
+    """
+    if hasattr(observation_space, "spaces"):
+        fields = {f"obs_{key}": (space.shape, space.dtype) for key, space in observation_space.spaces.items()}
+    else:
+        fields = {"obs": (observation_space.shape, observation_space.dtype)}
+
+    fields.update({
+        "action_mask": ((num_actions,), np.dtype(bool)),
+        "action": ((), np.dtype(np.int16)),
+        "reward": ((), np.dtype(np.float32)),
+        "terminated": ((), np.dtype(bool)),
+        "truncated": ((), np.dtype(bool))
+    })
+    return fields
+
+
+class TrajectoryWriter:
+    def __init__(self, directory, fields, shard_size=1 << 16, num_buffers=2):
+        """
+        Streams transitions to disk as shards of .npy files (one per field,
+        shard_XXXXX_<field>.npy) listed in index.json, which can be memory-mapped
+        with TrajectoryDataset. Transitions are copied into preallocated shard
+        buffers, and full buffers are written by a background thread, so memory
+        use stays at num_buffers shards however long the run is. If every
+        buffer is waiting to be written, adding a transition waits.
+
+        :param directory: Directory the shards are written to (created if needed)
+        :param fields: Dict of field name -> (shape, dtype), see get_transition_fields
+        :param shard_size: Number of transitions in each shard
+        :param num_buffers: Number of shard buffers (at least two, so one can
+            be filled while another is written)
+        """
+        assert num_buffers >= 2
+        self.directory = directory
+        self.fields = {name: (tuple(shape), np.dtype(dtype)) for name, (shape, dtype) in fields.items()}
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+
+        self.shards = [] # Index entries of the written shards
+        self.num_transitions = 0
+
+        # Buffers that can be filled, and full buffers waiting to be written
+        self._free_buffers = queue.Queue()
+        for _ in range(num_buffers):
+            self._free_buffers.put({name: np.zeros((shard_size,) + shape, dtype=dtype)
+                                    for name, (shape, dtype) in self.fields.items()})
+        self._full_buffers = queue.Queue()
+        self._buffer = self._free_buffers.get()
+        self._filled = 0
+        self._num_shards = 0
+
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="TrajectoryWriter", daemon=True)
+        self._thread.start()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def add(self, obs, action_mask, action, reward, terminated, truncated):
+        """
+        Adds a transition: the observation and action mask the action was
+        chosen from, the action, and what the step returned for it.
+
+        :param obs: The observation (a dict of arrays for Dict spaces)
+        :param action_mask: The legal actions
+        :param action: The action taken
+        :param reward: The reward of the step
+        :param terminated: Whether the episode terminated
+        :param truncated: Whether the episode was truncated
+        :return: None
+        """
+        buffer, row = self._buffer, self._filled
+        if isinstance(obs, dict):
+            for key, value in obs.items():
+                buffer[f"obs_{key}"][row] = value
+        else:
+            buffer["obs"][row] = obs
+        buffer["action_mask"][row] = action_mask
+        buffer["action"][row] = action
+        buffer["reward"][row] = reward
+        buffer["terminated"][row] = terminated
+        buffer["truncated"][row] = truncated
+
+        self._filled += 1
+        if self._filled == self.shard_size:
+            self._submit()
+
+
+    def add_batch(self, obs, action_mask, action, reward, terminated, truncated):
+        """
+        Adds a batch of transitions, such as one step of VectorCatanEnv. Each
+        argument has the batch as its first dimension.
+
+        :return: None
+        """
+        columns = {"action_mask": action_mask, "action": action, "reward": reward,
+                   "terminated": terminated, "truncated": truncated}
+        if isinstance(obs, dict):
+            columns.update({f"obs_{key}": value for key, value in obs.items()})
+        else:
+            columns["obs"] = obs
+
+        start, count = 0, len(action)
+        while start < count:
+            rows = min(count - start, self.shard_size - self._filled)
+            for name, value in columns.items():
+                self._buffer[name][self._filled:self._filled + rows] = value[start:start + rows]
+            self._filled += rows
+            start += rows
+            if self._filled == self.shard_size:
+                self._submit()
+
+
+    def flush(self):
+        """
+        Hands the partly filled shard to the writer thread and waits until
+        every shard is written.
+
+        :return: None
+        """
+        if self._filled:
+            self._submit()
+        self._full_buffers.join()
+        self._raise_error()
+
+
+    def close(self):
+        """
+        Writes the remaining transitions and stops the writer thread.
+
+        :return: None
+        """
+        if self._thread is None:
+            return
+        self.flush()
+        self._full_buffers.put(None)
+        self._thread.join()
+        self._thread = None
+
+
+    def _submit(self):
+        """
+        Queues the current buffer to be written, and takes a free buffer
+        (waiting for one if every buffer is queued).
+
+        :return: None
+        """
+        self._raise_error()
+        self._full_buffers.put((self._num_shards, self._buffer, self._filled))
+        self._num_shards += 1
+        self.num_transitions += self._filled
+        self._buffer = self._free_buffers.get()
+        self._filled = 0
+
+
+    def _run(self):
+        """
+        Writes full buffers until the close sentinel arrives.
+
+        :return: None
+        """
+        while True:
+            item = self._full_buffers.get()
+            if item is None:
+                self._full_buffers.task_done()
+                break
+
+            shard_index, buffer, size = item
+            try:
+                if self._error is None:
+                    self._write_shard(shard_index, buffer, size)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._free_buffers.put(buffer)
+                self._full_buffers.task_done()
+
+
+    def _write_shard(self, shard_index, buffer, size):
+        """
+        Writes a shard, and rewrites the index so it always lists the shards
+        that are complete on disk.
+
+        :param shard_index: Index of the shard
+        :param buffer: Dict of field name -> array
+        :param size: Number of transitions in the buffer
+        :return: None
+        """
+        prefix = f"shard_{shard_index:05d}"
+        for name, array in buffer.items():
+            np.save(os.path.join(self.directory, f"{prefix}_{name}.npy"), array[:size])
+
+        self.shards.append({"prefix": prefix, "size": size})
+        index = {
+            "fields": {name: {"shape": list(shape), "dtype": dtype.str} for name, (shape, dtype) in self.fields.items()},
+            "shards": self.shards,
+            "num_transitions": sum(shard["size"] for shard in self.shards)
+        }
+        temporary_path = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(temporary_path, "w") as file:
+            json.dump(index, file)
+        os.replace(temporary_path, os.path.join(self.directory, INDEX_FILE))
+
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Writing a trajectory shard failed") from self._error
+
+
+class TrajectoryDataset:
+    def __init__(self, directory):
+        """
+        Reads the shards written by TrajectoryWriter. Shards are memory-mapped,
+        so they are only read from disk when accessed.
+
+        :param directory: Directory the shards were written to
+        """
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as file:
+            index = json.load(file)
+        self.fields = list(index["fields"])
+        self.shards = index["shards"]
+        self.num_transitions = index["num_transitions"]
+
+
+    def __len__(self):
+        return self.num_transitions
+
+
+    def load_shard(self, shard_index):
+        """
+        Memory-maps a shard.
+
+        :param shard_index: Index of the shard
+        :return: Dict of field name -> array of the shard's transitions
+        """
+        prefix = self.shards[shard_index]["prefix"]
+        return {name: np.load(os.path.join(self.directory, f"{prefix}_{name}.npy"), mmap_mode="r")
+                for name in self.fields}
+
+
+    def iter_shards(self):
+        """
+        Iterates over the shards in the order they were written.
+
+        :return: Generator of dicts of field name -> array
+        """
+        for shard_index in range(len(self.shards)):
+            yield self.load_shard(shard_index)
@@ -0,0 +1,393 @@
+import gymnasium as gym
+import numpy as np
+from Game.topology import get_topology_index
+from constants import (TileType, NO_OWNER, EMPTY, SETTLEMENT, CITY, NUM_TILES, NUM_NODES, NUM_EDGES, NUM_PLAYERS,
+                       NUM_RESOURCES, FOUR_PLAYER_TILE_DISTRIBUTION, TOKEN_TILE_IDX_ORDER, TOKEN_DICE_VALUE_ORDER,
+                       SETUP_PLAYER_ORDER, NUM_SETUP_STEPS, ROAD_COST, SETTLEMENT_COST, CITY_COST, VICTORY_POINTS_TO_WIN,
+                       SETTLEMENT_ACTION_OFFSET, ROAD_ACTION_OFFSET, CITY_ACTION_OFFSET, END_TURN_ACTION, NUM_ACTIONS)
+
+class VectorCatanEnv(gym.vector.VectorEnv):
+    """
+    A batched Gymnasium environment that steps N games of Catan in lockstep.
+    The state of every game is stored in stacked arrays of shape (N, 54),
+    (N, 72), and (N, 19), so a step is a fixed number of array operations
+    no matter how many games are being played.
+
+    Each step, every game applies the action of its current player using the
+    flat action layout from constants (settlement per node, road per edge,
+    city per node, end turn). Ending the turn rolls the dice for the next
+    player, moves the robber to a random tile on a 7, and pays out production.
+    Illegal actions are ignored, so the action mask in the info should be used.
+    Finished games are reset in the same step (Gymnasium's SAME_STEP autoreset
+    mode), and the returned observation is the first observation of the new
+    game. The last observation and info of a finished game are in
+    info["final_obs"] and info["final_info"], masked by info["_final_obs"] and
+    info["_final_info"].
+    """
+
+    metadata = {"autoreset_mode": gym.vector.AutoresetMode.SAME_STEP}
+
+    def __init__(self, num_envs, max_turns=500):
+        """
+        Initialize the batched Catan environment
+
+        :param num_envs: Number of games stepped in lockstep
+        :param max_turns: Number of turns after which a game is truncated
+        """
+        self.num_envs = num_envs
+        self.max_turns = max_turns
+        self.topology = get_topology_index()
+
+        # Static graph connectivity shared by every game (see TopologyIndex.graph_edge_index),
+        # for graph policies that read the observations as node feature matrices
+        self.graph_edge_index = self.topology.graph_edge_index
+        self.graph_road_index = self.topology.graph_road_index
+
+        # --- Game state (one row per game) --- #
+        self.node_owner = np.full((num_envs, NUM_NODES), NO_OWNER, dtype=np.int8)
+        self.node_level = np.full((num_envs, NUM_NODES), EMPTY, dtype=np.int8)
+        self.edge_owner = np.full((num_envs, NUM_EDGES), NO_OWNER, dtype=np.int8)
+        self.tile_resource = np.zeros((num_envs, NUM_TILES), dtype=np.int8)
+        self.tile_dice = np.zeros((num_envs, NUM_TILES), dtype=np.int8)
+        self.robber = np.zeros(num_envs, dtype=np.int64)
+        self.resources = np.zeros((num_envs, NUM_PLAYERS, NUM_RESOURCES), dtype=np.int16)
+        self.victory_points = np.zeros((num_envs, NUM_PLAYERS), dtype=np.int16)
+        self.current_player = np.zeros(num_envs, dtype=np.int64)
+        self.setup_step = np.zeros(num_envs, dtype=np.int64) # NUM_SETUP_STEPS once setup is over
+        self.last_settlement = np.zeros(num_envs, dtype=np.int64) # The setup road must touch it
+        self.turn = np.zeros(num_envs, dtype=np.int64)
+        self.dice = np.zeros(num_envs, dtype=np.int64) # Dice rolled this step (0 if none)
+
+        # --- Preallocated outputs --- #
+        self.action_mask = np.zeros((num_envs, NUM_ACTIONS), dtype=bool)
+        self.tile_obs = np.zeros((num_envs, NUM_TILES, 8), dtype=np.float32)
+        self.node_obs = np.zeros((num_envs, NUM_NODES, 8), dtype=np.float32)
+        self.edge_obs = np.zeros((num_envs, NUM_EDGES, 4), dtype=np.float32)
+
+        # Occupancy with a sentinel entry appended, for the padded topology gathers
+        self._occupied = np.zeros((num_envs, NUM_NODES + 1), dtype=bool)
+        self._own_road = np.zeros((num_envs, NUM_EDGES + 1), dtype=bool)
+
+        # Constant index arrays
+        self._games = np.arange(num_envs)
+        self._node_games = np.repeat(self._games, NUM_NODES).reshape(num_envs, NUM_NODES)
+        self._node_indices = np.tile(np.arange(NUM_NODES), (num_envs, 1))
+        self._edge_games = np.repeat(self._games, NUM_EDGES).reshape(num_envs, NUM_EDGES)
+        self._edge_indices = np.tile(np.arange(NUM_EDGES), (num_envs, 1))
+        self._setup_players = np.array(SETUP_PLAYER_ORDER)
+        self._tile_types = np.array([tile_type.value for tile_type, count in FOUR_PLAYER_TILE_DISTRIBUTION.items()
+                                     for _ in range(count)], dtype=np.int8)
+        self._token_tiles = np.array(TOKEN_TILE_IDX_ORDER)
+        self._token_dice = np.array(TOKEN_DICE_VALUE_ORDER, dtype=np.int8)
+        self._road_cost = np.array(ROAD_COST, dtype=np.int16)
+        self._settlement_cost = np.array(SETTLEMENT_COST, dtype=np.int16)
+        self._city_cost = np.array(CITY_COST, dtype=np.int16)
+
+        # --- Spaces --- #
+        self.single_observation_space = gym.spaces.Dict({
+            "tiles": gym.spaces.Box(low=0.0, high=1.0, shape=(NUM_TILES, 8), dtype=np.float32),
+            "nodes": gym.spaces.Box(low=0.0, high=1.0, shape=(NUM_NODES, 8), dtype=np.float32),
+            "edges": gym.spaces.Box(low=0.0, high=1.0, shape=(NUM_EDGES, 4), dtype=np.float32),
+        })
+        self.observation_space = gym.vector.utils.batch_space(self.single_observation_space, num_envs)
+        self.single_action_space = gym.spaces.Discrete(NUM_ACTIONS)
+        self.action_space = gym.spaces.MultiDiscrete(np.full(num_envs, NUM_ACTIONS))
+
+
+    def reset(self, *, seed=None, options=None):
+        """
+        Reset every game to the start of the setup phase with a new board.
+
+        :param seed: Random seed for reproducibility
+        :param options: Additional options for environment reset
+        :return: Tuple of (observations, info) for the initial states
+        """
+        super().reset(seed=seed, options=options)
+        self._reset_games(self._games)
+        self.dice.fill(0)
+        self._compute_action_mask()
+        return self._get_obs(), self._get_info(self.current_player.copy())
+
+
+    def step(self, actions):
+        """
+        Applies one action in every game.
+
+        :param actions: Array of N flat action indices
+        :return: Tuple of (observations, rewards, terminated, truncated, info).
+            The rewards are the victory points gained by the acting player.
+        """
+        actions = np.asarray(actions)
+        games = self._games
+        acting_player = self.current_player.copy()
+        points_before = self.victory_points[games, acting_player]
+        in_main = self.setup_step >= NUM_SETUP_STEPS
+        legal = self.action_mask[games, actions]
+
+        # Settlements
+        settle_games = np.flatnonzero(legal & (actions < ROAD_ACTION_OFFSET))
+        nodes = actions[settle_games] - SETTLEMENT_ACTION_OFFSET
+        players = acting_player[settle_games]
+        self.node_owner[settle_games, nodes] = players
+        self.node_level[settle_games, nodes] = SETTLEMENT
+        self.victory_points[settle_games, players] += 1
+        self.last_settlement[settle_games] = nodes
+        paid = in_main[settle_games]
+        self.resources[settle_games[paid], players[paid]] -= self._settlement_cost
+        second_round = ~paid & (self.setup_step[settle_games] >= len(SETUP_PLAYER_ORDER))
+        self._give_starting_resources(settle_games[second_round], nodes[second_round], players[second_round])
+
+        # Roads
+        road_games = np.flatnonzero(legal & (actions >= ROAD_ACTION_OFFSET) & (actions < CITY_ACTION_OFFSET))
+        players = acting_player[road_games]
+        self.edge_owner[road_games, actions[road_games] - ROAD_ACTION_OFFSET] = players
+        paid = in_main[road_games]
+        self.resources[road_games[paid], players[paid]] -= self._road_cost
+
+        # Cities (only legal after setup)
+        city_games = np.flatnonzero(legal & (actions >= CITY_ACTION_OFFSET) & (actions < END_TURN_ACTION))
+        players = acting_player[city_games]
+        self.node_level[city_games, actions[city_games] - CITY_ACTION_OFFSET] = CITY
+        self.victory_points[city_games, players] += 1
+        self.resources[city_games, players] -= self._city_cost
+
+        # Every legal setup action moves setup on to the next step
+        advanced = legal & ~in_main
+        self.setup_step[advanced] += 1
+        in_setup = self.setup_step < NUM_SETUP_STEPS
+        self.current_player[in_setup] = self._setup_players[self.setup_step[in_setup] // 2]
+        setup_over = advanced & ~in_setup
+        self.current_player[setup_over] = SETUP_PLAYER_ORDER[0]
+
+        # End of turn
+        ended = legal & in_main & (actions == END_TURN_ACTION)
+        self.current_player[ended] = (self.current_player[ended] + 1) % NUM_PLAYERS
+        self.turn[ended] += 1
+
+        # The next player rolls the dice at the start of their turn
+        self._roll_dice(ended | setup_over)
+
+        # Rewards and termination
+        points_after = self.victory_points[games, acting_player]
+        rewards = (points_after - points_before).astype(np.float32)
+        terminated = points_after >= VICTORY_POINTS_TO_WIN
+        truncated = ~terminated & (self.turn >= self.max_turns)
+
+        # Start new games in place of the finished ones, keeping their last observation and info
+        done = np.flatnonzero(terminated | truncated)
+        final = None
+        if len(done):
+            final = self._get_final(terminated | truncated, acting_player)
+            self._reset_games(done)
+
+        self._compute_action_mask()
+        info = self._get_info(acting_player)
+        if final is not None:
+            info["final_obs"], info["_final_obs"], info["final_info"], info["_final_info"] = final
+        return self._get_obs(), rewards, terminated, truncated, info
+
+
+    def _get_final(self, done, acting_player):
+        """
+        Captures the last observation and info of the finished games, before
+        they are reset, in the layout of Gymnasium's vector environments.
+
+        :param done: Boolean array of the finished games
+        :param acting_player: The player who acted in each game this step
+        :return: Tuple of (final observations, their mask, final info, its mask).
+            The final observations are an object array holding the observation
+            dict of each finished game (None for the others), and the final info
+            holds copies of the batched info arrays, each masked by "_<key>".
+        """
+        self._compute_action_mask()
+        obs = self._get_obs()
+        final_obs = np.full(self.num_envs, None, dtype=object)
+        for game in np.flatnonzero(done):
+            final_obs[game] = {key: value[game].copy() for key, value in obs.items()}
+
+        final_info = {}
+        for key, value in self._get_info(acting_player).items():
+            final_info[key] = value.copy()
+            final_info["_" + key] = done.copy()
+        return final_obs, done.copy(), final_info, done.copy()
+
+
+    def _reset_games(self, games):
+        """
+        Resets the given games and deals each a new board.
+
+        :param games: Indices of the games to reset
+        :return: None
+        """
+        self.node_owner[games] = NO_OWNER
+        self.node_level[games] = EMPTY
+        self.edge_owner[games] = NO_OWNER
+        self.resources[games] = 0
+        self.victory_points[games] = 0
+        self.setup_step[games] = 0
+        self.current_player[games] = SETUP_PLAYER_ORDER[0]
+        self.turn[games] = 0
+
+        # Shuffle the tiles and place them (and the dice values) in token order
+        tile_types = self.np_random.permuted(np.tile(self._tile_types, (len(games), 1)), axis=1)
+        producing = tile_types != TileType.DESERT.value
+        dice_order = np.cumsum(producing, axis=1) - 1
+        dice_values = np.where(producing, self._token_dice[dice_order], 0)
+        self.tile_resource[np.ix_(games, self._token_tiles)] = tile_types
+        self.tile_dice[np.ix_(games, self._token_tiles)] = dice_values
+
+        # The robber starts on the desert
+        self.robber[games] = np.argmax(self.tile_resource[games] == TileType.DESERT.value, axis=1)
+
+        # The tile observation only changes with the robber, so encode the rest once
+        self.tile_obs[games] = 0
+        self.tile_obs[games[:, None], np.arange(NUM_TILES), self.tile_resource[games]] = 1
+        self.tile_obs[games, :, 6] = self.tile_dice[games] / 12
+
+
+    def _give_starting_resources(self, games, nodes, players):
+        """
+        Gives each player one resource from every tile touching their second
+        starting settlement.
+
+        :param games: Indices of the games
+        :param nodes: The node of the settlement in each game
+        :param players: The player who built the settlement in each game
+        :return: None
+        """
+        tiles = self.topology.node_to_tiles_padded[nodes]
+        resource = self.tile_resource[games[:, None], tiles]
+        valid = (tiles >= 0) & (resource != TileType.DESERT.value)
+        rows, _ = np.nonzero(valid)
+        np.add.at(self.resources, (games[rows], players[rows], resource[valid]), 1)
+
+
+    def _roll_dice(self, rolling):
+        """
+        Rolls the dice for the given games, moves the robber on a 7, and pays
+        out production from every producing tile not blocked by the robber.
+
+        :param rolling: Boolean array of the games rolling this step
+        :return: None
+        """
+        self.dice.fill(0)
+        games = np.flatnonzero(rolling)
+        if len(games) == 0:
+            return
+
+        dice = self.np_random.integers(1, 7, size=(len(games), 2)).sum(axis=1)
+        self.dice[games] = dice
+
+        # Move the robber to a different random tile
+        robbed = games[dice == 7]
+        new_tiles = self.np_random.integers(0, NUM_TILES - 1, size=len(robbed))
+        self.robber[robbed] = new_tiles + (new_tiles >= self.robber[robbed])
+
+        # Tiles producing this roll
+        producing = self.tile_dice[games] == dice[:, None]
+        producing[np.arange(len(games)), self.robber[games]] = False
+
+        # Every building on a producing tile gets one resource per building level
+        tile_nodes = self.topology.tile_to_nodes
+        amounts = self.node_level[games][:, tile_nodes] * producing[:, :, None]
+        rows, tiles, corners = np.nonzero(amounts)
+        owners = self.node_owner[games[rows], tile_nodes[tiles, corners]]
+        resource = self.tile_resource[games[rows], tiles]
+        np.add.at(self.resources, (games[rows], owners, resource), amounts[rows, tiles, corners])
+
+
+    def _compute_action_mask(self):
+        """
+        Computes the legal actions of the current player of every game into
+        the preallocated action mask.
+
+        :return: None
+        """
+        topology = self.topology
+        mask = self.action_mask
+        player = self.current_player[:, None]
+        in_main = self.setup_step >= NUM_SETUP_STEPS
+        placing_settlement = ~in_main & (self.setup_step % 2 == 0)
+        placing_road = ~in_main & (self.setup_step % 2 == 1)
+
+        # Distance rule: no building on or next to the node
+        occupied = self._occupied
+        occupied[:, :NUM_NODES] = self.node_owner != NO_OWNER
+        distance_ok = ~occupied[:, :NUM_NODES] & ~occupied[:, topology.node_to_nodes_padded].any(axis=2)
+
+        # Nodes touching one of the player's roads
+        self._own_road[:, :NUM_EDGES] = self.edge_owner == player
+        connected = self._own_road[:, topology.node_to_edges_padded].any(axis=2)
+
+        # Road frontier: unowned edges with an end the player can build from
+        # (an opponent's settlement blocks the road)
+        reach = (self.node_owner == player) | (~occupied[:, :NUM_NODES] & connected)
+        frontier = (self.edge_owner == NO_OWNER) & (reach[:, topology.edge_to_nodes[:, 0]] | reach[:, topology.edge_to_nodes[:, 1]])
+
+        # What the player can afford
+        resources = self.resources[self._games, self.current_player]
+        can_road = in_main & (resources >= self._road_cost).all(axis=1)
+        can_settle = in_main & (resources >= self._settlement_cost).all(axis=1)
+        can_city = in_main & (resources >= self._city_cost).all(axis=1)
+
+        mask[:, SETTLEMENT_ACTION_OFFSET:ROAD_ACTION_OFFSET] = distance_ok & (
+            (can_settle[:, None] & connected) | placing_settlement[:, None])
+        mask[:, ROAD_ACTION_OFFSET:CITY_ACTION_OFFSET] = frontier & can_road[:, None]
+        mask[:, CITY_ACTION_OFFSET:END_TURN_ACTION] = (
+            (self.node_owner == player) & (self.node_level == SETTLEMENT) & can_city[:, None])
+
+        # The setup road must touch the settlement just placed
+        road_games = np.flatnonzero(placing_road)
+        edges = topology.node_to_edges_padded[self.last_settlement[road_games]]
+        rows, columns = np.nonzero(edges >= 0)
+        edges = edges[rows, columns]
+        mask[road_games[rows], ROAD_ACTION_OFFSET + edges] = self.edge_owner[road_games[rows], edges] == NO_OWNER
+
+        # Ending the turn is always legal after setup. During setup it is only
+        # legal (and skips the road) if every edge at the settlement is taken.
+        no_road = placing_road & ~mask[:, ROAD_ACTION_OFFSET:CITY_ACTION_OFFSET].any(axis=1)
+        mask[:, END_TURN_ACTION] = in_main | no_road
+
+
+    def _get_obs(self):
+        """
+        Encodes every game from the perspective of its current player into the
+        preallocated observation buffers. Owner channels are relative: me, then
+        the opponents in turn order. The buffers are overwritten on every step.
+
+        :return: Dict of the batched tile, node, and edge observations
+        """
+        player = self.current_player[:, None]
+
+        # Nodes: channels 0-4 owner (none, me, opponents), 5-7 building level
+        owned = self.node_owner != NO_OWNER
+        owner_channel = np.where(owned, (self.node_owner - player) % NUM_PLAYERS + 1, 0)
+        self.node_obs.fill(0)
+        self.node_obs[self._node_games, self._node_indices, owner_channel] = 1
+        self.node_obs[self._node_games, self._node_indices, 5 + self.node_level] = 1
+
+        # Edges: channels 0-3 owner (me, opponents), all zero if unowned
+        owned = self.edge_owner != NO_OWNER
+        owner_channel = (self.edge_owner[owned] - np.broadcast_to(player, owned.shape)[owned]) % NUM_PLAYERS
+        self.edge_obs.fill(0)
+        self.edge_obs[self._edge_games[owned], self._edge_indices[owned], owner_channel] = 1
+
+        # Tiles: only the robber channel changes between resets
+        self.tile_obs[:, :, 7] = 0
+        self.tile_obs[self._games, self.robber, 7] = 1
+
+        return {"tiles": self.tile_obs, "nodes": self.node_obs, "edges": self.edge_obs}
+
+
+    def _get_info(self, acting_player):
+        """
+        :param acting_player: The player who acted in each game this step
+        :return: Batched auxiliary information for the current step
+        """
+        return {
+            "action_mask": self.action_mask,
+            "acting_player": acting_player,
+            "current_player": self.current_player,
+            "dice": self.dice,
+            "victory_points": self.victory_points,
+        }
@@ -0,0 +1,207 @@
+import numpy as np
+from topology import get_topology_index
+from constants import NO_OWNER, CITY, NUM_NODES, NUM_PLAYERS
+
+# Mask of all nodes (bit i is node i)
+ALL_NODES = (1 << NUM_NODES) - 1
+
+
+def _build_masks():
+    """
+    Builds the adjacency masks from the topology tables.
+
+    :return: Tuple of (node neighbour masks, node edge masks, edge node masks, node byte edge masks)
+    """
+    topology = get_topology_index()
+    node_neighbours = tuple(sum(1 << int(neighbour) for neighbour in topology.node_neighbours(node_index))
+                            for node_index in range(NUM_NODES))
+    node_edges = tuple(sum(1 << edge_index for edge_index in edge_indices)
+                       for edge_indices in topology.node_edges_tuples)
+    edge_nodes = tuple(sum(1 << node_index for node_index in node_indices)
+                       for node_indices in topology.edge_nodes_tuples)
+
+    # Edges touching the nodes of each byte of a node mask: entry [k][b] is the union of
+    # the edge masks of the nodes 8k + i for the bits i set in b
+    node_byte_edges = []
+    for chunk in range(-(-NUM_NODES // 8)):
+        table = [0] * 256
+        for byte in range(1, 256):
+            node_index = 8 * chunk + (byte & -byte).bit_length() - 1
+            table[byte] = table[byte & (byte - 1)] | (node_edges[node_index] if node_index < NUM_NODES else 0)
+        node_byte_edges.append(tuple(table))
+    return node_neighbours, node_edges, edge_nodes, tuple(node_byte_edges)
+
+
+# Per-node and per-edge adjacency masks, indexed by the node or edge index
+NODE_NEIGHBOUR_MASKS, NODE_EDGE_MASKS, EDGE_NODE_MASKS, NODE_BYTE_EDGE_MASKS = _build_masks()
+
+
+def iter_bits(mask):
+    """
+    Iterates over the set bits of a mask, lowest first.
+
+    :param mask: The mask
+    :return: Generator of the indices of the set bits
+    """
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+class BitBoard:
+    def __init__(self):
+        """
+        Optional bitboard representation of the pieces on the board, for
+        random playouts and search. Every set of nodes or edges is a Python
+        int with bit i set for node or edge i (54 and 72 bits), so the legal
+        settlements, cities, and roads are a few AND/OR operations on the
+        precomputed adjacency masks instead of loops over the board arrays.
+
+        The bitboard is independent of Board: build one from a board with
+        from_board, then apply placements to either (or both) of them.
+        """
+        self.settlements = [0] * NUM_PLAYERS # Settlements and cities of each player
+        self.cities = [0] * NUM_PLAYERS
+        self.roads = [0] * NUM_PLAYERS
+        self.road_nodes = [0] * NUM_PLAYERS # Nodes touched by each player's roads
+
+        self.occupied = 0 # Nodes with a building
+        self.blocked = 0 # Nodes with a building on or next to them (distance rule)
+        self.all_roads = 0
+
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        Builds the bitboard of a board's current pieces.
+
+        :param board: The board
+        :return: The BitBoard
+        """
+        bitboard = cls()
+        for node_index in np.flatnonzero(board.node_owner != NO_OWNER):
+            bitboard.place_settlement(int(node_index), int(board.node_owner[node_index]))
+            if board.node_level[node_index] == CITY:
+                bitboard.place_city(int(node_index))
+        for edge_index in np.flatnonzero(board.edge_owner != NO_OWNER):
+            bitboard.place_road(int(edge_index), int(board.edge_owner[edge_index]))
+        return bitboard
+
+
+    def copy(self):
+        """
+        Copies the bitboard, for trying moves in a playout.
+
+        :return: The copy
+        """
+        bitboard = BitBoard.__new__(BitBoard)
+        bitboard.settlements = self.settlements.copy()
+        bitboard.cities = self.cities.copy()
+        bitboard.roads = self.roads.copy()
+        bitboard.road_nodes = self.road_nodes.copy()
+        bitboard.occupied = self.occupied
+        bitboard.blocked = self.blocked
+        bitboard.all_roads = self.all_roads
+        return bitboard
+
+
+    def place_settlement(self, node_index, player_index):
+        """
+        Places a settlement for the player on the node.
+
+        :param node_index: The index of the node.
+        :param player_index: The index of the player building the settlement.
+        :return: None
+        """
+        bit = 1 << node_index
+        self.settlements[player_index] |= bit
+        self.occupied |= bit
+        self.blocked |= bit | NODE_NEIGHBOUR_MASKS[node_index]
+
+
+    def place_city(self, node_index):
+        """
+        Upgrades the settlement on the node to a city.
+
+        :param node_index: The index of the node.
+        :return: None
+        """
+        bit = 1 << node_index
+        for player_index in range(NUM_PLAYERS):
+            if self.settlements[player_index] & bit:
+                self.cities[player_index] |= bit
+                return
+
+
+    def place_road(self, edge_index, player_index):
+        """
+        Places a road for the player on the edge.
+
+        :param edge_index: The index of the edge.
+        :param player_index: The index of the player building the road.
+        :return: None
+        """
+        bit = 1 << edge_index
+        self.roads[player_index] |= bit
+        self.all_roads |= bit
+        self.road_nodes[player_index] |= EDGE_NODE_MASKS[edge_index]
+
+
+    def legal_settlements(self, player_index=None, is_setup=False):
+        """
+        Gets the nodes that can be legally built on. During setup (or when no
+        player is given) only the distance rule applies, otherwise the node
+        must also touch one of the player's roads.
+
+        :param player_index: The index of the player building the settlement.
+        :param is_setup: Whether the game is in the setup phase.
+        :return: Mask of the legal nodes
+        """
+        legal = ALL_NODES & ~self.blocked
+        if is_setup or player_index is None:
+            return legal
+        return legal & self.road_nodes[player_index]
+
+
+    def legal_cities(self, player_index):
+        """
+        Gets the player's settlements that can be upgraded to cities.
+
+        :param player_index: The index of the player building the city.
+        :return: Mask of the legal nodes
+        """
+        return self.settlements[player_index] & ~self.cities[player_index]
+
+
+    def road_reach(self, player_index):
+        """
+        Gets the nodes the player can extend a road from: nodes they have built
+        on, and empty nodes one of their roads touches (an opponent's
+        building blocks the road).
+
+        :param player_index: The index of the player.
+        :return: Mask of the nodes
+        """
+        return self.settlements[player_index] | (self.road_nodes[player_index] & ~self.occupied)
+
+
+    def legal_roads(self, player_index, node_index=None):
+        """
+        Gets the edges the player can legally build a road on. During setup,
+        the road must touch the settlement just placed, which is given by
+        node_index.
+
+        :param player_index: The index of the player building the road.
+        :param node_index: If given, only edges touching this node are legal.
+        :return: Mask of the legal edges
+        """
+        # Edges touching the reachable nodes, looked up a byte of the node mask at a time
+        reach = self.road_reach(player_index)
+        tables = NODE_BYTE_EDGE_MASKS
+        edges = (tables[0][reach & 0xFF] | tables[1][reach >> 8 & 0xFF] | tables[2][reach >> 16 & 0xFF]
+                 | tables[3][reach >> 24 & 0xFF] | tables[4][reach >> 32 & 0xFF] | tables[5][reach >> 40 & 0xFF]
+                 | tables[6][reach >> 48]) & ~self.all_roads
+        if node_index is not None:
+            edges &= NODE_EDGE_MASKS[node_index]
+        return edges
@@ -1,24 +1,120 @@
-from tile import Tile
 import random
-from constants import TileType
+import numpy as np
+import zobrist
+from constants import (TileType, NO_OWNER, EMPTY, SETTLEMENT, CITY, NUM_PLAYERS, NUM_RESOURCES,
+                       TOKEN_TILE_IDX_ORDER, TOKEN_DICE_VALUE_ORDER, NODE_FEATURE_PIPS, NODE_FEATURE_RESOURCE_PIPS,
+                       NODE_FEATURE_DIVERSITY, NODE_FEATURE_PORT, NODE_FEATURE_LEGAL, NODE_FEATURE_OPEN_NEIGHBOURS,
+                       NUM_NODE_FEATURES)
 
 class Board:
-    def __init__(self, tiles, nodes, edges):
+    # State fields serialized by to_bytes. The rest of the state buffer is derived from
+    # them, and rebuilt by load_bytes.
+    _PRIMARY_FIELDS = ("node_owner", "node_level", "edge_owner", "tile_resource", "tile_dice", "resources")
+
+    def __init__(self, tiles, nodes, edges, topology):
         """
-        Creates the board based on the given parameters.
+        Creates the board based on the given parameters. The state of the
+        board is stored in fixed size arrays, and the tiles, nodes, and edges
+        are views over these arrays.
 
         :param tiles: The tiles of the board.
         :param nodes: The nodes of the board.
         :param edges: The edges of the board.
+        :param topology: The shared (read-only) topology index of the board.
         :return: None
         """
         self.tiles = tiles
         self.nodes = nodes
         self.edges = edges
+        self.topology = topology
+
+        # Players that the owner indices refer to (assigned by the game)
+        self.players = []
+
+        # All mutable state of the board is stored in views into one contiguous
+        # buffer, so snapshotting or restoring the board is a single copy
+        self._state = self._allocate_state([
+            # Node state: owning player index and building level (empty, settlement, city)
+            ("node_owner", (len(nodes),), np.int8),
+            ("node_level", (len(nodes),), np.int8),
+
+            # Edge state: owning player index
+            ("edge_owner", (len(edges),), np.int8),
+
+            # Tile state: TileType value and dice value (0 when the tile has no dice value)
+            ("tile_resource", (len(tiles),), np.int8),
+            ("tile_dice", (len(tiles),), np.int8),
+
+            # Resources held by each player, indexed by the TileType value that produces them
+            ("resources", (NUM_PLAYERS, NUM_RESOURCES), np.int16),
+
+            # Settlement legality, maintained incrementally as pieces are placed and removed.
+            # During setup only the distance rule applies, afterwards the node must also
+            # touch one of the player's roads.
+            ("node_blocked", (len(nodes),), np.int8), # Buildings on or next to each node
+            ("node_road_count", (NUM_PLAYERS, len(nodes)), np.int8), # Each player's roads touching each node
+            ("legal_settlement_mask", (len(nodes),), bool), # Distance rule only
+            ("player_settlement_mask", (NUM_PLAYERS, len(nodes)), bool), # Distance rule and road connectivity
+
+            # Road legality, maintained incrementally. A player can extend a road from a
+            # node they have built on, or from an empty node one of their roads touches
+            # (an opponent's settlement blocks the road). The frontier holds every
+            # unowned edge with such a node at either end.
+            ("node_road_reach", (NUM_PLAYERS, len(nodes)), bool),
+            ("road_frontier", (NUM_PLAYERS, len(edges)), bool),
+        ])
+        self.node_owner.fill(NO_OWNER)
+        self.edge_owner.fill(NO_OWNER)
+        self.tile_resource.fill(-1)
+        self.legal_settlement_mask.fill(True)
+        self.robber_tile = 0
+        self.is_setup = True
+        self._player_column = np.arange(NUM_PLAYERS)[:, None]
+
+        # Production table, rebuilt on reset. For each dice total, the (tile, node, resource)
+        # triples it pays out, stored in CSR form indexed by the dice total. The arrays are
+        # replaced (never modified) when the table is rebuilt.
+        self.production_indptr = np.zeros(13 + 1, dtype=np.int32)
+        self.production_tiles = np.zeros(0, dtype=np.int32)
+        self.production_nodes = np.zeros(0, dtype=np.int32)
+        self.production_resources = np.zeros(0, dtype=np.int8)
+        self._production = np.zeros((NUM_PLAYERS, NUM_RESOURCES), dtype=np.int16) # Payout of the last roll
+
+        # Per-node features for scoring settlement spots (columns are the NODE_FEATURE_*
+        # constants), computed lazily like the longest roads. Moving the robber marks the
+        # pip columns for recompute, and placing or removing a settlement the legality
+        # columns, so the moves themselves stay cheap.
+        self._node_features = np.zeros((len(nodes), NUM_NODE_FEATURES), dtype=np.float32)
+        self._node_features[:, NODE_FEATURE_PORT] = topology.node_to_port >= 0
+        self._pip_features_dirty = True
+        self._legal_features_dirty = True
+
+        # Longest road of each player, computed lazily. Placing a road only queues the
+        # road, and the component it joined is searched the next time the length is read.
+        # Changes that can shorten a road (removing a road, or a settlement cutting one)
+        # mark the player for a full recompute.
+        self._longest_road = [0] * NUM_PLAYERS
+        self._longest_road_dirty = [False] * NUM_PLAYERS
+        self._longest_road_pending = [[] for _ in range(NUM_PLAYERS)]
+
+        # Zobrist key of the board (tile layout, buildings, roads, robber, and resources),
+        # updated on every change. The game adds the turn to it.
+        self.zobrist_key = 0
+
+        # Version stamp of the last change to each element, so consumers (such as the
+        # observation encoder) can find what changed since they last looked
+        self.version = 0
+        self.node_version = np.zeros(len(nodes), dtype=np.int64)
+        self.edge_version = np.zeros(len(edges), dtype=np.int64)
+        self.tile_version = np.zeros(len(tiles), dtype=np.int64)
+
+        # Bind the views to this board
+        for element in (*tiles, *nodes, *edges):
+            element.board = self
 
         # Used for placing dice values on tiles during setup
-        self.TOKEN_TILE_IDX_ORDER = [0, 3, 7, 12, 16, 17, 18, 15, 11, 6, 2, 1, 4, 8, 13, 14, 10, 5, 9]
-        self.TOKEN_DICE_VALUE_ORDER = [5, 2, 6, 3, 8, 10, 9, 12, 11, 4, 8, 10, 9, 4, 5, 6, 3, 11]
+        self.TOKEN_TILE_IDX_ORDER = TOKEN_TILE_IDX_ORDER
+        self.TOKEN_DICE_VALUE_ORDER = TOKEN_DICE_VALUE_ORDER
 
         # Tile distribution for a 4-player game
         TILE_DISTRIBUTION = {
@@ -32,58 +128,746 @@ class Board:
         self.tile_types = [tile_type for tile_type, count in TILE_DISTRIBUTION.items() for _ in range(count)]
 
 
-    def reset(self):
+    def _allocate_state(self, fields):
+        """
+        Allocates one contiguous buffer for the given fields, and sets each
+        field as an attribute holding a view into the buffer.
+
+        :param fields: List of (attribute name, shape, dtype) tuples.
+        :return: The buffer
+        """
+        # Each field starts on an 8 byte boundary
+        sizes = [int(np.prod(shape)) * np.dtype(dtype).itemsize for _, shape, dtype in fields]
+        offsets = np.cumsum([0] + [-(-size // 8) * 8 for size in sizes])
+        state = np.zeros(offsets[-1], dtype=np.uint8)
+
+        for (name, shape, dtype), offset, size in zip(fields, offsets, sizes):
+            setattr(self, name, state[offset:offset + size].view(dtype).reshape(shape))
+        return state
+
+
+    def reset(self, rng=None):
         """
         Reset the owner of each tile, node, and edge, and reshuffle
         the resource and dice value assigned to each tile.
 
+        :param rng: random.Random used to shuffle the tiles. If given, the
+            layout only depends on its state. If None, the random module is used.
         :return: None
         """
         # Reset the nodes and edges
-        for node in self.nodes:
-            node.reset()
-        for edge in self.edges:
-            edge.reset()
+        self.node_owner.fill(NO_OWNER)
+        self.node_level.fill(EMPTY)
+        self.edge_owner.fill(NO_OWNER)
+
+        # Reset settlement legality
+        self.is_setup = True
+        self.node_blocked.fill(0)
+        self.node_road_count.fill(0)
+        self.legal_settlement_mask.fill(True)
+        self.player_settlement_mask.fill(False)
+
+        # Reset road legality
+        self.node_road_reach.fill(False)
+        self.road_frontier.fill(False)
 
         # Shuffle resource order
-        random.shuffle(self.tile_types)
+        if rng is None:
+            random.shuffle(self.tile_types)
+        else:
+            self.tile_types.sort(key=lambda tile_type: tile_type.value)
+            rng.shuffle(self.tile_types)
+
+        # Place the resources in token order
+        resources = np.array([tile_type.value for tile_type in self.tile_types], dtype=np.int8)
+        self.tile_resource[self.TOKEN_TILE_IDX_ORDER] = resources
+
+        # Dice values are placed in the same order, skipping the desert
+        dice_values = np.zeros(len(self.tiles), dtype=np.int8)
+        dice_values[resources != TileType.DESERT.value] = self.TOKEN_DICE_VALUE_ORDER
+        self.tile_dice[self.TOKEN_TILE_IDX_ORDER] = dice_values
+
+        # The robber starts on the desert
+        self.robber_tile = int(np.argmax(self.tile_resource == TileType.DESERT.value))
+
+        # Reset resources and rebuild the production table
+        self.resources.fill(0)
+        self._build_production_table()
+        self._pip_features_dirty = True
+        self._legal_features_dirty = True
+
+        self.zobrist_key = self.compute_zobrist_key()
+
+        # Reset longest roads
+        self._invalidate_longest_roads()
+
+        # Everything changed
+        self.version += 1
+        self.node_version.fill(self.version)
+        self.edge_version.fill(self.version)
+        self.tile_version.fill(self.version)
+
+
+    def _build_production_table(self):
+        """
+        Builds the production table from the tiles' dice values, so a roll
+        can be paid out without looking at the tiles and nodes.
+
+        :return: None
+        """
+        # Every (tile, node) pair of a tile with a dice value, sorted by dice value
+        tile_nodes = self.topology.tile_to_nodes
+        tiles = np.repeat(np.arange(len(self.tiles), dtype=np.int32), tile_nodes.shape[1])
+        nodes = tile_nodes.ravel()
+        dice = self.tile_dice[tiles]
+        order = np.argsort(dice, kind="stable")
+        order = order[dice[order] > 0]
+
+        self.production_tiles = tiles[order]
+        self.production_nodes = nodes[order]
+        self.production_resources = self.tile_resource[self.production_tiles]
+        self.production_indptr = np.searchsorted(dice[order], np.arange(len(self.production_indptr))).astype(np.int32)
+
+
+    @property
+    def node_features(self):
+        """
+        The per-node feature matrix (nodes x NUM_NODE_FEATURES, columns given by
+        the NODE_FEATURE_* constants), brought up to date when read. The array
+        is reused, so it must not be modified, and copied if it needs to be kept.
+        """
+        if self._pip_features_dirty:
+            self._compute_pip_features()
+        if self._legal_features_dirty:
+            self._compute_legal_features()
+        return self._node_features
+
+
+    def _compute_pip_features(self):
+        """
+        Computes the pip and resource columns of the node features, summing
+        the pips of each tile's resource onto its nodes with one product with
+        the tile-node incidence matrix.
+
+        :return: None
+        """
+        features = self._node_features
+
+        # Pips of each tile's resource (tiles x resources), with the robber's tile blocked
+        producing = np.flatnonzero(self.tile_dice > 0)
+        tile_resource_pips = np.zeros((len(self.tiles), NUM_RESOURCES), dtype=np.float32)
+        tile_resource_pips[producing, self.tile_resource[producing]] = 6 - np.abs(7 - self.tile_dice[producing])
+        tile_resource_pips[self.robber_tile] = 0
+
+        resource_pips = self.topology.tile_node_incidence.T @ tile_resource_pips
+        features[:, NODE_FEATURE_RESOURCE_PIPS:NODE_FEATURE_RESOURCE_PIPS + NUM_RESOURCES] = resource_pips
+        features[:, NODE_FEATURE_PIPS] = resource_pips.sum(axis=1)
+        features[:, NODE_FEATURE_DIVERSITY] = np.count_nonzero(resource_pips, axis=1)
+        self._pip_features_dirty = False
+
+
+    def _compute_legal_features(self):
+        """
+        Computes the distance rule columns of the node features from the
+        legal settlement mask.
+
+        :return: None
+        """
+        # Padded neighbour rows gather the sentinel (never legal) appended at the end
+        legal = np.append(self.legal_settlement_mask, False)
+        self._node_features[:, NODE_FEATURE_LEGAL] = self.legal_settlement_mask
+        self._node_features[:, NODE_FEATURE_OPEN_NEIGHBOURS] = np.count_nonzero(
+            legal[self.topology.node_to_nodes_padded], axis=1)
+        self._legal_features_dirty = False
+
+
+    def score_nodes(self, weights):
+        """
+        Scores every node as a weighted sum of its features.
+
+        :param weights: Weight of each feature column (NUM_NODE_FEATURES), or a
+            matrix of weights (NUM_NODE_FEATURES x scores) for several scores at once
+        :return: Array of the score of each node (nodes, or nodes x scores)
+        """
+        return self.node_features @ weights
+
+
+    def produce(self, dice_total):
+        """
+        Pays out the resources for a roll of the dice. Each settlement gets one
+        resource and each city two from every tile with that dice value,
+        unless the robber is on the tile.
+
+        :param dice_total: The total of the two dice.
+        :return: The resources paid to each player (players x resources). The array
+            is reused by the next roll, so copy it if it needs to be kept.
+        """
+        start, end = self.production_indptr[dice_total], self.production_indptr[dice_total + 1]
+        nodes = self.production_nodes[start:end]
+        owners = self.node_owner[nodes]
+        paid = (owners != NO_OWNER) & (self.production_tiles[start:end] != self.robber_tile)
+
+        self._production.fill(0)
+        np.add.at(self._production, (owners[paid], self.production_resources[start:end][paid]), self.node_level[nodes][paid])
+        self.add_resources(self._production)
+        return self._production
+
+
+    def move_robber(self, tile_index):
+        """
+        Moves the robber to the tile.
+
+        :param tile_index: The index of the tile.
+        :return: None
+        """
+        self.version += 1
+        self.tile_version[self.robber_tile] = self.version
+        self.tile_version[tile_index] = self.version
+        self.zobrist_key ^= zobrist.ROBBER_KEYS[self.robber_tile] ^ zobrist.ROBBER_KEYS[tile_index]
+        self._pip_features_dirty = True
+        self.robber_tile = tile_index
+
+
+    def set_tile(self, tile_index, resource_type, dice_value):
+        """
+        Changes the resource and dice value of a tile, and rebuilds the
+        production table.
+
+        :param tile_index: The index of the tile.
+        :param resource_type: The new TileType of the tile.
+        :param dice_value: The new dice value, or None for the desert.
+        :return: None
+        """
+        resource = resource_type.value
+        dice_value = 0 if dice_value is None else dice_value
+        self.zobrist_key ^= (zobrist.TILE_RESOURCE_KEYS[tile_index][self.tile_resource[tile_index]]
+                             ^ zobrist.TILE_RESOURCE_KEYS[tile_index][resource]
+                             ^ zobrist.TILE_DICE_KEYS[tile_index][self.tile_dice[tile_index]]
+                             ^ zobrist.TILE_DICE_KEYS[tile_index][dice_value])
+        self.tile_resource[tile_index] = resource
+        self.tile_dice[tile_index] = dice_value
+
+        self.version += 1
+        self.tile_version[tile_index] = self.version
+        self._build_production_table()
+        self._pip_features_dirty = True
+
+
+    def place_settlement(self, node_index, player_index):
+        """
+        Places a settlement for the player on the node.
+
+        :param node_index: The index of the node.
+        :param player_index: The index of the player building the settlement.
+        :return: None
+        """
+        self._settlement_changed(node_index, player_index)
+        self.node_owner[node_index] = player_index
+        self.node_level[node_index] = SETTLEMENT
+        self.zobrist_key ^= zobrist.SETTLEMENT_KEYS[node_index][player_index]
+        self.version += 1
+        self.node_version[node_index] = self.version
+
+        # The node and its neighbours are no longer legal (distance rule)
+        neighbours = self.topology.node_neighbours(node_index)
+        self._legal_features_dirty = True
+        self.node_blocked[node_index] += 1
+        self.node_blocked[neighbours] += 1
+        self.legal_settlement_mask[node_index] = False
+        self.legal_settlement_mask[neighbours] = False
+        self.player_settlement_mask[:, node_index] = False
+        self.player_settlement_mask[:, neighbours] = False
+
+        self._update_road_frontier(self.topology.node_edges(node_index))
+
+
+    def remove_settlement(self, node_index):
+        """
+        Removes the settlement (or city) from the node.
+
+        :param node_index: The index of the node.
+        :return: None
+        """
+        player_index = self.node_owner[node_index]
+        self._settlement_changed(node_index, player_index)
+        self.zobrist_key ^= zobrist.SETTLEMENT_KEYS[node_index][player_index]
+        if self.node_level[node_index] == CITY:
+            self.zobrist_key ^= zobrist.CITY_KEYS[node_index][player_index]
+        self.node_owner[node_index] = NO_OWNER
+        self.node_level[node_index] = EMPTY
+        self.version += 1
+        self.node_version[node_index] = self.version
+
+        # Nodes that are no longer next to any building become legal again
+        affected = np.append(self.topology.node_neighbours(node_index), node_index)
+        self.node_blocked[affected] -= 1
+        unblocked = affected[self.node_blocked[affected] == 0]
+        self.legal_settlement_mask[unblocked] = True
+        self._legal_features_dirty = True
+        self.player_settlement_mask[:, unblocked] = self.node_road_count[:, unblocked] > 0
+
+        self._update_road_frontier(self.topology.node_edges(node_index))
+
+
+    def place_city(self, node_index):
+        """
+        Upgrades the settlement on the node to a city.
+
+        :param node_index: The index of the node.
+        :return: None
+        """
+        self.node_level[node_index] = CITY
+        self.zobrist_key ^= zobrist.CITY_KEYS[node_index][self.node_owner[node_index]]
+        self.version += 1
+        self.node_version[node_index] = self.version
+
+
+    def remove_city(self, node_index):
+        """
+        Downgrades the city on the node back to a settlement.
+
+        :param node_index: The index of the node.
+        :return: None
+        """
+        self.node_level[node_index] = SETTLEMENT
+        self.zobrist_key ^= zobrist.CITY_KEYS[node_index][self.node_owner[node_index]]
+        self.version += 1
+        self.node_version[node_index] = self.version
+
+
+    def place_road(self, edge_index, player_index):
+        """
+        Places a road for the player on the edge.
+
+        :param edge_index: The index of the edge.
+        :param player_index: The index of the player building the road.
+        :return: None
+        """
+        self.edge_owner[edge_index] = player_index
+        self.zobrist_key ^= zobrist.ROAD_KEYS[edge_index][player_index]
+        self._longest_road_pending[player_index].append(edge_index)
+        self.version += 1
+        self.edge_version[edge_index] = self.version
+
+        # Both ends of the road are now connected for the player
+        edge_nodes = self.topology.edge_to_nodes[edge_index]
+        self.node_road_count[player_index, edge_nodes] += 1
+        self.player_settlement_mask[player_index, edge_nodes] = self.legal_settlement_mask[edge_nodes]
+
+        self._update_road_frontier(self._edges_around(edge_nodes))
+
+
+    def remove_road(self, edge_index):
+        """
+        Removes the road from the edge.
+
+        :param edge_index: The index of the edge.
+        :return: None
+        """
+        player_index = self.edge_owner[edge_index]
+        self.edge_owner[edge_index] = NO_OWNER
+        self.zobrist_key ^= zobrist.ROAD_KEYS[edge_index][player_index]
+        self._longest_road_dirty[player_index] = True
+        self.version += 1
+        self.edge_version[edge_index] = self.version
+
+        # Ends of the road may no longer be connected for the player
+        edge_nodes = self.topology.edge_to_nodes[edge_index]
+        self.node_road_count[player_index, edge_nodes] -= 1
+        self.player_settlement_mask[player_index, edge_nodes] = (
+            self.legal_settlement_mask[edge_nodes] & (self.node_road_count[player_index, edge_nodes] > 0)
+        )
+
+        self._update_road_frontier(self._edges_around(edge_nodes))
 
-        # Reset tiles
-        dice_value_index = 0
-        for resource_index, tile_index in enumerate(self.TOKEN_TILE_IDX_ORDER):
-            # Get the resource type and dice value for the tile
-            resource_type = self.tile_types[resource_index]
-            dice_value = None if resource_type == TileType.DESERT else self.TOKEN_DICE_VALUE_ORDER[dice_value_index]
 
-            # Increment dice value index only if value is used
-            if dice_value is not None:
-                dice_value_index += 1
+    def _edges_around(self, node_indices):
+        """
+        Gets the edges touching any of the given nodes (may contain duplicates).
+
+        :param node_indices: Indices of the nodes.
+        :return: Array of edge indices
+        """
+        return np.concatenate([self.topology.node_edges(node_index) for node_index in node_indices])
+
+
+    def _update_road_frontier(self, edge_indices):
+        """
+        Recomputes the road frontier of every player for the given edges, after
+        a piece was placed or removed on (or next to) them.
+
+        :param edge_indices: Indices of the edges to recompute.
+        :return: None
+        """
+        # Recompute which ends of the edges each player can build from
+        edge_nodes = self.topology.edge_to_nodes[edge_indices]
+        node_indices = edge_nodes.ravel()
+        node_owner = self.node_owner[node_indices]
+        self.node_road_reach[:, node_indices] = (node_owner == self._player_column) | (
+            (node_owner == NO_OWNER) & (self.node_road_count[:, node_indices] > 0)
+        )
+
+        # An edge is on the frontier if it is unowned and either end is reachable
+        self.road_frontier[:, edge_indices] = (self.edge_owner[edge_indices] == NO_OWNER) & (
+            self.node_road_reach[:, edge_nodes[:, 0]] | self.node_road_reach[:, edge_nodes[:, 1]]
+        )
+
+
+    def snapshot(self):
+        """
+        Copies the mutable state of the board. The topology, views, and
+        production table (which only changes on reset) are shared.
+
+        :return: Opaque snapshot to pass to restore
+        """
+        return (self._state.copy(), self.robber_tile, self.is_setup, self.zobrist_key,
+                self.production_indptr, self.production_tiles, self.production_nodes, self.production_resources)
+
+
+    def restore(self, snapshot):
+        """
+        Restores the board to a snapshot taken by snapshot.
+
+        :param snapshot: The snapshot to restore.
+        :return: None
+        """
+        (state, self.robber_tile, self.is_setup, self.zobrist_key,
+         self.production_indptr, self.production_tiles, self.production_nodes, self.production_resources) = snapshot
+        self._state[:] = state
+        self._pip_features_dirty = True
+        self._legal_features_dirty = True
+
+        # Anything may have changed
+        self.version += 1
+        self.node_version.fill(self.version)
+        self.edge_version.fill(self.version)
+        self.tile_version.fill(self.version)
+        self._invalidate_longest_roads()
+
+
+    def to_bytes(self):
+        """
+        Serializes the primary state of the board: the pieces, the tile layout,
+        the robber, and the resources. Unlike snapshot, the result is
+        self-contained, so it can be written to disk, and it leaves out the
+        legality state derived from the pieces, which load_bytes rebuilds.
+
+        :return: The state as bytes (always state_size long)
+        """
+        return bytes([self.robber_tile]) + b"".join(getattr(self, name).tobytes() for name in self._PRIMARY_FIELDS)
+
+
+    @property
+    def state_size(self):
+        """
+        The length of the bytes returned by to_bytes.
+        """
+        return 1 + sum(getattr(self, name).nbytes for name in self._PRIMARY_FIELDS)
+
+
+    def load_bytes(self, data):
+        """
+        Restores the board from bytes returned by to_bytes. The derived state
+        (legality masks, production table, and Zobrist key) is rebuilt, and
+        the node features are recomputed when next read. is_setup is left to
+        the game, which knows the setup step.
+
+        :param data: The serialized state
+        :return: None
+        """
+        self.robber_tile = data[0]
+        offset = 1
+        for name in self._PRIMARY_FIELDS:
+            field = getattr(self, name)
+            field[...] = np.frombuffer(data, dtype=field.dtype, count=field.size, offset=offset).reshape(field.shape)
+            offset += field.nbytes
+
+        self._rebuild_legality()
+        self._build_production_table()
+        self._pip_features_dirty = True
+        self._legal_features_dirty = True
+        self.zobrist_key = self.compute_zobrist_key()
+
+        # Anything may have changed
+        self.version += 1
+        self.node_version.fill(self.version)
+        self.edge_version.fill(self.version)
+        self.tile_version.fill(self.version)
+        self._invalidate_longest_roads()
+
+
+    def _rebuild_legality(self):
+        """
+        Rebuilds the incrementally maintained settlement and road legality
+        state from the pieces on the board.
+
+        :return: None
+        """
+        topology = self.topology
+
+        # Buildings on or next to each node (padded neighbour rows gather the appended sentinel)
+        occupied = np.append(self.node_owner != NO_OWNER, False)
+        self.node_blocked[:] = occupied[:-1] + occupied[topology.node_to_nodes_padded].sum(axis=1)
+        self.legal_settlement_mask[:] = self.node_blocked == 0
+
+        # Each player's roads touching each node
+        self.node_road_count.fill(0)
+        owned = np.flatnonzero(self.edge_owner != NO_OWNER)
+        owners = self.edge_owner[owned]
+        np.add.at(self.node_road_count, (owners, topology.edge_to_nodes[owned, 0]), 1)
+        np.add.at(self.node_road_count, (owners, topology.edge_to_nodes[owned, 1]), 1)
+        self.player_settlement_mask[:] = self.legal_settlement_mask & (self.node_road_count > 0)
+
+        self._update_road_frontier(np.arange(len(self.edges)))
+
+
+    def add_resources(self, amounts, player_index=None):
+        """
+        Adds (or with negative amounts, removes) resources.
+
+        :param amounts: The amount of each resource, or if no player is given,
+            the amount of each resource for each player (players x resources).
+        :param player_index: The index of the player receiving the resources.
+        :return: None
+        """
+        self.zobrist_key ^= zobrist.resource_key_change(self.resources, amounts, player_index)
+        if player_index is None:
+            self.resources += amounts
+        else:
+            self.resources[player_index] += amounts
+
+
+    def set_resource(self, player_index, resource_index, count):
+        """
+        Sets how many of a resource a player holds.
+
+        :param player_index: The index of the player.
+        :param resource_index: The index (TileType value) of the resource.
+        :param count: The new count.
+        :return: None
+        """
+        amounts = np.zeros(NUM_RESOURCES, dtype=np.int16)
+        amounts[resource_index] = count - self.resources[player_index, resource_index]
+        self.add_resources(amounts, player_index)
+
 
-            # Reset tile with updated values
-            self.tiles[tile_index].reset(resource_type, dice_value)
+    def compute_zobrist_key(self):
+        """
+        Computes the Zobrist key of the board from scratch. The board keeps
+        zobrist_key up to date, so this is only needed after a reset.
+
+        :return: The key as an int
+        """
+        key = zobrist.ROBBER_KEYS[self.robber_tile] ^ zobrist.resource_key(self.resources)
+        for tile_index in range(len(self.tiles)):
+            key ^= zobrist.TILE_RESOURCE_KEYS[tile_index][self.tile_resource[tile_index]]
+            key ^= zobrist.TILE_DICE_KEYS[tile_index][self.tile_dice[tile_index]]
+        for node_index in np.flatnonzero(self.node_owner != NO_OWNER):
+            key ^= zobrist.SETTLEMENT_KEYS[node_index][self.node_owner[node_index]]
+            if self.node_level[node_index] == CITY:
+                key ^= zobrist.CITY_KEYS[node_index][self.node_owner[node_index]]
+        for edge_index in np.flatnonzero(self.edge_owner != NO_OWNER):
+            key ^= zobrist.ROAD_KEYS[edge_index][self.edge_owner[edge_index]]
+        return key
+
+
+    def get_longest_road(self, player_index):
+        """
+        Gets the length of the player's longest road: the longest chain of
+        their roads that does not use an edge twice and does not pass through
+        an opponent's settlement or city.
+
+        :param player_index: The index of the player.
+        :return: The number of roads in the longest road
+        """
+        if self._longest_road_dirty[player_index]:
+            # Something may have shortened a road, so search every component
+            self._longest_road_dirty[player_index] = False
+            self._longest_road_pending[player_index].clear()
+            self._longest_road[player_index] = self._find_longest_road(
+                player_index, np.flatnonzero(self.edge_owner == player_index).tolist())
+
+        elif self._longest_road_pending[player_index]:
+            # Roads were only added, so only the components they joined can be longer
+            pending = self._longest_road_pending[player_index]
+            self._longest_road[player_index] = max(self._longest_road[player_index],
+                                                   self._find_longest_road(player_index, pending))
+            pending.clear()
+
+        return self._longest_road[player_index]
+
+
+    def _invalidate_longest_roads(self):
+        """
+        Marks every player's longest road for a full recompute.
+
+        :return: None
+        """
+        for player_index in range(NUM_PLAYERS):
+            self._longest_road_dirty[player_index] = True
+            self._longest_road_pending[player_index].clear()
 
 
-    def get_all_legal_nodes(self):
+    def _settlement_changed(self, node_index, player_index):
+        """
+        Marks the longest roads that a settlement being placed on (or removed
+        from) the node can cut (or join) for recompute: those of the other
+        players with more than one road at the node.
+
+        :param node_index: The index of the node.
+        :param player_index: The player who owns the settlement.
+        :return: None
+        """
+        for other_player in range(NUM_PLAYERS):
+            if other_player != player_index and self.node_road_count[other_player, node_index] > 1:
+                self._longest_road_dirty[other_player] = True
+
+
+    def _find_longest_road(self, player_index, edge_indices):
+        """
+        Finds the longest road in the components of the player's road network
+        that contain the given edges.
+
+        :param player_index: The index of the player.
+        :param edge_indices: Edges owned by the player.
+        :return: The number of roads in the longest road
+        """
+        node_edges = self.topology.node_edges_tuples
+        edge_nodes = self.topology.edge_nodes_tuples
+        edge_owner = self.edge_owner.tolist()
+        node_owner = self.node_owner.tolist()
+
+        def passable(node_index):
+            # A road cannot continue through an opponent's building
+            return node_owner[node_index] == NO_OWNER or node_owner[node_index] == player_index
+
+        def extend(node_index, used):
+            # Longest chain of unused roads starting at the node
+            best = 0
+            for edge_index in node_edges[node_index]:
+                if edge_owner[edge_index] != player_index or edge_index in used:
+                    continue
+                first, second = edge_nodes[edge_index]
+                other = second if first == node_index else first
+                used.add(edge_index)
+                best = max(best, 1 + (extend(other, used) if passable(other) else 0))
+                used.remove(edge_index)
+            return best
+
+        longest = 0
+        searched = set()
+        for start_edge in edge_indices:
+            if start_edge in searched or edge_owner[start_edge] != player_index:
+                continue
+
+            # Collect the nodes of the component containing the edge
+            component_nodes = set()
+            stack = [start_edge]
+            searched.add(start_edge)
+            while stack:
+                edge_index = stack.pop()
+                for node_index in edge_nodes[edge_index]:
+                    component_nodes.add(node_index)
+                    if not passable(node_index):
+                        continue
+                    for next_edge in node_edges[node_index]:
+                        if edge_owner[next_edge] == player_index and next_edge not in searched:
+                            searched.add(next_edge)
+                            stack.append(next_edge)
+
+            # The longest road starts at one of the component's nodes
+            for node_index in component_nodes:
+                longest = max(longest, extend(node_index, set()))
+
+        return longest
+
+
+    def get_victory_points(self, player_index):
+        """
+        Gets the victory points of the player's buildings (one per settlement,
+        two per city).
+
+        :param player_index: The index of the player.
+        :return: The number of victory points
+        """
+        return int(self.node_level[self.node_owner == player_index].sum())
+
+
+    def get_player(self, player_index):
+        """
+        Gets the player referred to by an owner index.
+
+        :param player_index: The owner index stored in the board arrays.
+        :return: The player, or None if the index is NO_OWNER.
+        """
+        if player_index == NO_OWNER:
+            return None
+        return self.players[player_index]
+
+
+    def get_legal_settlement_mask(self, player_index=None):
+        """
+        Gets the mask of nodes that can be legally built on. During setup
+        (or when no player is given) only the distance rule applies, otherwise
+        the node must also touch one of the player's roads. The mask is
+        maintained by the board, so it must not be modified.
+
+        :param player_index: The index of the player building the settlement.
+        :return: Boolean array with one entry per node
+        """
+        if self.is_setup or player_index is None:
+            return self.legal_settlement_mask
+        return self.player_settlement_mask[player_index]
+
+
+    def get_legal_node_indices(self, player_index=None):
+        """
+        Gets the indices of all nodes that can be legally built on.
+
+        :param player_index: The index of the player building the settlement.
+        :return: Array of legal node indices
+        """
+        return np.flatnonzero(self.get_legal_settlement_mask(player_index))
+
+
+    def get_all_legal_nodes(self, player_index=None):
         """
         Selects all nodes that can be legally built on. This is
         used during the build phase at the start of the game to
         determine legal settlement placements.
 
+        :param player_index: The index of the player building the settlement.
         :return: List of legal nodes
         """
-        # All nodes start as legal
-        legal_nodes_indices = [1] * len(self.nodes)
+        return [self.nodes[i] for i in self.get_legal_node_indices(player_index)]
 
-        for node in self.nodes:
-            # If node is owned,
-            if node.owned_by is not None:
-                # The node itself is not legal
-                legal_nodes_indices[node.index] = 0
 
-                # All neighbouring nodes are illegal
-                for edge in node.edges:
-                    neighbouring_node = edge.get_neighbour(node)
-                    legal_nodes_indices[neighbouring_node.index] = 0
+    def get_legal_road_mask(self, player_index, node_index=None):
+        """
+        Gets the mask of edges the player can legally build a road on. The
+        full mask is maintained by the board, so it must not be modified.
+        During setup, the road must touch the settlement just placed, which
+        is given by node_index.
 
-        # Create and return list of nodes from the indices
-        return [self.nodes[i] for i in  legal_nodes_indices]
+        :param player_index: The index of the player building the road.
+        :param node_index: If given, only edges touching this node are legal.
+        :return: Boolean array with one entry per edge
+        """
+        if node_index is None:
+            return self.road_frontier[player_index]
+
+        node_edges = self.topology.node_edges(node_index)
+        mask = np.zeros(len(self.edges), dtype=bool)
+        mask[node_edges] = self.road_frontier[player_index, node_edges]
+        return mask
+
+
+    def get_legal_edge_indices(self, player_index, node_index=None):
+        """
+        Gets the indices of all edges the player can legally build a road on.
+
+        :param player_index: The index of the player building the road.
+        :param node_index: If given, only edges touching this node are legal.
+        :return: Array of legal edge indices
+        """
+        return np.flatnonzero(self.get_legal_road_mask(player_index, node_index))
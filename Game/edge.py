@@ -1,14 +1,39 @@
+from constants import NO_OWNER
+
 class Edge:
     def __init__(self, index):
         """
         Create a new Edge. The edge is the spaces on the tiles that contain
-        the roads.
+        the roads. Its state is a view over the board's arrays.
 
         :param index: The index (id) of the road.
         """
         self.index = index
-        self.nodes = [] # Nodes the edge is touching
-        self.owned_by = None # Reference to the player that owns this edge
+        self.board = None # Board that stores the state of this edge
+
+
+    @property
+    def nodes(self):
+        """
+        Nodes the edge is touching.
+        """
+        return [self.board.nodes[i] for i in self.board.topology.edge_to_nodes[self.index]]
+
+
+    @property
+    def owned_by(self):
+        """
+        The player that owns this edge, or None if unowned.
+        """
+        return self.board.get_player(self.board.edge_owner[self.index])
+
+
+    @owned_by.setter
+    def owned_by(self, player):
+        if self.board.edge_owner[self.index] != NO_OWNER:
+            self.board.remove_road(self.index)
+        if player is not None:
+            self.board.place_road(self.index, player.index)
 
 
     def reset(self):
@@ -28,6 +53,5 @@ class Edge:
         :param node: The node to get its neighbour.
         :return: The neighbour of the specified node.
         """
-        for neighbouring_node in self.nodes:
-            if neighbouring_node != node:
-                return neighbouring_node
+        first, second = self.board.topology.edge_to_nodes[self.index]
+        return self.board.nodes[second if first == node.index else first]
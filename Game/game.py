@@ -1,35 +1,328 @@
+import struct
+import numpy as np
+import zobrist
 from player import Player
+from profiling import GAME_PHASES, BOARD_PHASES
 from topology import create_four_player_board
+from constants import (ActionType, TileType, NUM_RESOURCES, SETUP_PLAYER_ORDER, NUM_SETUP_STEPS,
+                       ROAD_COST, SETTLEMENT_COST, CITY_COST)
+
+# Serialized turn state: current_player, setup_step, last_settlement (-1 for None),
+# turn, has_rolled, robber_pending
+_TURN_STATE = struct.Struct("<bbbi??")
 
 class Game:
     def __init__(self):
         self.board = create_four_player_board()
         self.players = [Player(index) for index in range(4)]
+        self.board.players = self.players
+        for player in self.players:
+            player.board = self.board
+
+        # Turn state
+        self.current_player = SETUP_PLAYER_ORDER[0]
+        self.setup_step = 0 # NUM_SETUP_STEPS once setup is over
+        self.last_settlement = None # The setup road must touch it
+        self.turn = 0
+        self.has_rolled = False
+        self.robber_pending = False # A 7 was rolled and the robber must be moved
 
-    def reset(self):
+        # Undo records of the actions applied with apply
+        self._undo_stack = []
+
+        # Cost of each building (resources are removed, so stored negated)
+        self._cost = {
+            ActionType.ROAD: -np.array(ROAD_COST, dtype=np.int16),
+            ActionType.SETTLEMENT: -np.array(SETTLEMENT_COST, dtype=np.int16),
+            ActionType.CITY: -np.array(CITY_COST, dtype=np.int16)
+        }
+
+    def reset(self, rng=None):
         """
         Reset the game by resetting the board and the players.
 
+        :param rng: random.Random used to shuffle the board (the random module if None)
         :return: None
         """
-        self.board.reset()
+        self.board.reset(rng)
         for player in self.players:
             player.reset()
 
-    def run_starting_positions(self):
+        self._set_turn_state((SETUP_PLAYER_ORDER[0], 0, None, 0, False, False))
+        self._undo_stack.clear()
+
+    def run_starting_positions(self, setup_agent=None):
         """
         Gets the starting settlements and roads for each player
-        and applies them to the board.
+        and applies them to the board, in snake order.
 
+        :param setup_agent: Agent (such as MCTSSetupAgent) choosing the positions,
+            or a list with an agent for each player. If None, the players choose.
         :return: None
         """
-        # Get their first settlement and road
-        for player in self.players:
-            settlement_idx, road_idx = player.get_starting_position(self.board)
+        while self.setup_step < NUM_SETUP_STEPS:
+            player = self.players[self.current_player]
+            agent = setup_agent[player.index] if isinstance(setup_agent, (list, tuple)) else setup_agent
+
+            # Get their settlement and road
+            if agent is None:
+                settlement_idx, road_idx = player.get_starting_position(self.board)
+            else:
+                settlement_idx, road_idx = agent.get_starting_position(self)
 
-        # Get their second settlement and road
-        for player in reversed(self.players):
-            settlement_idx, road_idx = player.get_starting_position(self.board)
+            self.play(ActionType.SETTLEMENT, settlement_idx)
+            if road_idx is None:
+                self.play(ActionType.END_TURN, 0)
+            else:
+                self.play(ActionType.ROAD, road_idx)
 
     def assign_road(self, player_idx, road_idx):
-        self.board.edges[road_idx].owned_by = self.players[player_idx]
\ No newline at end of file
+        self.board.place_road(road_idx, player_idx)
+
+    @property
+    def zobrist_key(self):
+        """
+        The Zobrist key of the position: the board's key (maintained on every
+        change) combined with the keys of the turn state.
+        """
+        key = self.board.zobrist_key ^ zobrist.PLAYER_KEYS[self.current_player] ^ zobrist.SETUP_STEP_KEYS[self.setup_step]
+        if self.has_rolled:
+            key ^= zobrist.ROLLED_KEY
+        if self.robber_pending:
+            key ^= zobrist.ROBBER_PENDING_KEY
+        if self.setup_step < NUM_SETUP_STEPS and self.setup_step % 2 == 1:
+            # The setup road must touch the last settlement
+            key ^= zobrist.LAST_SETTLEMENT_KEYS[self.last_settlement]
+        return key
+
+    # --- Profiling --- #
+
+    def enable_profiling(self, profiler):
+        """
+        Times the game's and the board's hot paths with a profiler.
+
+        :param profiler: The Profiler recording the timings
+        :return: None
+        """
+        profiler.attach(self, GAME_PHASES)
+        profiler.attach(self.board, BOARD_PHASES)
+
+    def disable_profiling(self, profiler):
+        """
+        Stops timing the game and the board.
+
+        :param profiler: The Profiler passed to enable_profiling
+        :return: None
+        """
+        profiler.detach(self)
+        profiler.detach(self.board)
+
+    # --- Snapshots --- #
+
+    def snapshot(self):
+        """
+        Copies the compact mutable state of the game (the board's state buffer
+        and the turn state). The topology and the views are not copied.
+
+        :return: Opaque snapshot to pass to restore
+        """
+        return self.board.snapshot(), self._get_turn_state()
+
+    def restore(self, snapshot):
+        """
+        Restores the game to a snapshot taken by snapshot. The undo stack is
+        not part of the snapshot, and is left as it is.
+
+        :param snapshot: The snapshot to restore
+        :return: None
+        """
+        board_snapshot, turn_state = snapshot
+        self.board.restore(board_snapshot)
+        self._set_turn_state(turn_state)
+
+    def clone(self):
+        """
+        Creates an independent copy of the game in its current state. The copy
+        shares the topology index with this game.
+
+        :return: The new game
+        """
+        game = Game()
+        game.restore(self.snapshot())
+        return game
+
+    def to_bytes(self):
+        """
+        Serializes the state of the game (the board and the turn state), for
+        storing on disk. The undo stack is not included.
+
+        :return: The state as bytes (always state_size long)
+        """
+        turn_state = self._get_turn_state()
+        last_settlement = -1 if self.last_settlement is None else self.last_settlement
+        return self.board.to_bytes() + _TURN_STATE.pack(*turn_state[:2], last_settlement, *turn_state[3:])
+
+    @property
+    def state_size(self):
+        """
+        The length of the bytes returned by to_bytes.
+        """
+        return self.board.state_size + _TURN_STATE.size
+
+    def load_bytes(self, data):
+        """
+        Restores the game from bytes returned by to_bytes.
+
+        :param data: The serialized state
+        :return: None
+        """
+        board_size = self.board.state_size
+        self.board.load_bytes(data[:board_size])
+        current_player, setup_step, last_settlement, turn, has_rolled, robber_pending = \
+            _TURN_STATE.unpack(data[board_size:board_size + _TURN_STATE.size])
+        last_settlement = None if last_settlement < 0 else last_settlement
+        self._set_turn_state((current_player, setup_step, last_settlement, turn, has_rolled, robber_pending))
+
+    def _get_turn_state(self):
+        return (self.current_player, self.setup_step, self.last_settlement,
+                self.turn, self.has_rolled, self.robber_pending)
+
+    def _set_turn_state(self, turn_state):
+        (self.current_player, self.setup_step, self.last_settlement,
+         self.turn, self.has_rolled, self.robber_pending) = turn_state
+        self.board.is_setup = self.setup_step < NUM_SETUP_STEPS
+
+    # --- Actions --- #
+
+    def play(self, action_type, index):
+        """
+        Plays an action for the current player, without recording it for undo.
+        The action is assumed to be legal.
+
+        :param action_type: The ActionType of the action
+        :param index: The node, edge, tile, or dice total the action targets
+        :return: None
+        """
+        self._do(action_type, index)
+
+    def apply(self, action_type, index):
+        """
+        Plays an action for the current player, and records it so it can be
+        reverted with undo. Used for depth-first search.
+
+        :param action_type: The ActionType of the action
+        :param index: The node, edge, tile, or dice total the action targets
+        :return: None
+        """
+        self._undo_stack.append(self._do(action_type, index))
+
+    def undo(self):
+        """
+        Reverts the last action recorded by apply.
+
+        :return: None
+        """
+        action_type, index, turn_state, robber_tile, resource_change = self._undo_stack.pop()
+
+        if action_type == ActionType.SETTLEMENT:
+            self.board.remove_settlement(index)
+        elif action_type == ActionType.ROAD:
+            self.board.remove_road(index)
+        elif action_type == ActionType.CITY:
+            self.board.remove_city(index)
+        elif action_type == ActionType.ROBBER:
+            self.board.move_robber(robber_tile)
+
+        if resource_change is not None:
+            player_index, amounts = resource_change
+            self.board.add_resources(-amounts, player_index)
+
+        self._set_turn_state(turn_state)
+
+    def _do(self, action_type, index):
+        """
+        Plays an action for the current player.
+
+        :param action_type: The ActionType of the action
+        :param index: The node, edge, tile, or dice total the action targets
+        :return: The undo record of the action
+        """
+        board = self.board
+        player = self.current_player
+        in_setup = self.setup_step < NUM_SETUP_STEPS
+        record = (self._get_turn_state(), board.robber_tile)
+        resource_change = None # (player index or None for all players, amounts added)
+
+        if action_type == ActionType.SETTLEMENT:
+            board.place_settlement(index, player)
+            if in_setup:
+                self.last_settlement = index
+                if self.setup_step >= len(SETUP_PLAYER_ORDER):
+                    resource_change = (player, self._get_starting_resources(index))
+                self.setup_step += 1
+            else:
+                resource_change = (player, self._cost[action_type])
+
+        elif action_type == ActionType.ROAD:
+            board.place_road(index, player)
+            if in_setup:
+                self._end_setup_placement()
+            else:
+                resource_change = (player, self._cost[action_type])
+
+        elif action_type == ActionType.CITY:
+            board.place_city(index)
+            resource_change = (player, self._cost[action_type])
+
+        elif action_type == ActionType.ROLL:
+            self.has_rolled = True
+            if index == 7:
+                self.robber_pending = True
+            else:
+                # produce adds the resources itself, so only record them for undo
+                resource_change = (None, board.produce(index).copy())
+
+        elif action_type == ActionType.ROBBER:
+            board.move_robber(index)
+            self.robber_pending = False
+
+        elif action_type == ActionType.END_TURN:
+            if in_setup:
+                # Only happens when every edge at the settlement is taken, so the road is skipped
+                self._end_setup_placement()
+            else:
+                self.current_player = (player + 1) % len(self.players)
+                self.turn += 1
+                self.has_rolled = False
+
+        if resource_change is not None and action_type != ActionType.ROLL:
+            player_index, amounts = resource_change
+            board.add_resources(amounts, player_index)
+
+        return (action_type, index) + record + (resource_change,)
+
+    def _end_setup_placement(self):
+        """
+        Moves setup on to the next player in snake order, ending setup after the
+        last placement.
+
+        :return: None
+        """
+        self.setup_step += 1
+        if self.setup_step < NUM_SETUP_STEPS:
+            self.current_player = SETUP_PLAYER_ORDER[self.setup_step // 2]
+        else:
+            self.current_player = SETUP_PLAYER_ORDER[0]
+            self.board.is_setup = False
+
+    def _get_starting_resources(self, node_index):
+        """
+        Gets the resources for a second starting settlement: one from every
+        tile touching the node.
+
+        :param node_index: The node of the settlement
+        :return: Array of the amount of each resource
+        """
+        resources = self.board.tile_resource[self.board.topology.node_tiles(node_index)]
+        resources = resources[resources != TileType.DESERT.value]
+        return np.bincount(resources, minlength=NUM_RESOURCES).astype(np.int16)
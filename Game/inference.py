@@ -0,0 +1,274 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from constants import NO_OWNER, NUM_TILES, NUM_NODES, NUM_PLAYERS, NUM_ACTIONS, SETTLEMENT_ACTION_OFFSET, ROAD_ACTION_OFFSET
+
+class DecisionBroker:
+    def __init__(self, policy, max_batch_size=256, max_wait=0.002):
+        """
+        Batches decisions from many concurrent games into single calls of a
+        batched policy. Games submit an observation and an action mask (from
+        any thread, or from asyncio with decide_async), and a broker thread
+        gathers the requests until the batch is full or the oldest request has
+        waited max_wait seconds, calls the policy once, and routes each action
+        back to the game that asked for it.
+
+        :param policy: Function (observations, action masks) -> actions. The
+            observations are a dict of arrays (or an array) with the batch as
+            the first dimension, and the action masks are (batch x actions).
+        :param max_batch_size: Largest number of decisions in a policy call
+        :param max_wait: Seconds a request waits for the batch to fill
+        """
+        self.policy = policy
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        # Statistics
+        self.num_batches = 0
+        self.num_decisions = 0
+
+        # Requests are queued under the lock, so none can be queued after the thread
+        # has stopped and failed the leftover requests
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="DecisionBroker", daemon=True)
+        self._thread.start()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    @property
+    def mean_batch_size(self):
+        return self.num_decisions / self.num_batches if self.num_batches else 0.0
+
+
+    def submit(self, obs, action_mask):
+        """
+        Submits a decision request.
+
+        :param obs: The observation (a dict of arrays, or an array)
+        :param action_mask: Boolean array of the legal actions
+        :return: Future holding the chosen action
+        """
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("The broker is closed")
+            self._requests.put((obs, action_mask, future))
+        return future
+
+
+    def decide(self, obs, action_mask):
+        """
+        Submits a decision request and waits for the action.
+
+        :param obs: The observation (a dict of arrays, or an array)
+        :param action_mask: Boolean array of the legal actions
+        :return: The chosen action
+        """
+        return self.submit(obs, action_mask).result()
+
+
+    async def decide_async(self, obs, action_mask):
+        """
+        Submits a decision request from a coroutine and awaits the action.
+
+        :param obs: The observation (a dict of arrays, or an array)
+        :param action_mask: Boolean array of the legal actions
+        :return: The chosen action
+        """
+        return await asyncio.wrap_future(self.submit(obs, action_mask))
+
+
+    def close(self):
+        """
+        Answers the requests already submitted and stops the broker thread.
+
+        :return: None
+        """
+        if self._thread is None:
+            return
+        with self._lock:
+            if not self._stopped:
+                self._requests.put(None)
+        self._thread.join()
+        self._thread = None
+
+
+    def _run(self):
+        """
+        Gathers batches of requests and answers them until closed.
+
+        :return: None
+        """
+        try:
+            closing = False
+            while not closing:
+                request = self._requests.get()
+                if request is None:
+                    break
+
+                # Wait for more requests until the batch is full or the first one has waited long enough
+                batch = [request]
+                deadline = time.perf_counter() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    try:
+                        request = self._requests.get(timeout=max(deadline - time.perf_counter(), 0))
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        closing = True
+                        break
+                    batch.append(request)
+
+                try:
+                    self._answer(batch)
+                except Exception as error:
+                    self._fail(batch, error)
+        finally:
+            # Fail the requests still queued, and refuse new ones
+            with self._lock:
+                self._stopped = True
+                while True:
+                    try:
+                        request = self._requests.get_nowait()
+                    except queue.Empty:
+                        break
+                    if request is not None:
+                        self._fail([request], RuntimeError("The broker is closed"))
+
+
+    def _answer(self, batch):
+        """
+        Calls the policy on a batch of requests and resolves their futures.
+
+        :param batch: List of (observation, action mask, future) tuples
+        :return: None
+        """
+        # Requests cancelled while waiting (such as a timed out decide_async) are dropped
+        batch = [request for request in batch if request[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        observations, masks, futures = zip(*batch)
+        try:
+            if isinstance(observations[0], dict):
+                obs = {key: np.stack([observation[key] for observation in observations]) for key in observations[0]}
+            else:
+                obs = np.stack(observations)
+            actions = [int(action) for action in self.policy(obs, np.stack(masks))]
+            if len(actions) != len(batch):
+                raise ValueError(f"The policy returned {len(actions)} actions for a batch of {len(batch)}")
+        except Exception as error:
+            self._fail(batch, error)
+            return
+
+        self.num_batches += 1
+        self.num_decisions += len(batch)
+        for future, action in zip(futures, actions):
+            future.set_result(action)
+
+
+    @staticmethod
+    def _fail(batch, error):
+        """
+        Resolves the futures of a batch of requests with an exception.
+
+        :param batch: List of (observation, action mask, future) tuples
+        :param error: The exception
+        :return: None
+        """
+        for _, _, future in batch:
+            if future.done() or not (future.running() or future.set_running_or_notify_cancel()):
+                continue
+            future.set_exception(error)
+
+
+class LinearMockPolicy:
+    def __init__(self, observation_size, num_actions=NUM_ACTIONS, seed=None):
+        """
+        A stand-in for a neural policy, for testing the broker: one random
+        linear layer from the flattened observation to the action logits,
+        followed by a masked argmax. Records the size of every batch.
+
+        :param observation_size: Number of values in a flattened observation
+        :param num_actions: Number of actions
+        :param seed: Seed of the weights
+        """
+        rng = np.random.default_rng(seed)
+        self.weights = rng.standard_normal((observation_size, num_actions)).astype(np.float32)
+        self.batch_sizes = []
+
+
+    def __call__(self, obs, action_mask):
+        if isinstance(obs, dict):
+            obs = np.concatenate([obs[key].reshape(len(action_mask), -1) for key in sorted(obs)], axis=1)
+        logits = obs.reshape(len(action_mask), -1).astype(np.float32) @ self.weights
+        self.batch_sizes.append(len(action_mask))
+        return np.argmax(np.where(action_mask, logits, -np.inf), axis=1)
+
+
+class BrokerSetupAgent:
+    # Size of the observation built by get_observation, once flattened
+    OBSERVATION_SIZE = 2 * NUM_TILES + NUM_NODES
+
+    def __init__(self, broker):
+        """
+        A setup agent (see Game.run_starting_positions) that asks a decision
+        broker for its settlements and roads, so games run on many threads
+        share batched policy calls. Each placement is two decisions, using the
+        settlement and road parts of the flat action layout.
+
+        :param broker: The DecisionBroker
+        """
+        self.broker = broker
+
+
+    @staticmethod
+    def get_observation(game):
+        """
+        Encodes the board for the policy, relative to the current player.
+
+        :param game: The game
+        :return: Dict of the tile resources, tile dice, and node owners
+        """
+        board = game.board
+        owner = board.node_owner
+        relative_owner = np.where(owner == NO_OWNER, 0, (owner - game.current_player) % NUM_PLAYERS + 1)
+        return {"tile_resource": board.tile_resource.copy(), "tile_dice": board.tile_dice.copy(),
+                "node_owner": relative_owner.astype(np.int8)}
+
+
+    def get_starting_position(self, game):
+        """
+        Gets the starting settlement and road for the current player.
+
+        :param game: The game, waiting for a setup settlement
+        :return: (Settlement index, Road index) tuple (road is None if no edge is free)
+        """
+        board = game.board
+        mask = np.zeros(NUM_ACTIONS, dtype=bool)
+        mask[SETTLEMENT_ACTION_OFFSET:ROAD_ACTION_OFFSET] = board.get_legal_settlement_mask()
+        settlement = self.broker.decide(self.get_observation(game), mask) - SETTLEMENT_ACTION_OFFSET
+
+        # The road must touch the settlement, which is not placed yet, so only free edges are checked
+        edges = board.topology.node_edges(settlement)
+        free_edges = edges[board.edge_owner[edges] == NO_OWNER]
+        if len(free_edges) == 0:
+            return settlement, None
+
+        mask = np.zeros(NUM_ACTIONS, dtype=bool)
+        mask[ROAD_ACTION_OFFSET + free_edges] = True
+        road = self.broker.decide(self.get_observation(game), mask) - ROAD_ACTION_OFFSET
+        return settlement, road
+
@@ -1,15 +1,55 @@
+from constants import NO_OWNER, CITY
+
 class Node:
     def __init__(self, index):
         """
         Create a new Node. The node is the spaces on the tiles that contain
-        settlements and cities.
+        settlements and cities. Its state is a view over the board's arrays.
 
         :param index: The index (id) of the node
         """
         self.index = index
-        self.edges = [] # Edges the node is touching
-        self.owned_by = None # Reference to the player that owns this edge
-        self.city = False # True if city, false otherwise
+        self.board = None # Board that stores the state of this node
+
+
+    @property
+    def edges(self):
+        """
+        Edges the node is touching.
+        """
+        return [self.board.edges[i] for i in self.board.topology.node_edges(self.index)]
+
+
+    @property
+    def owned_by(self):
+        """
+        The player that owns this node, or None if unowned.
+        """
+        return self.board.get_player(self.board.node_owner[self.index])
+
+
+    @owned_by.setter
+    def owned_by(self, player):
+        if self.board.node_owner[self.index] != NO_OWNER:
+            self.board.remove_settlement(self.index)
+        if player is not None:
+            self.board.place_settlement(self.index, player.index)
+
+
+    @property
+    def city(self):
+        """
+        True if city, false otherwise.
+        """
+        return self.board.node_level[self.index] == CITY
+
+
+    @city.setter
+    def city(self, is_city):
+        if is_city and not self.city:
+            self.board.place_city(self.index)
+        elif not is_city and self.city:
+            self.board.remove_city(self.index)
 
 
     def reset(self):
@@ -19,7 +59,6 @@ class Node:
         :return: None
         """
         self.owned_by = None
-        self.city = False
 
 
     def get_unowned_edges(self):
@@ -33,4 +72,4 @@ class Node:
             if edge.owned_by is None:
                 unowned_edges.append(edge)
 
-        return unowned_edges
\ No newline at end of file
+        return unowned_edges
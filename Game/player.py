@@ -1,32 +1,67 @@
 import random
+from constants import TileType
 
 class Player:
     def __init__(self, index):
         """
+        Create a new player. The player's resources are a view over the
+        board's resource array.
 
         :param index:
         """
         self.index = index
+        self.board = None # Board that stores the player's resources (assigned by the game)
 
-        # Initialize the player's resources
-        self.num_wool = 0
-        self.num_brick = 0
-        self.num_lumber = 0
-        self.num_ore = 0
-        self.num_grain = 0
+
+    @property
+    def num_wool(self):
+        return int(self.board.resources[self.index, TileType.PASTURE.value])
+
+    @num_wool.setter
+    def num_wool(self, value):
+        self.board.set_resource(self.index, TileType.PASTURE.value, value)
+
+    @property
+    def num_brick(self):
+        return int(self.board.resources[self.index, TileType.HILL.value])
+
+    @num_brick.setter
+    def num_brick(self, value):
+        self.board.set_resource(self.index, TileType.HILL.value, value)
+
+    @property
+    def num_lumber(self):
+        return int(self.board.resources[self.index, TileType.FOREST.value])
+
+    @num_lumber.setter
+    def num_lumber(self, value):
+        self.board.set_resource(self.index, TileType.FOREST.value, value)
+
+    @property
+    def num_ore(self):
+        return int(self.board.resources[self.index, TileType.MOUNTAIN.value])
+
+    @num_ore.setter
+    def num_ore(self, value):
+        self.board.set_resource(self.index, TileType.MOUNTAIN.value, value)
+
+    @property
+    def num_grain(self):
+        return int(self.board.resources[self.index, TileType.FIELD.value])
+
+    @num_grain.setter
+    def num_grain(self, value):
+        self.board.set_resource(self.index, TileType.FIELD.value, value)
 
 
     def reset(self):
         """
-        Reset the player for a new game.
+        Reset the player for a new game. The resources are removed through
+        the board, so its Zobrist key stays up to date.
 
         :return:
         """
-        self.num_wool = 0
-        self.num_brick = 0
-        self.num_lumber = 0
-        self.num_ore = 0
-        self.num_grain = 0
+        self.board.add_resources(-self.board.resources[self.index], self.index)
 
 
     @staticmethod
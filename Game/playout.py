@@ -0,0 +1,290 @@
+import random
+import numpy as np
+from bitboard import BitBoard, iter_bits
+from constants import (TileType, NO_OWNER, SETTLEMENT, NUM_PLAYERS, NUM_TILES, NUM_RESOURCES, NUM_SETUP_STEPS,
+                       SETUP_PLAYER_ORDER, ROAD_COST, SETTLEMENT_COST, CITY_COST, VICTORY_POINTS_TO_WIN)
+
+# Resource indices (the TileType value that produces them)
+_LUMBER, _BRICK, _WOOL, _GRAIN, _ORE = (TileType.FOREST.value, TileType.HILL.value, TileType.PASTURE.value,
+                                        TileType.FIELD.value, TileType.MOUNTAIN.value)
+
+
+def _nth_bit(mask, n):
+    """
+    :param mask: The mask
+    :param n: Index of the set bit, counting from the lowest
+    :return: The index of the nth set bit of the mask
+    """
+    for index in iter_bits(mask):
+        if n == 0:
+            return index
+        n -= 1
+
+
+def _bank_trade(bitboard, player_index, res):
+    """
+    Trades four of a resource with the bank for one resource the player
+    lacks for the first piece they have room for (a settlement, then a city,
+    then a road), keeping the resources that piece needs.
+
+    :param bitboard: The BitBoard of the playout
+    :param player_index: The index of the player trading
+    :param res: The player's resources (modified)
+    :return: Whether a trade was made
+    """
+    if max(res) < 4:
+        return False
+    if bitboard.legal_settlements(player_index):
+        cost = SETTLEMENT_COST
+    elif bitboard.legal_cities(player_index):
+        cost = CITY_COST
+    elif bitboard.legal_roads(player_index):
+        cost = ROAD_COST
+    else:
+        return False
+
+    wanted = [resource for resource in range(NUM_RESOURCES) if res[resource] < cost[resource]]
+    spare = [resource for resource in range(NUM_RESOURCES) if res[resource] - cost[resource] >= 4]
+    if not wanted or not spare:
+        return False
+    given = max(spare, key=res.__getitem__)
+    res[given] -= 4
+    res[min(wanted, key=res.__getitem__)] += 1
+    return True
+
+
+def _best_bit(mask, scores):
+    """
+    :param mask: The mask
+    :param scores: Score of every bit index
+    :return: The index of the set bit with the highest score
+    """
+    return max(iter_bits(mask), key=scores.__getitem__)
+
+
+class PlayoutSimulator:
+    def __init__(self, policy="random", max_turns=500, bank_trade=True, seed=None):
+        """
+        Plays games from a position to the end with random or greedy moves,
+        for Monte Carlo evaluation (of openings, for example). The rules are
+        those of CatanEnvironment: every turn starts with a roll, a 7 moves the
+        robber to a random other tile, and the first player to reach
+        VICTORY_POINTS_TO_WIN points from buildings wins.
+
+        A playout runs on plain Python lists and a BitBoard copied from the
+        game, so there is no rendering, gym, or NumPy overhead per move, and
+        the game itself is not changed.
+
+        Unlike the environment, players can trade 4:1 with the bank (see
+        bank_trade). Without trading, a player whose settlements touch no
+        lumber or brick can never build, and many games never end.
+
+        :param policy: "random" picks uniformly among the legal actions (ending
+            the turn included), like a random agent in the environment.
+            "greedy" builds a city, then a settlement, then a road, whenever it
+            can, at the node with the most pips (roads are random).
+        :param max_turns: Number of turns after which a game is stopped without a winner
+        :param bank_trade: Whether a player who can afford nothing trades four
+            of a spare resource with the bank for one they lack
+        :param seed: Seed of the dice and the moves
+        """
+        assert policy in ("random", "greedy")
+        self.policy = policy
+        self.max_turns = max_turns
+        self.bank_trade = bank_trade
+        self.rng = random.Random(seed)
+
+
+    def playout(self, game):
+        """
+        Plays one game from the position to the end.
+
+        :param game: The Game to start from (not modified)
+        :return: Tuple of (winner index or NO_OWNER if stopped at max_turns,
+            list of each player's victory points, turn the game ended on)
+        """
+        return self._playout(self._load(game))
+
+
+    def run(self, game, num_playouts):
+        """
+        Plays a batch of games from the same position, loading the position
+        once, and summarizes the results.
+
+        :param game: The Game to start from (not modified)
+        :param num_playouts: Number of games to play
+        :return: Dict of the results: "winners" (game -> winner index, NO_OWNER
+            if stopped), "victory_points" (game -> points of each player),
+            "turns" (game -> turn the game ended on), "win_rate" (of each player),
+            "stopped_rate" (games stopped at max_turns), and
+            "victory_point_distribution" (player x points -> fraction of games)
+        """
+        position = self._load(game)
+        winners = np.empty(num_playouts, dtype=np.int8)
+        victory_points = np.empty((num_playouts, NUM_PLAYERS), dtype=np.int16)
+        turns = np.empty(num_playouts, dtype=np.int32)
+        for index in range(num_playouts):
+            winners[index], victory_points[index], turns[index] = self._playout(position)
+
+        distribution = np.zeros((NUM_PLAYERS, VICTORY_POINTS_TO_WIN + 1), dtype=np.float64)
+        np.add.at(distribution, (np.arange(NUM_PLAYERS), np.minimum(victory_points, VICTORY_POINTS_TO_WIN)), 1)
+        return {
+            "winners": winners,
+            "victory_points": victory_points,
+            "turns": turns,
+            "win_rate": np.bincount(winners[winners != NO_OWNER], minlength=NUM_PLAYERS) / num_playouts,
+            "stopped_rate": np.count_nonzero(winners == NO_OWNER) / num_playouts,
+            "victory_point_distribution": distribution / num_playouts
+        }
+
+
+    def _load(self, game):
+        """
+        Copies what a playout needs from the game into plain Python objects.
+
+        :param game: The Game
+        :return: Tuple of the position, shared by the playouts started from it
+        """
+        board = game.board
+        topology = board.topology
+
+        # Production of each dice total, as (tile, node, resource) triples
+        production = [[] for _ in range(13)]
+        for dice_total in range(13):
+            start, end = board.production_indptr[dice_total], board.production_indptr[dice_total + 1]
+            production[dice_total] = list(zip(board.production_tiles[start:end].tolist(),
+                                              board.production_nodes[start:end].tolist(),
+                                              board.production_resources[start:end].tolist()))
+
+        # Resources of the tiles around each node (for the second setup settlement), and node pips
+        tile_resource = board.tile_resource.tolist()
+        tile_pips = np.where(board.tile_dice > 0, 6 - np.abs(7 - board.tile_dice.astype(np.int64)), 0).tolist()
+        node_tiles = [topology.node_tiles(node_index).tolist() for node_index in range(len(board.nodes))]
+        node_resources = [[tile_resource[tile] for tile in tiles if tile_resource[tile] != TileType.DESERT.value]
+                          for tiles in node_tiles]
+        node_pips = [sum(tile_pips[tile] for tile in tiles) for tiles in node_tiles]
+
+        turn_state = (game.current_player, game.setup_step, game.last_settlement, game.turn,
+                      game.has_rolled, game.robber_pending, board.robber_tile)
+        return (BitBoard.from_board(board), board.node_owner.tolist(), board.node_level.tolist(),
+                board.resources.tolist(), production, node_resources, node_pips, turn_state)
+
+
+    def _playout(self, position):
+        """
+        Plays one game from a loaded position.
+
+        :param position: Position returned by _load
+        :return: Tuple of (winner index or NO_OWNER, list of victory points, turn the game ended on)
+        """
+        base_bitboard, base_owner, base_level, base_resources, production, node_resources, node_pips, turn_state = position
+        bitboard = base_bitboard.copy()
+        node_owner = base_owner.copy()
+        node_level = base_level.copy()
+        resources = [row.copy() for row in base_resources]
+        player, setup_step, last_settlement, turn, has_rolled, robber_pending, robber = turn_state
+        greedy = self.policy == "greedy"
+        bank_trade = self.bank_trade
+        random_value = self.rng.random
+        victory_points = [bitboard.settlements[index].bit_count() + bitboard.cities[index].bit_count()
+                          for index in range(NUM_PLAYERS)]
+
+        # Finish the setup: a settlement and then a road for each placement
+        while setup_step < NUM_SETUP_STEPS:
+            player = SETUP_PLAYER_ORDER[setup_step // 2]
+            if setup_step % 2 == 0:
+                legal = bitboard.legal_settlements(is_setup=True)
+                if greedy:
+                    node = _best_bit(legal, node_pips)
+                else:
+                    node = _nth_bit(legal, int(random_value() * legal.bit_count()))
+                bitboard.place_settlement(node, player)
+                node_owner[node], node_level[node] = player, SETTLEMENT
+                victory_points[player] += 1
+                if setup_step >= len(SETUP_PLAYER_ORDER):
+                    for resource in node_resources[node]:
+                        resources[player][resource] += 1
+                last_settlement = node
+            else:
+                legal = bitboard.legal_roads(player, last_settlement)
+                if legal:
+                    bitboard.place_road(_nth_bit(legal, int(random_value() * legal.bit_count())), player)
+            setup_step += 1
+            if setup_step == NUM_SETUP_STEPS:
+                player = SETUP_PLAYER_ORDER[0]
+
+        while turn < self.max_turns:
+            res = resources[player]
+
+            # Roll the dice at the start of the turn
+            if not has_rolled:
+                dice_total = int(random_value() * 6) + int(random_value() * 6) + 2
+                if dice_total == 7:
+                    robber_pending = True
+                else:
+                    for tile, node, resource in production[dice_total]:
+                        if tile != robber and node_owner[node] != NO_OWNER:
+                            resources[node_owner[node]][resource] += node_level[node]
+            if robber_pending:
+                new_tile = int(random_value() * (NUM_TILES - 1))
+                robber = new_tile + (new_tile >= robber)
+                robber_pending = False
+
+            # Build until the policy ends the turn
+            while True:
+                cities = bitboard.legal_cities(player) if res[_GRAIN] >= 2 and res[_ORE] >= 3 else 0
+                settlements = (bitboard.legal_settlements(player) if res[_LUMBER] and res[_BRICK] and res[_WOOL]
+                               and res[_GRAIN] else 0)
+                roads = bitboard.legal_roads(player) if res[_LUMBER] and res[_BRICK] else 0
+                if bank_trade and not (cities or settlements or roads) and _bank_trade(bitboard, player, res):
+                    continue
+
+                if greedy:
+                    if cities:
+                        choice, target = 0, _best_bit(cities, node_pips)
+                    elif settlements:
+                        choice, target = 1, _best_bit(settlements, node_pips)
+                    elif roads:
+                        choice, target = 2, _nth_bit(roads, int(random_value() * roads.bit_count()))
+                    else:
+                        break
+                else:
+                    num_cities, num_settlements = cities.bit_count(), settlements.bit_count()
+                    action = int(random_value() * (num_cities + num_settlements + roads.bit_count() + 1))
+                    if action < num_cities:
+                        choice, target = 0, _nth_bit(cities, action)
+                    elif action < num_cities + num_settlements:
+                        choice, target = 1, _nth_bit(settlements, action - num_cities)
+                    elif action < num_cities + num_settlements + roads.bit_count():
+                        choice, target = 2, _nth_bit(roads, action - num_cities - num_settlements)
+                    else:
+                        break
+
+                if choice == 0:
+                    bitboard.place_city(target)
+                    node_level[target] += 1
+                    res[_GRAIN] -= 2
+                    res[_ORE] -= 3
+                    victory_points[player] += 1
+                elif choice == 1:
+                    bitboard.place_settlement(target, player)
+                    node_owner[target], node_level[target] = player, SETTLEMENT
+                    res[_LUMBER] -= 1
+                    res[_BRICK] -= 1
+                    res[_WOOL] -= 1
+                    res[_GRAIN] -= 1
+                    victory_points[player] += 1
+                else:
+                    bitboard.place_road(target, player)
+                    res[_LUMBER] -= 1
+                    res[_BRICK] -= 1
+
+                if victory_points[player] >= VICTORY_POINTS_TO_WIN:
+                    return player, victory_points, turn
+
+            # End the turn
+            player = (player + 1) % NUM_PLAYERS
+            turn += 1
+            has_rolled = False
+
+        return NO_OWNER, victory_points, turn
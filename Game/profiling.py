@@ -0,0 +1,204 @@
+import json
+import sys
+import time
+
+# Phases timed on each class: method name -> phase name. Counters are the call
+# counts of the phases (steps, legality queries, observations built, frames drawn).
+GAME_PHASES = {
+    "reset": "game.reset",
+    "run_starting_positions": "game.setup",
+    "play": "game.play",
+    "apply": "game.apply",
+    "undo": "game.undo",
+    "snapshot": "game.snapshot",
+    "restore": "game.restore"
+}
+BOARD_PHASES = {
+    "reset": "board.reset",
+    "get_legal_settlement_mask": "board.legal_settlements",
+    "get_legal_road_mask": "board.legal_roads",
+    "produce": "board.produce",
+    "get_longest_road": "board.longest_road"
+}
+ENVIRONMENT_PHASES = {
+    # The public reset and step add the stats to the info after these return
+    "_reset": "env.reset",
+    "_step": "env.step",
+    "_get_obs": "env.obs"
+}
+RENDERER_PHASES = {
+    "reset": "renderer.reset",
+    "render": "renderer.render"
+}
+
+# Durations are binned by their power of two in nanoseconds
+NUM_HISTOGRAM_BINS = 48
+
+
+class Profiler:
+    def __init__(self, dump_interval=None, dump_file=None):
+        """
+        Per-phase timers and call counters. Methods are timed by wrapping them
+        on the instances passed to attach, so objects that are not attached
+        (or have been detached) run their methods as normal, at no cost.
+        Phase times are inclusive, so a phase that calls another phase
+        includes its time.
+
+        :param dump_interval: Seconds between dumps of the stats and
+            histograms (None to only dump when dump is called)
+        :param dump_file: File the dumps are written to as JSON lines (stderr if None)
+        """
+        self.dump_interval = dump_interval
+        self.dump_file = dump_file
+
+        self.calls = {}
+        self.total_ns = {}
+        self.max_ns = {}
+        self.histogram = {} # Phase -> list of counts, bin i holds durations < 2^i ns
+
+        self._attached = [] # (object, method name) of every wrapped method
+        self._next_dump = None if dump_interval is None else time.monotonic() + dump_interval
+
+
+    def attach(self, obj, phases):
+        """
+        Times methods of an object. Attaching an object twice to the same
+        profiler does nothing, but a method can only be wrapped by one
+        profiler (or other instance attribute) at a time.
+
+        :param obj: The object (Game, Board, CatanEnvironment, Renderer, ...)
+        :param phases: Dict of method name -> phase name (such as BOARD_PHASES)
+        :return: None
+        :raises RuntimeError: If a method is already replaced on the object by
+            something other than this profiler
+        """
+        for method_name in phases:
+            current = vars(obj).get(method_name)
+            if current is not None and getattr(current, "__profiler__", None) is not self:
+                raise RuntimeError(f"{type(obj).__name__}.{method_name} is already wrapped, "
+                                   f"detach it from its profiler first")
+
+        for method_name, phase in phases.items():
+            if method_name in vars(obj):
+                continue # Already attached
+            self.calls.setdefault(phase, 0)
+            self.total_ns.setdefault(phase, 0)
+            self.max_ns.setdefault(phase, 0)
+            self.histogram.setdefault(phase, [0] * NUM_HISTOGRAM_BINS)
+
+            setattr(obj, method_name, self._wrap(getattr(obj, method_name), phase))
+            self._attached.append((obj, method_name))
+
+
+    def detach(self, obj=None):
+        """
+        Stops timing the methods of an object, restoring its methods.
+
+        :param obj: The object, or None to detach every object
+        :return: None
+        """
+        remaining = []
+        for attached, method_name in self._attached:
+            if obj is None or attached is obj:
+                delattr(attached, method_name)
+            else:
+                remaining.append((attached, method_name))
+        self._attached = remaining
+
+
+    def _wrap(self, method, phase):
+        """
+        Wraps a bound method so that its calls are counted and timed.
+
+        :param method: The bound method
+        :param phase: The phase the calls are recorded under
+        :return: The wrapper
+        """
+        calls, total_ns, max_ns, histogram = self.calls, self.total_ns, self.max_ns, self.histogram[phase]
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                duration = perf_counter_ns() - start
+                calls[phase] += 1
+                total_ns[phase] += duration
+                if duration > max_ns[phase]:
+                    max_ns[phase] = duration
+                histogram[min(duration.bit_length(), NUM_HISTOGRAM_BINS - 1)] += 1
+                if self._next_dump is not None and time.monotonic() >= self._next_dump:
+                    self.dump()
+
+        timed.__wrapped__ = method
+        timed.__profiler__ = self
+        return timed
+
+
+    def count(self, phase, amount=1):
+        """
+        Adds to a counter without timing anything.
+
+        :param phase: Name of the counter
+        :param amount: Amount to add
+        :return: None
+        """
+        self.calls[phase] = self.calls.get(phase, 0) + amount
+
+
+    def stats(self):
+        """
+        Gets the call count and timings of every phase.
+
+        :return: Dict of phase -> dict of calls, total_s, mean_us, and max_us
+        """
+        stats = {}
+        for phase, calls in self.calls.items():
+            total_ns = self.total_ns.get(phase, 0)
+            stats[phase] = {
+                "calls": calls,
+                "total_s": total_ns / 1e9,
+                "mean_us": total_ns / calls / 1e3 if calls else 0.0,
+                "max_us": self.max_ns.get(phase, 0) / 1e3
+            }
+        return stats
+
+
+    def histograms(self):
+        """
+        Gets the histogram of the durations of every phase.
+
+        :return: Dict of phase -> list of (upper bound in us, count) for the non-empty bins
+        """
+        return {phase: [((1 << i) / 1e3, count) for i, count in enumerate(counts) if count]
+                for phase, counts in self.histogram.items()}
+
+
+    def dump(self):
+        """
+        Writes the stats and histograms as a JSON line to the dump file.
+
+        :return: None
+        """
+        if self.dump_interval is not None:
+            self._next_dump = time.monotonic() + self.dump_interval
+
+        record = {"time": time.time(), "stats": self.stats(), "histograms": self.histograms()}
+        dump_file = self.dump_file or sys.stderr
+        dump_file.write(json.dumps(record) + "\n")
+        dump_file.flush()
+
+
+    def reset(self):
+        """
+        Zeros every counter, timer, and histogram.
+
+        :return: None
+        """
+        for phase in self.calls:
+            self.calls[phase] = 0
+            self.total_ns[phase] = 0
+            self.max_ns[phase] = 0
+        for counts in self.histogram.values():
+            counts[:] = [0] * NUM_HISTOGRAM_BINS
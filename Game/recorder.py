@@ -0,0 +1,200 @@
+import json
+import os
+import queue
+import struct
+import threading
+import zlib
+import numpy as np
+
+class FrameRecorder:
+    def __init__(self, directory, image_format="png", max_queue=64, block=False):
+        """
+        Records frames to disk on a background thread. Frames are handed over
+        through a bounded queue, so the caller only pays for copying the frame.
+        When the queue is full the frame is dropped (or, with block, the caller
+        waits for room).
+
+        "png" writes one numbered PNG per frame. "raw" appends the frames to
+        frames.raw (rows x columns x RGB uint8 each), described by frames.json,
+        which can be read back with np.memmap.
+
+        :param directory: Directory the frames are written to (created if needed)
+        :param image_format: "png" or "raw"
+        :param max_queue: Number of frames that can wait to be written
+        :param block: Wait for room in the queue instead of dropping frames
+
+        If writing a frame fails, the worker stops writing (but keeps emptying
+        the queue, so the caller never waits on it), and the error is raised by
+        the next call to submit, flush, or close.
+        """
+        assert image_format in ("png", "raw")
+        self.directory = directory
+        self.image_format = image_format
+        self.block = block
+        os.makedirs(directory, exist_ok=True)
+
+        # Statistics
+        self.frames_submitted = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+
+        self._frame_shape = None
+        self._raw_file = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="FrameRecorder", daemon=True)
+        self._thread.start()
+
+
+    def submit(self, frame):
+        """
+        Queues a copy of a frame to be written.
+
+        :param frame: Array of the frame (rows x columns x RGB)
+        :return: True if the frame was queued, False if it was dropped
+        """
+        if self._thread is None:
+            raise RuntimeError("The recorder is closed")
+        self._raise_error()
+
+        index = self.frames_submitted
+        self.frames_submitted += 1
+
+        # Check for room first so that dropped frames are not copied
+        if not self.block and self._queue.full():
+            self.frames_dropped += 1
+            return False
+
+        item = (index, frame.copy())
+        if self.block:
+            self._queue.put(item)
+        else:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.frames_dropped += 1
+                return False
+        return True
+
+
+    def flush(self):
+        """
+        Waits until every queued frame is written.
+
+        :return: None
+        """
+        self._queue.join()
+        self._raise_error()
+
+
+    def close(self):
+        """
+        Writes the queued frames and stops the worker thread.
+
+        :return: Dict of the number of frames submitted, written, and dropped
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._raise_error()
+
+        return {"submitted": self.frames_submitted, "written": self.frames_written, "dropped": self.frames_dropped}
+
+
+    def _run(self):
+        """
+        Writes frames from the queue until the close sentinel arrives.
+
+        :return: None
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            index, frame = item
+            try:
+                if self._error is None:
+                    if self.image_format == "png":
+                        self._write_png(index, frame)
+                    else:
+                        self._write_raw(frame)
+                    self.frames_written += 1
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+        try:
+            if self._raw_file is not None:
+                self._raw_file.close()
+                self._write_raw_header()
+        except Exception as error:
+            if self._error is None:
+                self._error = error
+
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Writing a frame failed") from self._error
+
+
+    def _write_png(self, index, frame):
+        """
+        Writes a frame as a PNG named after its index.
+
+        :param index: Index of the frame among the submitted frames
+        :param frame: Array of the frame
+        :return: None
+        """
+        with open(os.path.join(self.directory, f"frame_{index:06d}.png"), "wb") as file:
+            file.write(self._encode_png(frame))
+
+
+    @staticmethod
+    def _encode_png(frame):
+        """
+        Encodes a frame as a PNG. zlib releases the GIL while compressing, so
+        unlike pygame's image saving this does not stall the simulation thread.
+
+        :param frame: Array of the frame (rows x columns x RGB)
+        :return: The PNG file as bytes
+        """
+        rows, columns = frame.shape[:2]
+
+        def chunk(chunk_type, data):
+            return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+        # Every row starts with its filter type (0 = none)
+        scanlines = np.zeros((rows, columns * 3 + 1), dtype=np.uint8)
+        scanlines[:, 1:] = frame.reshape(rows, columns * 3)
+
+        header = struct.pack(">IIBBBBB", columns, rows, 8, 2, 0, 0, 0) # 8-bit RGB
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+                chunk(b"IDAT", zlib.compress(scanlines.data, 6)) + chunk(b"IEND", b""))
+
+
+    def _write_raw(self, frame):
+        """
+        Appends a frame to the raw file.
+
+        :param frame: Array of the frame
+        :return: None
+        """
+        if self._raw_file is None:
+            self._frame_shape = frame.shape
+            self._raw_file = open(os.path.join(self.directory, "frames.raw"), "wb")
+        self._raw_file.write(frame.data)
+
+
+    def _write_raw_header(self):
+        """
+        Writes frames.json, which describes the frames in frames.raw.
+
+        :return: None
+        """
+        header = {"shape": [self.frames_written] + list(self._frame_shape), "dtype": np.dtype(np.uint8).name}
+        with open(os.path.join(self.directory, "frames.json"), "w") as file:
+            json.dump(header, file)
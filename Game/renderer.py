@@ -1,29 +1,43 @@
+import os
+import numpy as np
 import pygame
-from constants import TileType
+from recorder import FrameRecorder
+from constants import TileType, NO_OWNER, SETTLEMENT
 
 class Renderer:
-    def __init__(self, game, window_size=(1500, 900), image_scale=0.15):
+    def __init__(self, game, window_size=(1500, 900), image_scale=0.15, render_mode="human"):
         """
         The renderer that renders the game.
 
         :param game: The game object that stores all the game logic
         :param window_size: The size of the render window
         :param image_scale: The amount to scale the image by
+        :param render_mode: "human" draws to a window, "rgb_array" draws offscreen
+            (no display needed) and returns the frames as arrays
         """
+        assert render_mode in ("human", "rgb_array")
         self.game = game
         self.window_width, self.window_height = window_size
         self.image_scale = image_scale
+        self.render_mode = render_mode
 
         # Initialize Pygame
         pygame.init()
 
         # Create the screen
-        self.screen = pygame.display.set_mode((self.window_width, self.window_height))
-        pygame.display.set_caption("Catan")
+        if self.render_mode == "human":
+            self.screen = pygame.display.set_mode((self.window_width, self.window_height))
+            pygame.display.set_caption("Catan")
+        else:
+            self.screen = None
 
-        # Surfaces for layering
-        self.static_surface = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
-        self.dynamic_surface = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+        # The frame is drawn into a surface that shares its pixels with a NumPy
+        # array (rows x columns x RGB), so frames are returned without copying
+        self.frame_array = np.zeros((self.window_height, self.window_width, 3), dtype=np.uint8)
+        self.frame = pygame.image.frombuffer(self.frame_array, window_size, "RGB")
+
+        # Layer under the pieces, which is copied back to erase them
+        self.static_surface = pygame.Surface(window_size, pygame.SRCALPHA)
 
         # Load images
         self.hex_width, self.hex_height, self.hex_images = self._load_hex_images()
@@ -37,8 +51,9 @@ class Renderer:
 
         # Initialize storage for storing tile, node, and edge positions on the board
         self.tile_positions = []
-        self.node_positions = []
-        self.edge_positions = []
+        self.node_positions = [] # (x, y) of each node, in node index order
+        self.edge_positions = [] # (x, y) of each edge, in edge index order
+        self.edge_angles = [] # Degrees to rotate each edge by, in edge index order
 
         # Used for determining edge positions and sizing
         self.edge_width_frac = 0.4
@@ -58,33 +73,96 @@ class Renderer:
         # Used to get the color based on the player's index
         self.player_colour = [(255, 0, 0), (0, 0, 255), (255, 255, 255), (255, 165, 0)]
 
+        # Pre-rotated road sprites keyed by (colour, angle), and settlement and
+        # city sprites keyed by (colour, level). Kept across resets.
+        self._road_sprites = {}
+        self._building_sprites = {}
+
+        # Screen rect of the piece drawn on each node and edge (empty when nothing is drawn)
+        self._node_rects = []
+        self._edge_rects = []
+
+        # Board version drawn by the last frame, used to only redraw the pieces
+        # that changed since (-1 redraws everything)
+        self._drawn_version = -1
+
+        # Records every rendered frame while recording (see start_recording)
+        self.recorder = None
+
 
     def reset(self):
         # Reset tile positions
         self.tile_positions = []
-        self.node_positions = []
-        self.edge_positions = []
-
-        # Clear both layers
-        self.static_surface.fill((0, 0, 0, 0))
-        self.dynamic_surface.fill((0, 0, 0, 0))
 
         # Build static layer
+        self.static_surface.fill((0, 0, 0, 0))
         self._draw_static_layer()
 
+        # Node and edge positions follow from the tile positions
+        self._compute_piece_positions()
+
+        # Redraw every piece on the next frame
+        self._drawn_version = -1
+
 
     def render(self):
-        self._draw_dynamic_layer()
-        self.screen.blit(self.static_surface, (0, 0))
-        self.screen.blit(self.dynamic_surface, (0, 0))
-        pygame.display.flip()
+        """
+        Draws the pieces that changed since the last frame.
+
+        :return: The frame (rows x columns x RGB) in rgb_array mode, which is
+            overwritten by the next frame, or None in human mode
+        """
+        dirty_rects = self._draw_dynamic_layer()
+
+        if self.recorder is not None:
+            self.recorder.submit(self.frame_array)
 
+        if self.render_mode == "human":
+            if dirty_rects is None:
+                self.screen.blit(self.frame, (0, 0))
+                pygame.display.flip()
+            elif dirty_rects:
+                for rect in dirty_rects:
+                    self.screen.blit(self.frame, rect, rect)
+                pygame.display.update(dirty_rects)
+            return None
 
-    @staticmethod
-    def close():
+        return self.frame_array
+
+
+    def start_recording(self, directory, image_format="png", max_queue=64, block=False):
+        """
+        Starts recording every rendered frame to disk on a background thread.
+
+        :param directory: Directory the frames are written to
+        :param image_format: "png" for a PNG per frame, "raw" for one raw file
+        :param max_queue: Number of frames that can wait to be written
+        :param block: Wait for room in the queue instead of dropping frames
+        :return: The FrameRecorder
+        """
+        self.stop_recording()
+        self.recorder = FrameRecorder(directory, image_format, max_queue, block)
+        return self.recorder
+
+
+    def stop_recording(self):
+        """
+        Stops recording, after writing the frames still queued.
+
+        :return: Dict of the number of frames submitted, written, and dropped (None if not recording)
+        """
+        if self.recorder is None:
+            return None
+        # Cleared first, so a write error raised by close does not leave a closed recorder
+        recorder, self.recorder = self.recorder, None
+        return recorder.close()
+
+
+    def close(self):
         """
         Close the environment and clean up resources.
         """
+        self.stop_recording()
         pygame.quit()
 
 
@@ -109,7 +187,7 @@ class Renderer:
         ]
 
         # Get hex height and width from image
-        img = pygame.image.load(path + "desert.png").convert_alpha()
+        img = self._load_image(path + "desert.png")
         src_width, src_height = img.get_size()
 
         # Scale hex height and width down
@@ -118,7 +196,7 @@ class Renderer:
 
         # Scale all images based on width and height
         for tile_type, filename in hex_types:
-            img = pygame.image.load(filename).convert_alpha()
+            img = self._load_image(filename)
             img = pygame.transform.scale(img, (hex_width, hex_height))
             images[tile_type] = img
 
@@ -127,16 +205,48 @@ class Renderer:
 
     def _load_water_image(self):
         """
-        Loads and scales the outline of the board
+        Loads and scales the outline of the board. The water image is not in
+        every checkout, so without it a plain water hexagon is drawn in its place.
 
         :return: The single image of the outline
         """
-        img = pygame.image.load("./Assets/Water/water-full.png").convert_alpha()
+        filename = "./Assets/Water/water-full.png"
+        if not os.path.exists(filename):
+            return self._draw_water_image()
+        img = self._load_image(filename)
         src_width, src_height = img.get_size()
         img = pygame.transform.scale(img, (src_width * self.image_scale, src_height * self.image_scale))
         return img
 
 
+    def _draw_water_image(self):
+        """
+        Draws a stand-in for the water image: a hexagon around the land hexes,
+        with the land placed at the same offsets (hex_start_x and hex_start_y)
+        as in the real image.
+
+        :return: The image of the outline
+        """
+        # Measured from the hex layout: the widest row starts one hex left of
+        # hex_start_x, and the margins around the land are the same on each side
+        width, height = 6255 * self.image_scale, 5408 * self.image_scale
+        img = pygame.Surface((width, height), pygame.SRCALPHA)
+        pygame.draw.polygon(img, (52, 129, 184), [(width / 4, 0), (3 * width / 4, 0), (width, height / 2),
+                                                  (3 * width / 4, height), (width / 4, height), (0, height / 2)])
+        return img
+
+
+    def _load_image(self, filename):
+        """
+        Loads an image, converted to the display's pixel format when there is a display.
+
+        :param filename: Path of the image
+        :return: The image
+        """
+        img = pygame.image.load(filename)
+        return img.convert_alpha() if self.screen is not None else img
+
+
     def _draw_static_layer(self):
         # Draw background for the board
         self.static_surface.fill((239, 218, 139))
@@ -170,74 +280,153 @@ class Renderer:
                 hex_x += self.hex_width + self.hex_padding_x
 
     def _draw_dynamic_layer(self):
-        # Reset the dynamic layer
-        self.dynamic_surface.fill((0, 0, 0, 0))
+        """
+        Brings the frame up to date with the board. Only the pieces stamped
+        since the last frame are redrawn: their old area is restored from the
+        static layer, and the pieces overlapping it are drawn again on top.
+
+        :return: List of the rects that changed, or None if the whole frame was redrawn
+        """
+        board = self.game.board
+
+        if self._drawn_version < 0:
+            # Redraw everything
+            self.frame.blit(self.static_surface, (0, 0))
+            self._node_rects = [pygame.Rect(0, 0, 0, 0) for _ in board.nodes]
+            self._edge_rects = [pygame.Rect(0, 0, 0, 0) for _ in board.edges]
+            for edge_index in np.flatnonzero(board.edge_owner != NO_OWNER):
+                self._draw_edge(edge_index)
+            for node_index in np.flatnonzero(board.node_owner != NO_OWNER):
+                self._draw_node(node_index)
+            self._drawn_version = board.version
+            return None
+
+        if board.version == self._drawn_version:
+            return []
+
+        changed_nodes = np.flatnonzero(board.node_version > self._drawn_version)
+        changed_edges = np.flatnonzero(board.edge_version > self._drawn_version)
+        self._drawn_version = board.version
+
+        # Erase the changed pieces, and draw them where they are now
+        dirty_rects = []
+        for owner, rects, indices, draw in ((board.node_owner, self._node_rects, changed_nodes, self._draw_node),
+                                            (board.edge_owner, self._edge_rects, changed_edges, self._draw_edge)):
+            for index in indices:
+                if rects[index].width:
+                    dirty_rects.append(rects[index])
+                    self.frame.blit(self.static_surface, rects[index], rects[index])
+                    rects[index] = pygame.Rect(0, 0, 0, 0)
+                if owner[index] != NO_OWNER:
+                    draw(index)
+                    dirty_rects.append(rects[index])
+
+        # Redraw every piece overlapping the changed area, roads under buildings
+        redraw_edges, redraw_nodes = set(changed_edges.tolist()), set(changed_nodes.tolist())
+        for rect in dirty_rects:
+            redraw_edges.update(rect.collidelistall(self._edge_rects))
+            redraw_nodes.update(rect.collidelistall(self._node_rects))
+        for edge_index in sorted(redraw_edges):
+            if board.edge_owner[edge_index] != NO_OWNER:
+                self._draw_edge(edge_index)
+        for node_index in sorted(redraw_nodes):
+            if board.node_owner[node_index] != NO_OWNER:
+                self._draw_node(node_index)
+
+        return dirty_rects
+
+
+    def _draw_edge(self, edge_index):
+        """
+        Draws the road on an edge into the frame.
 
-        # So edges and nodes on multiple tiles don't get drawn multiple times
-        added_edge_indices = []
-        added_node_indices = []
+        :param edge_index: The index of the edge
+        :return: None
+        """
+        pos_x, pos_y = self.edge_positions[edge_index]
+        angle = self.edge_angles[edge_index]
+        sprite = self._get_road_sprite(self.player_colour[self.game.board.edge_owner[edge_index]], angle)
+        rect = sprite.get_rect(center=(pos_x, pos_y))
+        self.frame.blit(sprite, rect)
+        self._edge_rects[edge_index] = rect
 
-        # For each hex, check what needs to be drawn
-        for i, tile in enumerate(self.game.board.tiles):
-            tile_x, tile_y = self.tile_positions[i]
-            tile_w, tile_h = self.hex_width, self.hex_height
 
-            # Check edges
-            for j, edge in enumerate(tile.edges):
-                if edge.owned_by is not None and edge.index not in added_edge_indices: # Needs to be drawn
-                    # Add it so it doesn't get drawn twice
-                    added_edge_indices.append(edge.index)
+    def _draw_node(self, node_index):
+        """
+        Draws the settlement or city on a node into the frame.
 
-                    # Get its position and angle shift
-                    shift_frac_x, shift_frac_y = self.edge_position_shift[j]
-                    angle = self.edge_angle_shift[j]
+        :param node_index: The index of the node
+        :return: None
+        """
+        board = self.game.board
+        pos_x, pos_y = self.node_positions[node_index]
+        sprite = self._get_building_sprite(self.player_colour[board.node_owner[node_index]], board.node_level[node_index])
+        rect = sprite.get_rect(center=(int(pos_x), int(pos_y)))
+        self.frame.blit(sprite, rect)
+        self._node_rects[node_index] = rect
 
-                    # Compute the position of the edge rectangle
-                    pos_x = tile_x + tile_w * shift_frac_x
-                    pos_y = tile_y + tile_h * shift_frac_y
 
-                    # Compute the size of the edge
-                    edge_w = self.edge_width_frac * tile_w
-                    edge_h = self.edge_width_frac * 20
+    def _compute_piece_positions(self):
+        """
+        Computes the screen position of every node and edge (and the angle of
+        every edge) from the tile positions. A node or edge shared between
+        tiles is placed from the first tile it is on.
 
-                    # Create a surface for the edge
-                    edge_surf = pygame.Surface((edge_w, edge_h), pygame.SRCALPHA)
-                    edge_surf.fill(self.player_colour[edge.owned_by.index])
+        :return: None
+        """
+        topology = self.game.board.topology
+        tile_positions = np.array(self.tile_positions)
+        hex_size = np.array([self.hex_width, self.hex_height])
 
-                    # Rotate the surface
-                    edge_surf = pygame.transform.rotate(edge_surf, angle)
+        # Position of each corner and side of every tile (tiles x 6 x 2)
+        corner_positions = tile_positions[:, None, :] + hex_size * np.array(self.node_position_shift)[None, :, :]
+        side_positions = tile_positions[:, None, :] + hex_size * np.array(self.edge_position_shift)[None, :, :]
 
-                    # Because rotation changes size, recenter
-                    rect = edge_surf.get_rect(center=(pos_x, pos_y))
+        _, first_corner = np.unique(topology.tile_to_nodes.ravel(), return_index=True)
+        _, first_side = np.unique(topology.tile_to_edges.ravel(), return_index=True)
 
-                    # Draw the edge
-                    self.dynamic_surface.blit(edge_surf, rect)
+        self.node_positions = [tuple(position) for position in corner_positions.reshape(-1, 2)[first_corner].tolist()]
+        self.edge_positions = [tuple(position) for position in side_positions.reshape(-1, 2)[first_side].tolist()]
+        sides = first_side % topology.tile_to_edges.shape[1]
+        self.edge_angles = [self.edge_angle_shift[side] for side in sides.tolist()]
 
-            # Check nodes
-            for j, node in enumerate(tile.nodes):
-                if node.owned_by is not None and node.index not in added_node_indices: # Needs to be drawn
-                    # Add it so it doesn't get drawn twice
-                    added_node_indices.append(node.index)
 
-                    # Get its position shift
-                    shift_frac_x, shift_frac_y = self.node_position_shift[j]
+    def _get_road_sprite(self, colour, angle):
+        """
+        Gets the road sprite for a colour and angle, creating it the first time.
+
+        :param colour: The player's colour
+        :param angle: Degrees to rotate the road by
+        :return: The sprite
+        """
+        sprite = self._road_sprites.get((colour, angle))
+        if sprite is None:
+            edge_surf = pygame.Surface((self.edge_width_frac * self.hex_width, self.edge_width_frac * 20), pygame.SRCALPHA)
+            edge_surf.fill(colour)
+            sprite = pygame.transform.rotate(edge_surf, angle)
+            self._road_sprites[(colour, angle)] = sprite
+        return sprite
 
-                    # Compute the position of the node
-                    pos_x = tile_x + tile_w * shift_frac_x
-                    pos_y = tile_y + tile_h * shift_frac_y
 
-                    # Compute the radius of the node
-                    radius = self.node_width_frac * 20
+    def _get_building_sprite(self, colour, level):
+        """
+        Gets the sprite of a settlement (circle) or city (square) for a colour,
+        creating it the first time.
 
-                    # Create a surface for the edge
-                    if node.city:
-                        # Square for city, centered on the node
-                        rect = pygame.Rect(0, 0, 2*radius, 2*radius)
-                        rect.center = (pos_x, pos_y)
-                        pygame.draw.rect(self.dynamic_surface, self.player_colour[node.owned_by.index], rect)
-                    else:
-                        # Circle for settlement
-                        pygame.draw.circle(self.dynamic_surface, self.player_colour[node.owned_by.index], (int(pos_x), int(pos_y)), int(radius))
+        :param colour: The player's colour
+        :param level: SETTLEMENT or CITY
+        :return: The sprite
+        """
+        sprite = self._building_sprites.get((colour, level))
+        if sprite is None:
+            radius = int(self.node_width_frac * 20)
+            sprite = pygame.Surface((2 * radius, 2 * radius), pygame.SRCALPHA)
+            if level == SETTLEMENT:
+                pygame.draw.circle(sprite, colour, (radius, radius), radius)
+            else:
+                sprite.fill(colour)
+            self._building_sprites[(colour, level)] = sprite
+        return sprite
 
 
     # --- Functions used for testing --- #
@@ -250,6 +439,7 @@ class Renderer:
             tile_index = self.game.board.tiles[index].index
             text = font.render(str(tile_index), True, (255, 255, 0))
             self.static_surface.blit(text, (x + 50, y + 50))
+            self._drawn_version = -1
             self.render()
 
             print(f"TILE INDEX: {index} -> TILE TYPE: {self.game.board.tiles[index].resource_type.name}")
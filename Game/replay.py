@@ -0,0 +1,264 @@
+import numpy as np
+from game import Game
+from constants import ActionType, NUM_TILES
+
+# A replay file is laid out as:
+#   header      HEADER_DTYPE
+#   records     RECORD_DTYPE x num_records, one per action in the order played
+#   checkpoints checkpoint dtype x num_checkpoints, the game state every K turns
+#   trailer     TRAILER_DTYPE, which locates the records and checkpoints
+MAGIC = b"CATANRPL"
+FORMAT_VERSION = 2 # 2: checkpoints hold only the primary state (see Board.to_bytes)
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("checkpoint_interval", "<u4"),
+    ("seed", "<i8"), # -1 if unknown
+    ("tile_resource", "i1", (NUM_TILES,)),
+    ("tile_dice", "i1", (NUM_TILES,)),
+    ("robber_tile", "i1"),
+    ("state_size", "<u4") # Size of the game state stored in each checkpoint
+])
+
+# ROLL stores the total in dice (target is -1), every other action its target in target
+RECORD_DTYPE = np.dtype([
+    ("player", "i1"),
+    ("action_type", "i1"),
+    ("target", "i1"),
+    ("dice", "i1")
+])
+
+TRAILER_DTYPE = np.dtype([
+    ("num_records", "<u8"),
+    ("num_checkpoints", "<u8"),
+    ("checkpoint_offset", "<u8"),
+    ("magic", "S8")
+])
+
+
+def _checkpoint_dtype(state_size):
+    return np.dtype([
+        ("record", "<u8"), # Number of records played before the checkpoint
+        ("turn", "<u4"),
+        ("state", "u1", (state_size,))
+    ])
+
+
+class ReplayWriter:
+    def __init__(self, path, game, seed=None, checkpoint_interval=10, buffer_size=4096):
+        """
+        Writes a replay of a game as it is played. The game should have just
+        been reset: its state is stored as the first checkpoint, and every
+        action played through the writer is appended as a record.
+
+        :param path: Path of the replay file
+        :param game: The game being recorded
+        :param seed: The seed the game was reset with, stored in the header (None if unknown)
+        :param checkpoint_interval: Turns between checkpoints of the game state
+        :param buffer_size: Number of records buffered before they are written
+        """
+        self.game = game
+        self.checkpoint_interval = checkpoint_interval
+        self._file = open(path, "wb")
+
+        board = game.board
+        header = np.zeros((), dtype=HEADER_DTYPE)
+        header["magic"] = MAGIC
+        header["version"] = FORMAT_VERSION
+        header["checkpoint_interval"] = checkpoint_interval
+        header["seed"] = -1 if seed is None else seed
+        header["tile_resource"] = board.tile_resource
+        header["tile_dice"] = board.tile_dice
+        header["robber_tile"] = board.robber_tile
+        header["state_size"] = game.state_size
+        self._file.write(header.tobytes())
+
+        # Records are buffered and written in blocks
+        self._buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self._buffered = 0
+        self.num_records = 0
+
+        # Checkpoints are kept until close, and written after the records
+        self._checkpoints = []
+        self._add_checkpoint()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def play(self, action_type, index):
+        """
+        Plays an action on the game and records it.
+
+        :param action_type: The ActionType of the action
+        :param index: The node, edge, tile, or dice total the action targets
+        :return: None
+        """
+        record = self._buffer[self._buffered]
+        record["player"] = self.game.current_player
+        record["action_type"] = action_type.value
+        if action_type == ActionType.ROLL:
+            record["target"], record["dice"] = -1, index
+        else:
+            record["target"], record["dice"] = index, 0
+
+        turn = self.game.turn
+        self.game.play(action_type, index)
+
+        self._buffered += 1
+        self.num_records += 1
+        if self._buffered == len(self._buffer):
+            self._flush()
+
+        if self.game.turn != turn and self.game.turn % self.checkpoint_interval == 0:
+            self._add_checkpoint()
+
+
+    def close(self):
+        """
+        Writes the buffered records, the checkpoints, and the trailer, and
+        closes the file.
+
+        :return: None
+        """
+        if self._file is None:
+            return
+        self._flush()
+
+        checkpoint_offset = self._file.tell()
+        checkpoints = np.zeros(len(self._checkpoints), dtype=_checkpoint_dtype(self.game.state_size))
+        for checkpoint, (record, turn, state) in zip(checkpoints, self._checkpoints):
+            checkpoint["record"], checkpoint["turn"] = record, turn
+            checkpoint["state"] = np.frombuffer(state, dtype=np.uint8)
+        self._file.write(checkpoints.tobytes())
+
+        trailer = np.zeros((), dtype=TRAILER_DTYPE)
+        trailer["num_records"] = self.num_records
+        trailer["num_checkpoints"] = len(checkpoints)
+        trailer["checkpoint_offset"] = checkpoint_offset
+        trailer["magic"] = MAGIC
+        self._file.write(trailer.tobytes())
+
+        self._file.close()
+        self._file = None
+
+
+    def _flush(self):
+        self._file.write(self._buffer[:self._buffered].tobytes())
+        self._buffered = 0
+
+
+    def _add_checkpoint(self):
+        self._checkpoints.append((self.num_records, self.game.turn, self.game.to_bytes()))
+
+
+class ReplayReader:
+    def __init__(self, path):
+        """
+        Reads a replay written by ReplayWriter. The records and checkpoints
+        are memory-mapped, so opening a replay does not read it, and any turn
+        can be reached by restoring the checkpoint before it and replaying
+        forward from there.
+
+        :param path: Path of the replay file
+        """
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+
+        self.header = data[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+        trailer = data[len(data) - TRAILER_DTYPE.itemsize:].view(TRAILER_DTYPE)[0]
+        if self.header["magic"] != MAGIC or trailer["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a complete replay file")
+        if self.header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported replay version {self.header['version']}")
+
+        self.seed = None if self.header["seed"] < 0 else int(self.header["seed"])
+        self.checkpoint_interval = int(self.header["checkpoint_interval"])
+
+        # Record and checkpoint views into the file
+        num_records = int(trailer["num_records"])
+        self.records = data[HEADER_DTYPE.itemsize:HEADER_DTYPE.itemsize + num_records * RECORD_DTYPE.itemsize] \
+            .view(RECORD_DTYPE)
+        checkpoint_dtype = _checkpoint_dtype(int(self.header["state_size"]))
+        checkpoint_offset = int(trailer["checkpoint_offset"])
+        self.checkpoints = data[checkpoint_offset:checkpoint_offset + int(trailer["num_checkpoints"]) * checkpoint_dtype.itemsize] \
+            .view(checkpoint_dtype)
+
+
+    def __len__(self):
+        return len(self.records)
+
+
+    @property
+    def num_turns(self):
+        """
+        The number of turns started in the replay.
+        """
+        last = self.checkpoints[-1]
+        game = self._game_at_checkpoint(len(self.checkpoints) - 1)
+        self._replay(game, int(last["record"]), len(self.records))
+        return game.turn
+
+
+    def get_action(self, record_index):
+        """
+        Gets an action of the replay.
+
+        :param record_index: The index of the record
+        :return: (player, ActionType, index) tuple
+        """
+        record = self.records[record_index]
+        action_type = ActionType(int(record["action_type"]))
+        index = int(record["dice"]) if action_type == ActionType.ROLL else int(record["target"])
+        return int(record["player"]), action_type, index
+
+
+    def game_at_turn(self, turn, game=None):
+        """
+        Gets the game at the start of a turn. Setup is part of turn 0, so turn
+        0 is the start of the game.
+
+        :param turn: The turn (clamped to the last turn of the replay)
+        :param game: Game to load the state into (a new game if None)
+        :return: The game
+        """
+        checkpoint_index = max(int(np.searchsorted(self.checkpoints["turn"], turn, side="right")) - 1, 0)
+        game = self._game_at_checkpoint(checkpoint_index, game)
+        record_index = int(self.checkpoints[checkpoint_index]["record"])
+        while record_index < len(self.records) and game.turn < turn:
+            self._replay(game, record_index, record_index + 1)
+            record_index += 1
+        return game
+
+
+    def game_at_record(self, record_index, game=None):
+        """
+        Gets the game after the first record_index actions.
+
+        :param record_index: The number of actions played
+        :param game: Game to load the state into (a new game if None)
+        :return: The game
+        """
+        record_index = min(record_index, len(self.records))
+        checkpoint_index = max(int(np.searchsorted(self.checkpoints["record"], record_index, side="right")) - 1, 0)
+        game = self._game_at_checkpoint(checkpoint_index, game)
+        self._replay(game, int(self.checkpoints[checkpoint_index]["record"]), record_index)
+        return game
+
+
+    def _game_at_checkpoint(self, checkpoint_index, game=None):
+        if game is None:
+            game = Game()
+        game.load_bytes(self.checkpoints[checkpoint_index]["state"].tobytes())
+        return game
+
+
+    def _replay(self, game, start, stop):
+        for record_index in range(start, stop):
+            _, action_type, index = self.get_action(record_index)
+            game.play(action_type, index)
@@ -0,0 +1,276 @@
+import math
+import time
+import numpy as np
+from constants import (ActionType, NO_OWNER, NUM_EDGES, NUM_PLAYERS, NUM_RESOURCES, NUM_SETUP_STEPS, SETUP_PLAYER_ORDER,
+                       NODE_FEATURE_PIPS, NODE_FEATURE_RESOURCE_PIPS, NODE_FEATURE_DIVERSITY, NUM_NODE_FEATURES)
+
+class _SearchNode:
+    def __init__(self, moves):
+        """
+        A position in the search tree. Positions are keyed by their Zobrist
+        key, so transpositions (placements made in a different order) share
+        the same node.
+
+        :param moves: The candidate (settlement, road) moves from the position
+        """
+        self.moves = moves
+        self.visits = 0
+        self.move_visits = [0] * len(moves)
+        self.move_values = [0.0] * len(moves) # Total value for the player making the move
+
+
+class MCTSSetupAgent:
+    def __init__(self, time_budget=0.05, max_iterations=None, num_candidates=12, exploration=0.5,
+                 diversity_weight=1.0, evaluator="heuristic", transposition_table=None, seed=None):
+        """
+        A setup agent that picks starting settlements and roads with Monte Carlo
+        tree search over the rest of the snake draft. Each move is a settlement
+        and its road. Every player maximizes their own value (max-n), and the
+        value of a finished setup is the pips of the player's settlements plus
+        a bonus for each distinct resource they touch.
+
+        :param time_budget: Seconds to search for each decision (None for no limit)
+        :param max_iterations: Iterations to search for each decision (None for no limit)
+        :param num_candidates: Number of best-scoring legal nodes considered as moves
+        :param exploration: UCB exploration constant
+        :param diversity_weight: Value of each distinct resource, in pips
+        :param evaluator: "heuristic" completes the setup greedily at the leaves,
+            "playout" completes it with random picks among the best nodes
+        :param transposition_table: Optional TranspositionTable (which may be shared
+            between agents) used to reuse the decisions of earlier searches. Entries
+            are weighted by the iterations searched, so they are only reused by an
+            agent with an iteration budget, and only if they had at least as many.
+        :param seed: Seed for the random playouts
+        """
+        assert time_budget is not None or max_iterations is not None, "The search needs a budget"
+        assert evaluator in ("heuristic", "playout")
+        self.time_budget = time_budget
+        self.max_iterations = max_iterations
+        self.num_candidates = num_candidates
+        self.exploration = exploration
+        self.diversity_weight = diversity_weight
+        self.evaluator = evaluator
+        self.transposition_table = transposition_table
+        self.rng = np.random.default_rng(seed)
+
+        # Number of iterations run by the last search
+        self.last_iterations = 0
+
+        # Node scores of the board being searched
+        self._node_pips = None
+        self._node_resources = None
+        self._node_score = None
+
+
+    def get_starting_position(self, game):
+        """
+        Gets the starting settlement and road for the current player. The game
+        must be waiting for a setup settlement. The game is left unchanged.
+
+        :param game: The game
+        :return: (Settlement index, Road index) tuple (road is None if no edge is free)
+        """
+        assert game.setup_step < NUM_SETUP_STEPS and game.setup_step % 2 == 0, "Not placing a setup settlement"
+        key = game.zobrist_key
+
+        # Reuse an earlier decision searched for at least as many iterations. A time budget
+        # gives no iteration count to compare against, so it always searches.
+        if self.transposition_table is not None and self.max_iterations is not None:
+            entry = self.transposition_table.probe(key)
+            if entry is not None and entry[1] >= self.max_iterations:
+                self.last_iterations = 0
+                return self._decode_move(entry[2])
+
+        self._score_nodes(game.board)
+        tree = {}
+        deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+        iterations = 0
+        while (self.max_iterations is None or iterations < self.max_iterations) and \
+                (deadline is None or time.perf_counter() < deadline or iterations == 0):
+            self._iterate(game, tree)
+            iterations += 1
+        self.last_iterations = iterations
+
+        # Play the most visited move
+        root = tree[key]
+        best = max(range(len(root.moves)), key=lambda i: root.move_visits[i])
+        move = root.moves[best]
+
+        if self.transposition_table is not None:
+            value = root.move_values[best] / max(root.move_visits[best], 1)
+            self.transposition_table.store(key, value, iterations, self._encode_move(move))
+        return move
+
+
+    def _iterate(self, game, tree):
+        """
+        Runs one iteration of the search: select moves down the tree with UCB,
+        expand the first new position, evaluate it, and back up the values.
+
+        :param game: The game, which is restored before returning
+        :param tree: Dict of the search nodes keyed by Zobrist key
+        :return: None
+        """
+        path = []
+        num_applied = 0
+
+        while game.setup_step < NUM_SETUP_STEPS:
+            key = game.zobrist_key
+            node = tree.get(key)
+            expanded = node is None
+            if expanded:
+                node = _SearchNode(self._candidate_moves(game))
+                tree[key] = node
+
+            move_index = self._select(node)
+            path.append((node, move_index, game.current_player))
+
+            settlement, road = node.moves[move_index]
+            game.apply(ActionType.SETTLEMENT, settlement)
+            game.apply(ActionType.END_TURN if road is None else ActionType.ROAD, 0 if road is None else road)
+            num_applied += 2
+
+            if expanded:
+                break
+
+        values = self._evaluate(game)
+
+        for node, move_index, player in path:
+            node.visits += 1
+            node.move_visits[move_index] += 1
+            node.move_values[move_index] += values[player]
+
+        for _ in range(num_applied):
+            game.undo()
+
+
+    def _select(self, node):
+        """
+        Selects the move to search with UCB. Unvisited moves are tried first,
+        best-scoring first.
+
+        :param node: The search node
+        :return: Index of the move
+        """
+        log_visits = math.log(node.visits + 1)
+        best_index, best_value = 0, -math.inf
+        for index, visits in enumerate(node.move_visits):
+            if visits == 0:
+                return index
+            value = node.move_values[index] / visits + self.exploration * math.sqrt(log_visits / visits)
+            if value > best_value:
+                best_index, best_value = index, value
+        return best_index
+
+
+    def _score_nodes(self, board):
+        """
+        Scores every node of the board from its cached features: the pips of
+        the tiles it touches (excluding the robber's tile) and a bonus for
+        each distinct resource.
+
+        :param board: The board being searched
+        :return: None
+        """
+        features = board.node_features
+        self._node_pips = features[:, NODE_FEATURE_PIPS].astype(np.float64)
+        self._node_resources = features[:, NODE_FEATURE_RESOURCE_PIPS:NODE_FEATURE_RESOURCE_PIPS + NUM_RESOURCES] > 0
+
+        weights = np.zeros(NUM_NODE_FEATURES)
+        weights[NODE_FEATURE_PIPS] = 1.0
+        weights[NODE_FEATURE_DIVERSITY] = self.diversity_weight
+        self._node_score = board.score_nodes(weights)
+
+
+    def _candidate_moves(self, game):
+        """
+        Gets the moves searched from a position: the best-scoring legal nodes,
+        each with the road towards the best open spot beyond it.
+
+        :param game: The game
+        :return: List of (settlement, road) tuples
+        """
+        legal_nodes = game.board.get_legal_node_indices()
+        order = np.argsort(-self._node_score[legal_nodes], kind="stable")
+        nodes = legal_nodes[order[:self.num_candidates]]
+        return [(int(node), self._choose_road(game.board, node)) for node in nodes]
+
+
+    def _choose_road(self, board, node_index):
+        """
+        Chooses the road for a settlement: the free edge leading towards the
+        best-scoring node that could still be built on beyond it.
+
+        :param board: The board
+        :param node_index: The node of the settlement
+        :return: The index of the edge, or None if every edge is taken
+        """
+        topology = board.topology
+        best_edge, best_score = None, -math.inf
+        for edge_index in topology.node_edges(node_index):
+            if board.edge_owner[edge_index] != NO_OWNER:
+                continue
+
+            # The neighbour is blocked by the settlement, so look one node further
+            first, second = topology.edge_to_nodes[edge_index]
+            neighbour = second if first == node_index else first
+            score = 0.0
+            for beyond in topology.node_neighbours(neighbour):
+                if beyond != node_index and board.legal_settlement_mask[beyond]:
+                    score = max(score, self._node_score[beyond])
+
+            if score > best_score:
+                best_edge, best_score = int(edge_index), score
+        return best_edge
+
+
+    def _evaluate(self, game):
+        """
+        Completes the rest of the setup without changing the game (greedily, or
+        with random picks among the best nodes for playouts) and values the
+        settlements of every player.
+
+        :param game: The game at the leaf
+        :return: List of the value of each player
+        """
+        board = game.board
+        topology = board.topology
+        owners = board.node_owner
+
+        # Settlements already on the board
+        settlements = [list(np.flatnonzero(owners == player)) for player in range(NUM_PLAYERS)]
+
+        # Remaining placements in snake order
+        legal = board.legal_settlement_mask.copy()
+        for placement in range((game.setup_step + 1) // 2, len(SETUP_PLAYER_ORDER)):
+            candidates = np.flatnonzero(legal)
+            scores = self._node_score[candidates]
+            if self.evaluator == "playout":
+                best = np.argpartition(-scores, min(4, len(scores) - 1))[:5]
+                node = candidates[self.rng.choice(best)]
+            else:
+                node = candidates[np.argmax(scores)]
+
+            settlements[SETUP_PLAYER_ORDER[placement]].append(node)
+            legal[node] = False
+            legal[topology.node_neighbours(node)] = False
+
+        # Value of each player's settlements, scaled to roughly [0, 1]
+        values = []
+        for nodes in settlements:
+            pips = self._node_pips[nodes].sum()
+            diversity = self._node_resources[nodes].any(axis=0).sum()
+            values.append((pips + self.diversity_weight * diversity) / 30.0)
+        return values
+
+
+    @staticmethod
+    def _encode_move(move):
+        settlement, road = move
+        return settlement * (NUM_EDGES + 1) + (0 if road is None else road + 1)
+
+
+    @staticmethod
+    def _decode_move(encoded):
+        settlement, road = divmod(encoded, NUM_EDGES + 1)
+        return settlement, (None if road == 0 else road - 1)
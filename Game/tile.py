@@ -1,19 +1,46 @@
+from constants import TileType
+
 class Tile:
     def __init__(self, index):
         """
         Create a new tile. The tile is the hexagon as a whole, and contains
-        its resource, dice value, nodes, and edges, and any related methods
+        its resource, dice value, nodes, and edges, and any related methods.
+        Its resource and dice value are views over the board's arrays.
 
         :param index: The index (id) of the tile
         """
         self.index = index
-        self.resource_type = None
-        self.dice_value = None
+        self.board = None # Board that stores the state of this tile
+
+    @property
+    def nodes(self):
+        """
+        Nodes belonging to the tile, in the order given by the topology.
+        """
+        return [self.board.nodes[i] for i in self.board.topology.tile_to_nodes[self.index]]
+
+    @property
+    def edges(self):
+        """
+        Edges belonging to the tile, in the order given by the topology.
+        """
+        return [self.board.edges[i] for i in self.board.topology.tile_to_edges[self.index]]
+
+    @property
+    def resource_type(self):
+        """
+        The TileType of the tile, or None before the board is reset.
+        """
+        resource = self.board.tile_resource[self.index]
+        return None if resource < 0 else TileType(int(resource))
 
-        # Nodes and edges belonging to the tile. These do not get reset after each game.
-        self.nodes = []
-        self.edges = []
+    @property
+    def dice_value(self):
+        """
+        The dice value of the tile, or None for the desert.
+        """
+        dice_value = self.board.tile_dice[self.index]
+        return None if dice_value == 0 else int(dice_value)
 
     def reset(self, resource_type, dice_value):
-        self.resource_type = resource_type
-        self.dice_value = dice_value
+        self.board.set_tile(self.index, resource_type, dice_value)
@@ -1,116 +1,254 @@
+import numpy as np
 from board import Board
 from tile import Tile
 from node import Node
 from edge import Edge
+from constants import NUM_TILES, NUM_NODES, NUM_EDGES
+
+# Declare which tiles each node falls under
+TILE_TO_NODES = [
+    [0, 1, 2, 8, 9, 10], # Tile 0
+    [2, 3, 4, 10, 11, 12], # Tile 1
+    [4, 5, 6, 12, 13, 14], # Tile 2
+    [7, 8, 9, 17, 18, 19], # Tile 3
+    [9, 10, 11, 19, 20, 21], # Tile 4
+    [11, 12, 13, 21, 22, 23], # Tile 5
+    [13, 14, 15, 23, 24, 25], # Tile 6
+    [16, 17, 18, 27, 28, 29], # Tile 7
+    [18, 19, 20, 29, 30, 31], # Tile 8
+    [20, 21, 22, 31, 32, 33], # Tile 9
+    [22, 23, 24, 33, 34, 35], # Tile 10
+    [24, 25, 26, 35, 36, 37], # Tile 11
+    [28, 29, 30, 38, 39, 40], # Tile 12
+    [30, 31, 32, 40, 41, 42], # Tile 13
+    [32, 33, 34, 42, 43, 44], # Tile 14
+    [34, 35, 36, 44, 45, 46], # Tile 15
+    [39, 40, 41, 47, 48, 49], # Tile 16
+    [41, 42, 43, 49, 50, 51], # Tile 17
+    [43, 44, 45, 51, 52, 53] # Tile 18
+]
+
+# Declare which tiles each edge falls under
+TILE_TO_EDGES = [
+    [0, 1, 6, 7, 11, 12], # Tile 0
+    [2, 3, 7, 8, 13, 14], # Tile 1
+    [4, 5, 8, 9, 15, 16], # Tile 2
+    [10, 11, 18, 19, 24, 25], # Tile 3
+    [12, 13, 19, 20, 26, 27], # Tile 4
+    [14, 15, 20, 21, 28, 29], # Tile 5
+    [16, 17, 21, 22, 30, 31], # Tile 6
+    [23, 24, 33, 34, 39, 40], # Tile 7
+    [25, 26, 34, 35, 41, 42], # Tile 8
+    [27, 28, 35, 36, 43, 44], # Tile 9
+    [29, 30, 36, 37, 45, 46], # Tile 10
+    [31, 32, 37, 38, 47, 48], # Tile 11
+    [40, 41, 49, 50, 54, 55], # Tile 12
+    [42, 43, 50, 51, 56, 57], # Tile 13
+    [44, 45, 51, 52, 58, 59], # Tile 14
+    [46, 47, 52, 53, 60, 61], # Tile 15
+    [55, 56, 62, 63, 66, 67], # Tile 16
+    [57, 58, 63, 64, 68, 69], # Tile 17
+    [59, 60, 64, 65, 70, 71] # Tile 18
+]
+
+# Declare which nodes are ports (NOT CONVINCED I NEED PORT OBJECTS YET)
+NODE_PORTS = {
+    0: 0, 1: 0, 3: 1, 4: 1, 14: 2, 15: 2, 26: 3, 37: 3, 45: 4, 46: 4, 50: 5, 51: 5,
+    47: 6, 48: 6, 28: 7, 38: 7, 7: 8, 17: 8
+}
+
+# Declare which edges belong to which nodes
+NODE_TO_EDGES = [
+    [0, 6], [0, 1], [1, 2, 7], [2, 3], [3, 4, 8], # Node 0 to 4
+    [4, 5], [5, 9], [10, 18], [6, 10, 11], [11, 12, 19], # Nodes 5 to 9
+    [7, 12, 13], [13, 14, 20], [8, 14, 15], [15, 16, 21], [9, 16, 17], # Nodes 10 to 14
+    [17, 22], [23, 33], [18, 23, 24], [24, 25, 34], [19, 25, 26], # Nodes 15 to 19
+    [26, 27, 35], [20, 27, 28], [28, 29, 36], [21, 29, 30], [30, 31, 37], # Nodes 20 to 24
+    [22, 31, 32], [32, 38], [33, 39], [39, 40, 49], [34, 40, 41], # Node 25 to 29
+    [41, 42, 50], [35, 42, 43], [43, 44, 51], [36, 44, 45], [45, 46, 52], # Nodes 30 to 34
+    [37, 46, 47], [47, 48, 53], [48, 38], [49, 54], [54, 55, 62], # Nodes 35 to 39
+    [50, 55, 56], [56, 57, 63], [51, 57, 58],  [58, 59, 64], [52, 59, 60], # Nodes 40 to 44
+    [60, 61, 65], [53, 61], [62, 66], [66, 67], [63, 67, 68], # Nodes 45 to 49
+    [68, 69], [64, 69, 70], [70, 71], [65, 71]  # Nodes 50 to 53
+]
+
+
+class TopologyIndex:
+    def __init__(self):
+        """
+        Read-only adjacency index of the four player board. Variable length
+        relations are stored in CSR form (an indptr array and an indices array),
+        fixed length relations are stored as dense arrays. The index is built
+        once per process and shared by every board, see get_topology_index.
+        View Figure 1 for the indexing of each tile, node, edge, and port.
+        """
+        # Fixed length relations
+        self.tile_to_nodes = np.array(TILE_TO_NODES, dtype=np.int32)
+        self.tile_to_edges = np.array(TILE_TO_EDGES, dtype=np.int32)
+        self.edge_to_nodes = np.zeros((NUM_EDGES, 2), dtype=np.int32)
+        self.node_to_port = np.full(NUM_NODES, -1, dtype=np.int32)
+
+        # Build the lists for each relation before packing them
+        edge_nodes = [[] for _ in range(NUM_EDGES)]
+        for node_index, edge_indices in enumerate(NODE_TO_EDGES):
+            for edge_index in edge_indices:
+                edge_nodes[edge_index].append(node_index)
+        self.edge_to_nodes[:] = edge_nodes
+
+        node_nodes = [[] for _ in range(NUM_NODES)]
+        for node_index, edge_indices in enumerate(NODE_TO_EDGES):
+            for edge_index in edge_indices:
+                first, second = edge_nodes[edge_index]
+                node_nodes[node_index].append(second if first == node_index else first)
+
+        node_tiles = [[] for _ in range(NUM_NODES)]
+        for tile_index, node_indices in enumerate(TILE_TO_NODES):
+            for node_index in node_indices:
+                node_tiles[node_index].append(tile_index)
+
+        for node_index, port_index in NODE_PORTS.items():
+            self.node_to_port[node_index] = port_index
+
+        # Variable length relations (CSR)
+        self.node_to_nodes_indptr, self.node_to_nodes = self._pack(node_nodes)
+        self.node_to_edges_indptr, self.node_to_edges = self._pack(NODE_TO_EDGES)
+        self.node_to_tiles_indptr, self.node_to_tiles = self._pack(node_tiles)
+
+        # Padded versions of the variable length relations for vectorized code. Rows are
+        # padded with -1, which indexes the last entry, so gather from an array that has
+        # a sentinel entry appended.
+        self.node_to_nodes_padded = self._pad(node_nodes)
+        self.node_to_edges_padded = self._pad(NODE_TO_EDGES)
+        self.node_to_tiles_padded = self._pad(node_tiles)
+
+        # Tile-node incidence (1 where the node falls under the tile), so per-node sums
+        # over tiles are one matrix product
+        self.tile_node_incidence = np.zeros((NUM_TILES, NUM_NODES), dtype=np.float32)
+        self.tile_node_incidence[np.arange(NUM_TILES)[:, None], self.tile_to_nodes] = 1
+
+        # The board as a heterogeneous graph, in the (2, num_edges) edge_index form used
+        # by graph libraries such as PyTorch Geometric, keyed by (source, relation, target).
+        # Roads connect nodes in both directions, and graph_road_index maps each directed
+        # node-node edge to its board edge, so road features are gathered per direction.
+        self.graph_road_index = np.concatenate([np.arange(NUM_EDGES), np.arange(NUM_EDGES)]).astype(np.int64)
+        self.graph_edge_index = {
+            ("node", "road", "node"): np.concatenate([self.edge_to_nodes.T, self.edge_to_nodes[:, ::-1].T],
+                                                     axis=1).astype(np.int64),
+            ("tile", "touches", "node"): self._relation(self.tile_to_nodes),
+            ("tile", "borders", "edge"): self._relation(self.tile_to_edges),
+            ("edge", "joins", "node"): self._relation(self.edge_to_nodes)
+        }
+        for (source, relation, target), edge_index in list(self.graph_edge_index.items()):
+            if source != target:
+                self.graph_edge_index[(target, "rev_" + relation, source)] = np.ascontiguousarray(edge_index[::-1])
+
+        # Shared between every board, so nothing may write to it
+        for array in list(vars(self).values()) + list(self.graph_edge_index.values()):
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+
+        # Tuple versions for code that walks the board one element at a time
+        # in Python, where indexing NumPy arrays is slow
+        self.node_edges_tuples = tuple(tuple(edge_indices) for edge_indices in NODE_TO_EDGES)
+        self.edge_nodes_tuples = tuple(tuple(node_indices) for node_indices in edge_nodes)
+
+
+    @staticmethod
+    def _relation(rows):
+        """
+        Converts a dense relation (one row of targets per source) to edge_index form.
+
+        :param rows: Array of the targets of each source (sources x targets per source)
+        :return: Array of the (source, target) pairs (2 x pairs)
+        """
+        sources = np.repeat(np.arange(len(rows)), rows.shape[1])
+        return np.stack([sources, rows.ravel()]).astype(np.int64)
+
+
+    @staticmethod
+    def _pack(lists):
+        """
+        Packs a list of index lists into CSR form.
+
+        :param lists: The index list of each row.
+        :return: (indptr, indices) tuple
+        """
+        indptr = np.zeros(len(lists) + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum([len(row) for row in lists])
+        indices = np.array([index for row in lists for index in row], dtype=np.int32)
+        return indptr, indices
+
+
+    @staticmethod
+    def _pad(lists):
+        """
+        Packs a list of index lists into a dense array padded with -1.
+
+        :param lists: The index list of each row.
+        :return: Array of shape (rows, longest row)
+        """
+        padded = np.full((len(lists), max(len(row) for row in lists)), -1, dtype=np.int32)
+        for row_index, row in enumerate(lists):
+            padded[row_index, :len(row)] = row
+        return padded
+
+
+    def node_neighbours(self, node_index):
+        """
+        :param node_index: The index of the node.
+        :return: Indices of the nodes one edge away from the node.
+        """
+        return self.node_to_nodes[self.node_to_nodes_indptr[node_index]:self.node_to_nodes_indptr[node_index + 1]]
+
+
+    def node_edges(self, node_index):
+        """
+        :param node_index: The index of the node.
+        :return: Indices of the edges touching the node.
+        """
+        return self.node_to_edges[self.node_to_edges_indptr[node_index]:self.node_to_edges_indptr[node_index + 1]]
+
+
+    def node_tiles(self, node_index):
+        """
+        :param node_index: The index of the node.
+        :return: Indices of the tiles the node falls under.
+        """
+        return self.node_to_tiles[self.node_to_tiles_indptr[node_index]:self.node_to_tiles_indptr[node_index + 1]]
+
+
+# Built on first use and shared by every board in the process
+_TOPOLOGY_INDEX = None
+
+def get_topology_index():
+    """
+    Gets the shared topology index, building it the first time it is needed.
+
+    :return: The TopologyIndex shared by every board
+    """
+    global _TOPOLOGY_INDEX
+    if _TOPOLOGY_INDEX is None:
+        _TOPOLOGY_INDEX = TopologyIndex()
+    return _TOPOLOGY_INDEX
+
 
 def create_four_player_board():
     """
     Creates the tiles, nodes, edges, and ports for a board for four players.
-    Creates all the relationships between the elements as well. View Figure 1
-    for the indexing of each tile, node, edge, and port.
+    The relationships between the elements come from the shared topology
+    index, so only the (thin) tile, node, and edge views are created per board.
 
     :return: The Board object containing all the initialized elements
     """
-    # Board constants
-    NUM_TILES = 19
-    NUM_EDGES = 72
-    NUM_NODES = 54
-    NUM_PORTS = 9
-
-    # Declare which tiles each node falls under
-    tile_to_nodes = [
-        [0, 1, 2, 8, 9, 10], # Tile 0
-        [2, 3, 4, 10, 11, 12], # Tile 1
-        [4, 5, 6, 12, 13, 14], # Tile 2
-        [7, 8, 9, 17, 18, 19], # Tile 3
-        [9, 10, 11, 19, 20, 21], # Tile 4
-        [11, 12, 13, 21, 22, 23], # Tile 5
-        [13, 14, 15, 23, 24, 25], # Tile 6
-        [16, 17, 18, 27, 28, 29], # Tile 7
-        [18, 19, 20, 29, 30, 31], # Tile 8
-        [20, 21, 22, 31, 32, 33], # Tile 9
-        [22, 23, 24, 33, 34, 35], # Tile 10
-        [24, 25, 26, 35, 36, 37], # Tile 11
-        [28, 29, 30, 38, 39, 40], # Tile 12
-        [30, 31, 32, 40, 41, 42], # Tile 13
-        [32, 33, 34, 42, 43, 44], # Tile 14
-        [34, 35, 36, 44, 45, 46], # Tile 15
-        [39, 40, 41, 47, 48, 49], # Tile 16
-        [41, 42, 43, 49, 50, 51], # Tile 17
-        [43, 44, 45, 51, 52, 53] # Tile 18
-    ]
-
-    # Declare which tiles each edge falls under
-    tile_to_edges = [
-        [0, 1, 6, 7, 11, 12], # Tile 0
-        [2, 3, 7, 8, 13, 14], # Tile 1
-        [4, 5, 8, 9, 15, 16], # Tile 2
-        [10, 11, 18, 19, 24, 25], # Tile 3
-        [12, 13, 19, 20, 26, 27], # Tile 4
-        [14, 15, 20, 21, 28, 29], # Tile 5
-        [16, 17, 21, 22, 30, 31], # Tile 6
-        [23, 24, 33, 34, 39, 40], # Tile 7
-        [25, 26, 34, 35, 41, 42], # Tile 8
-        [27, 28, 35, 36, 43, 44], # Tile 9
-        [29, 30, 36, 37, 45, 46], # Tile 10
-        [31, 32, 37, 38, 47, 48], # Tile 11
-        [40, 41, 49, 50, 54, 55], # Tile 12
-        [42, 43, 50, 51, 56, 57], # Tile 13
-        [44, 45, 51, 52, 58, 59], # Tile 14
-        [46, 47, 52, 53, 60, 61], # Tile 15
-        [55, 56, 62, 63, 66, 67], # Tile 16
-        [57, 58, 63, 64, 68, 69], # Tile 17
-        [59, 60, 64, 65, 70, 71] # Tile 18
-    ]
-
-    # Declare which nodes are ports (NOT CONVINCED I NEED PORT OBJECTS YET)
-    node_ports = {
-        0: 0, 1: 0, 3: 1, 4: 1, 14: 2, 15: 2, 26: 3, 37: 3, 45: 4, 46: 4, 50: 5, 51: 5,
-        47: 6, 48: 6, 28: 7, 38: 7, 7: 8, 17: 8
-    }
-
-    # Declare which edges belong to which nodes
-    node_to_edges = [
-        [0, 6], [0, 1], [1, 2, 7], [2, 3], [3, 4, 8], # Node 0 to 4
-        [4, 5], [5, 9], [10, 18], [10, 11], [11, 12, 19], # Nodes 5 to 9
-        [7, 12, 13], [13, 14, 29], [8, 14, 15], [15, 16, 21], [9, 16, 17], # Nodes 10 to 14
-        [17, 22], [23, 33], [18, 23, 24], [24, 25, 34], [19, 25, 26], # Nodes 15 to 19
-        [26, 27, 35], [20, 27, 28], [28, 29, 36], [21, 29, 30], [30, 31, 37], # Nodes 20 to 24
-        [22, 31, 32], [32, 38], [33, 39], [39, 40, 49], [34, 40, 41], # Node 25 to 29
-        [41, 42, 50], [35, 42, 43], [43, 44, 51], [36, 44, 45], [45, 46, 52], # Nodes 30 to 34
-        [37, 46, 47], [47, 48, 53], [48, 38], [49, 54], [54, 55, 62], # Nodes 35 to 39
-        [50, 55, 56], [56, 57, 63], [51, 57, 58],  [58, 59, 64], [52, 59, 60], # Nodes 40 to 44
-        [60, 61, 65], [53, 61], [62, 66], [66, 67], [63, 67, 68], # Nodes 45 to 49
-        [68, 69], [64, 69, 70], [70, 71], [65, 71]  # Nodes 50 to 53
-    ]
-
-    # Create Edge objects
-    edges = [Edge(index) for index in range(NUM_EDGES)]
-
-    # Create Node objects
-    nodes = [Node(index) for index in range(NUM_NODES)]
+    topology = get_topology_index()
 
-    # Add (Node - Edge) relationships
-    for node_index, edge_indices in enumerate(node_to_edges):
-        for edge_index in edge_indices:
-            nodes[node_index].edges.append(edges[edge_index])
-            edges[edge_index].nodes.append(nodes[node_index])
-
-    # Create Tile objects
+    # Create the views. Their relationships are read from the topology index.
     tiles = [Tile(index) for index in range(NUM_TILES)]
-
-    # Add (Tile - Node) relationships
-    for tile_index, node_indices in enumerate(tile_to_nodes):
-        for node_index in node_indices:
-            tiles[tile_index].nodes.append(nodes[node_index])
-
-    # Add (Tile - Edge) relationships
-    for tile_index, edge_indices in enumerate(tile_to_edges):
-        for edge_index in edge_indices:
-            tiles[tile_index].edges.append(edges[edge_index])
+    nodes = [Node(index) for index in range(NUM_NODES)]
+    edges = [Edge(index) for index in range(NUM_EDGES)]
 
     # Create the board object
-    board = Board(tiles=tiles, nodes=nodes, edges=edges)
+    board = Board(tiles=tiles, nodes=nodes, edges=edges, topology=topology)
 
     # Return the final board object
     return board
@@ -0,0 +1,172 @@
+import numpy as np
+from constants import NUM_TILES, NUM_NODES, NUM_EDGES, NUM_PLAYERS, NUM_RESOURCES, NUM_SETUP_STEPS, TileType
+
+# Resource counts above this share a key. Hands this large are rare enough that
+# the extra collisions do not matter. Negative counts (only seen partway through a
+# trade) share the key of zero.
+MAX_HASHED_RESOURCE_COUNT = 63
+
+# The keys are drawn from a fixed seed so that keys (and any tables keyed by them)
+# agree between processes
+_rng = np.random.default_rng(0x5EED_CA7A)
+
+def _keys(*shape):
+    return _rng.integers(0, 2**64, size=shape, dtype=np.uint64, endpoint=False)
+
+# Board keys. Plain Python ints are used for the keys XORed one at a time, since
+# they are faster to XOR than NumPy scalars.
+SETTLEMENT_KEYS = _keys(NUM_NODES, NUM_PLAYERS).tolist()
+CITY_KEYS = _keys(NUM_NODES, NUM_PLAYERS).tolist() # XORed on top of the settlement key
+ROAD_KEYS = _keys(NUM_EDGES, NUM_PLAYERS).tolist()
+ROBBER_KEYS = _keys(NUM_TILES).tolist()
+TILE_RESOURCE_KEYS = _keys(NUM_TILES, len(TileType)).tolist()
+TILE_DICE_KEYS = _keys(NUM_TILES, 13).tolist()
+
+# Resource keys for each (player, resource, count), gathered in bulk with NumPy
+RESOURCE_KEYS = _keys(NUM_PLAYERS, NUM_RESOURCES, MAX_HASHED_RESOURCE_COUNT + 1)
+
+# Turn keys
+PLAYER_KEYS = _keys(NUM_PLAYERS).tolist()
+SETUP_STEP_KEYS = _keys(NUM_SETUP_STEPS + 1).tolist()
+LAST_SETTLEMENT_KEYS = _keys(NUM_NODES).tolist()
+ROLLED_KEY, ROBBER_PENDING_KEY = _keys(2).tolist()
+
+_players = np.arange(NUM_PLAYERS)[:, None]
+_resources = np.arange(NUM_RESOURCES)[None, :]
+
+
+def resource_key(resources):
+    """
+    Computes the combined key of every player's resource counts.
+
+    :param resources: Array of resource counts (players x resources).
+    :return: The key as an int
+    """
+    counts = np.clip(resources, 0, MAX_HASHED_RESOURCE_COUNT)
+    return int(np.bitwise_xor.reduce(RESOURCE_KEYS[_players, _resources, counts], axis=None))
+
+
+def resource_key_change(resources, amounts, player_index=None):
+    """
+    Computes the key to XOR in when amounts are added to the resources.
+    Must be called before the amounts are added.
+
+    :param resources: Array of resource counts (players x resources).
+    :param amounts: The amounts being added (resources, or players x resources).
+    :param player_index: The player receiving the amounts, or None for all players.
+    :return: The key as an int
+    """
+    if player_index is None:
+        players, resource_indices = np.nonzero(amounts)
+        amounts = amounts[players, resource_indices]
+    else:
+        resource_indices = np.flatnonzero(amounts)
+        players = player_index
+        amounts = amounts[resource_indices]
+
+    counts = resources[players, resource_indices]
+    before = np.clip(counts, 0, MAX_HASHED_RESOURCE_COUNT)
+    after = np.clip(counts + amounts, 0, MAX_HASHED_RESOURCE_COUNT)
+    changed = RESOURCE_KEYS[players, resource_indices, before] ^ RESOURCE_KEYS[players, resource_indices, after]
+    return int(np.bitwise_xor.reduce(changed))
+
+
+class TranspositionTable:
+    def __init__(self, num_buckets=1 << 18):
+        """
+        A bounded transposition table keyed by Zobrist keys. Every bucket has
+        two slots: a slot that is only replaced by an entry with at least the
+        same weight (or by any entry once the stored one is from an older
+        search), and a slot that is always replaced. The weight is whatever
+        measures how much work went into an entry, such as search depth or
+        visit count. The table can be shared between search agents.
+
+        :param num_buckets: Number of buckets, rounded up to a power of two
+        """
+        num_buckets = 1 << max(int(num_buckets) - 1, 1).bit_length()
+        self._mask = num_buckets - 1
+        self.keys = np.zeros((num_buckets, 2), dtype=np.uint64)
+        self.values = np.zeros((num_buckets, 2), dtype=np.float64)
+        self.weights = np.zeros((num_buckets, 2), dtype=np.int64)
+        self.moves = np.full((num_buckets, 2), -1, dtype=np.int32)
+        self.generations = np.zeros((num_buckets, 2), dtype=np.int32)
+        self.used = np.zeros((num_buckets, 2), dtype=bool)
+        self.generation = 0
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+
+
+    def __len__(self):
+        return int(self.used.sum())
+
+
+    def new_search(self):
+        """
+        Starts a new search. Entries from earlier searches can be replaced
+        regardless of their weight.
+
+        :return: None
+        """
+        self.generation += 1
+
+
+    def clear(self):
+        """
+        Removes every entry.
+
+        :return: None
+        """
+        self.used.fill(False)
+        self.hits = 0
+        self.misses = 0
+
+
+    def probe(self, key):
+        """
+        Looks up an entry.
+
+        :param key: The Zobrist key of the position.
+        :return: (value, weight, move) tuple, or None if there is no entry
+        """
+        bucket = key & self._mask
+        for slot in (0, 1):
+            if self.used[bucket, slot] and int(self.keys[bucket, slot]) == key:
+                self.hits += 1
+                return float(self.values[bucket, slot]), int(self.weights[bucket, slot]), int(self.moves[bucket, slot])
+
+        self.misses += 1
+        return None
+
+
+    def store(self, key, value, weight, move=-1):
+        """
+        Stores an entry, replacing an existing entry for the same key.
+
+        :param key: The Zobrist key of the position.
+        :param value: The value of the position.
+        :param weight: How much work went into the value (e.g. depth or visits).
+        :param move: The best move found from the position (-1 if none).
+        :return: None
+        """
+        bucket = key & self._mask
+
+        # Update the entry for the key if there is one, otherwise use the
+        # preferred slot if the new entry is worth at least as much
+        if self.used[bucket, 0] and int(self.keys[bucket, 0]) == key:
+            slot = 0
+        elif self.used[bucket, 1] and int(self.keys[bucket, 1]) == key:
+            slot = 1
+        elif (not self.used[bucket, 0] or self.generations[bucket, 0] != self.generation
+              or weight >= self.weights[bucket, 0]):
+            slot = 0
+        else:
+            slot = 1
+
+        self.keys[bucket, slot] = key
+        self.values[bucket, slot] = value
+        self.weights[bucket, slot] = weight
+        self.moves[bucket, slot] = move
+        self.generations[bucket, slot] = self.generation
+        self.used[bucket, slot] = True
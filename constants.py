@@ -16,3 +16,63 @@ FOUR_PLAYER_TILE_DISTRIBUTION = {
     TileType.MOUNTAIN: 3,
     TileType.DESERT: 1
 }
+
+
+# Owner value stored in the board arrays for unowned nodes and edges
+NO_OWNER = -1
+
+# Building levels stored in the board's node level array
+EMPTY = 0
+SETTLEMENT = 1
+CITY = 2
+
+# Board dimensions for a four player game
+NUM_TILES = 19
+NUM_NODES = 54
+NUM_EDGES = 72
+NUM_PORTS = 9
+NUM_PLAYERS = 4
+
+# Used for placing dice values on tiles during setup
+TOKEN_TILE_IDX_ORDER = [0, 3, 7, 12, 16, 17, 18, 15, 11, 6, 2, 1, 4, 8, 13, 14, 10, 5, 9]
+TOKEN_DICE_VALUE_ORDER = [5, 2, 6, 3, 8, 10, 9, 12, 11, 4, 8, 10, 9, 4, 5, 6, 3, 11]
+
+# Order in which the players place their starting settlements and roads
+SETUP_PLAYER_ORDER = [0, 1, 2, 3, 3, 2, 1, 0]
+
+# Number of steps in the setup phase (a settlement and then a road per placement)
+NUM_SETUP_STEPS = 2 * len(SETUP_PLAYER_ORDER)
+
+# Resources are indexed by the value of the TileType that produces them
+# (lumber, brick, wool, grain, ore)
+NUM_RESOURCES = 5
+ROAD_COST = [1, 1, 0, 0, 0]
+SETTLEMENT_COST = [1, 1, 1, 1, 0]
+CITY_COST = [0, 0, 0, 2, 3]
+
+VICTORY_POINTS_TO_WIN = 10
+
+class ActionType(Enum):
+    SETTLEMENT = 0
+    ROAD = 1
+    CITY = 2
+    END_TURN = 3
+    ROLL = 4 # Index is the dice total
+    ROBBER = 5 # Index is the tile the robber moves to
+
+# Flat action layout used by the environments: one action per node (settlement),
+# per edge (road), and per node (city), followed by ending the turn
+SETTLEMENT_ACTION_OFFSET = 0
+ROAD_ACTION_OFFSET = SETTLEMENT_ACTION_OFFSET + NUM_NODES
+CITY_ACTION_OFFSET = ROAD_ACTION_OFFSET + NUM_EDGES
+END_TURN_ACTION = CITY_ACTION_OFFSET + NUM_NODES
+NUM_ACTIONS = END_TURN_ACTION + 1
+
+# Columns of the board's per-node feature matrix (Board.node_features)
+NODE_FEATURE_PIPS = 0 # Pips of the tiles the node touches (the robber's tile counts as 0)
+NODE_FEATURE_RESOURCE_PIPS = 1 # First of NUM_RESOURCES columns: pips of each resource
+NODE_FEATURE_DIVERSITY = NODE_FEATURE_RESOURCE_PIPS + NUM_RESOURCES # Number of resources with pips
+NODE_FEATURE_PORT = NODE_FEATURE_DIVERSITY + 1 # 1 if the node has port access
+NODE_FEATURE_LEGAL = NODE_FEATURE_PORT + 1 # 1 if the distance rule allows a settlement
+NODE_FEATURE_OPEN_NEIGHBOURS = NODE_FEATURE_LEGAL + 1 # Neighbouring nodes the distance rule allows
+NUM_NODE_FEATURES = NODE_FEATURE_OPEN_NEIGHBOURS + 1
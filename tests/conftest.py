@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+import numpy as np
+import pytest
+
+# The modules in Game import each other by name (from board import Board), so both the root
+# and the Game directory need to be on the path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GAME_DIR = os.path.join(ROOT, "Game")
+sys.path[:0] = [ROOT, GAME_DIR]
+
+from constants import ActionType, SETTLEMENT, NUM_TILES, NUM_SETUP_STEPS, ROAD_COST, SETTLEMENT_COST, CITY_COST
+
+
+def legal_actions(game, rng):
+    """
+    Lists the legal actions of the current player, with the dice total and
+    robber tile drawn from rng when the player has to roll or move the robber.
+
+    :param game: The Game
+    :param rng: random.Random
+    :return: List of (ActionType, index) pairs
+    """
+    board = game.board
+    player = game.current_player
+    if game.setup_step < NUM_SETUP_STEPS:
+        if game.setup_step % 2 == 0:
+            return [(ActionType.SETTLEMENT, int(node)) for node in board.get_legal_node_indices()]
+        edges = board.get_legal_edge_indices(player, game.last_settlement)
+        return [(ActionType.ROAD, int(edge)) for edge in edges] or [(ActionType.END_TURN, 0)]
+    if not game.has_rolled:
+        return [(ActionType.ROLL, rng.randint(1, 6) + rng.randint(1, 6))]
+    if game.robber_pending:
+        tile = rng.randrange(NUM_TILES - 1)
+        return [(ActionType.ROBBER, tile + (tile >= board.robber_tile))]
+
+    resources = board.resources[player]
+    actions = [(ActionType.END_TURN, 0)]
+    if (resources >= SETTLEMENT_COST).all():
+        actions += [(ActionType.SETTLEMENT, int(node)) for node in board.get_legal_node_indices(player)]
+    if (resources >= ROAD_COST).all():
+        actions += [(ActionType.ROAD, int(edge)) for edge in board.get_legal_edge_indices(player)]
+    if (resources >= CITY_COST).all():
+        nodes = np.flatnonzero((board.node_owner == player) & (board.node_level == SETTLEMENT))
+        actions += [(ActionType.CITY, int(node)) for node in nodes]
+    return actions
+
+
+@pytest.fixture
+def random_games():
+    """
+    Plays random games with Game.apply, so they can be undone.
+
+    :return: Function (num_games, num_actions, seed) -> generator of the game
+        after each action
+    """
+    from Game.game import Game
+
+    def play(num_games, num_actions, seed=0):
+        rng = random.Random(seed)
+        game = Game()
+        for _ in range(num_games):
+            game.reset(rng)
+            for _ in range(num_actions):
+                game.apply(*rng.choice(legal_actions(game, rng)))
+                yield game
+
+    return play
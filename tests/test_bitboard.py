@@ -0,0 +1,63 @@
+import random
+import numpy as np
+from Game.game import Game
+from bitboard import BitBoard, iter_bits
+from constants import SETTLEMENT, NUM_PLAYERS
+
+
+def to_array(mask, size):
+    """
+    :param mask: A bitboard mask
+    :param size: Number of nodes or edges
+    :return: Boolean array with one entry per bit, like the masks of Board
+    """
+    return np.array([bool(mask >> index & 1) for index in range(size)])
+
+
+def test_legal_moves_match_board():
+    rng = random.Random(0)
+    game = Game()
+    board = game.board
+    num_nodes, num_edges = len(board.nodes), len(board.edges)
+    for _ in range(20):
+        game.reset(rng)
+        game.run_starting_positions()
+        bitboard = BitBoard.from_board(board)
+
+        for _ in range(60):
+            for player_index in range(NUM_PLAYERS):
+                assert np.array_equal(to_array(bitboard.legal_settlements(player_index), num_nodes),
+                                      board.get_legal_settlement_mask(player_index))
+                assert np.array_equal(to_array(bitboard.legal_settlements(is_setup=True), num_nodes),
+                                      board.get_legal_settlement_mask())
+                assert np.array_equal(to_array(bitboard.legal_cities(player_index), num_nodes),
+                                      (board.node_owner == player_index) & (board.node_level == SETTLEMENT))
+                assert np.array_equal(to_array(bitboard.legal_roads(player_index), num_edges),
+                                      board.get_legal_road_mask(player_index))
+                node_index = rng.randrange(num_nodes)
+                assert np.array_equal(to_array(bitboard.legal_roads(player_index, node_index), num_edges),
+                                      board.get_legal_road_mask(player_index, node_index))
+
+            # Place the same random piece on both
+            player_index = rng.randrange(NUM_PLAYERS)
+            choice = rng.random()
+            if choice < 0.5:
+                edges = list(iter_bits(bitboard.legal_roads(player_index)))
+                if edges:
+                    edge_index = rng.choice(edges)
+                    board.place_road(edge_index, player_index)
+                    bitboard.place_road(edge_index, player_index)
+            elif choice < 0.8:
+                nodes = list(iter_bits(bitboard.legal_settlements(player_index)))
+                if nodes:
+                    node_index = rng.choice(nodes)
+                    board.place_settlement(node_index, player_index)
+                    bitboard.place_settlement(node_index, player_index)
+            else:
+                nodes = list(iter_bits(bitboard.legal_cities(player_index)))
+                if nodes:
+                    node_index = rng.choice(nodes)
+                    board.place_city(node_index)
+                    bitboard.place_city(node_index)
+
+        assert vars(BitBoard.from_board(board)) == vars(bitboard)
@@ -0,0 +1,252 @@
+import random
+import numpy as np
+from constants import (TileType, NO_OWNER, NUM_PLAYERS, NUM_RESOURCES, NUM_NODE_FEATURES, NODE_FEATURE_PIPS,
+                       NODE_FEATURE_RESOURCE_PIPS, NODE_FEATURE_DIVERSITY, NODE_FEATURE_PORT, NODE_FEATURE_LEGAL,
+                       NODE_FEATURE_OPEN_NEIGHBOURS)
+from Game.game import Game
+
+
+def node_roads(board):
+    """
+    :param board: The board
+    :return: Boolean array (players x nodes) of the nodes touched by each player's roads
+    """
+    touched = np.zeros((NUM_PLAYERS, len(board.nodes)), dtype=bool)
+    for edge_index in np.flatnonzero(board.edge_owner != NO_OWNER):
+        touched[board.edge_owner[edge_index], board.topology.edge_to_nodes[edge_index]] = True
+    return touched
+
+
+def expected_settlements(board):
+    """
+    Recomputes the legal settlements of a board from its pieces, one node at a time.
+
+    :param board: The board
+    :return: Tuple of (distance rule mask, per-player settlement masks)
+    """
+    topology = board.topology
+    free = np.array([board.node_owner[node_index] == NO_OWNER
+                     and all(board.node_owner[neighbour] == NO_OWNER for neighbour in topology.node_neighbours(node_index))
+                     for node_index in range(len(board.nodes))])
+    return free, free & node_roads(board)
+
+
+def expected_roads(board):
+    """
+    Recomputes each player's legal roads from the pieces, one edge at a time.
+
+    :param board: The board
+    :return: Boolean array (players x edges)
+    """
+    touched = node_roads(board)
+    roads = np.zeros((NUM_PLAYERS, len(board.edges)), dtype=bool)
+    for player_index in range(NUM_PLAYERS):
+        reach = (board.node_owner == player_index) | ((board.node_owner == NO_OWNER) & touched[player_index])
+        for edge_index in np.flatnonzero(board.edge_owner == NO_OWNER):
+            roads[player_index, edge_index] = reach[board.topology.edge_to_nodes[edge_index]].any()
+    return roads
+
+
+def expected_longest_road(board, player_index):
+    """
+    Searches every path of the player's roads from every node.
+
+    :param board: The board
+    :param player_index: The index of the player
+    :return: The number of roads in the longest road
+    """
+    topology = board.topology
+
+    def extend(node_index, used):
+        best = 0
+        for edge_index in topology.node_edges(node_index):
+            if board.edge_owner[edge_index] != player_index or edge_index in used:
+                continue
+            first, second = topology.edge_to_nodes[edge_index]
+            other = second if first == node_index else first
+            passable = board.node_owner[other] in (NO_OWNER, player_index)
+            best = max(best, 1 + (extend(other, used | {edge_index}) if passable else 0))
+        return best
+
+    return max(extend(node_index, frozenset()) for node_index in range(len(board.nodes)))
+
+
+def expected_node_features(board):
+    """
+    Recomputes the node features of a board, one tile at a time.
+
+    :param board: The board
+    :return: Array of the node features (nodes x NUM_NODE_FEATURES)
+    """
+    topology = board.topology
+    features = np.zeros((len(board.nodes), NUM_NODE_FEATURES), dtype=np.float32)
+    for tile in board.tiles:
+        if not tile.dice_value or tile.index == board.robber_tile:
+            continue
+        pips = 6 - abs(7 - tile.dice_value)
+        for node in tile.nodes:
+            features[node.index, NODE_FEATURE_PIPS] += pips
+            features[node.index, NODE_FEATURE_RESOURCE_PIPS + tile.resource_type.value] += pips
+
+    for node_index in range(len(board.nodes)):
+        resource_pips = features[node_index, NODE_FEATURE_RESOURCE_PIPS:NODE_FEATURE_RESOURCE_PIPS + NUM_RESOURCES]
+        features[node_index, NODE_FEATURE_DIVERSITY] = np.count_nonzero(resource_pips)
+        features[node_index, NODE_FEATURE_PORT] = topology.node_to_port[node_index] >= 0
+        features[node_index, NODE_FEATURE_LEGAL] = board.legal_settlement_mask[node_index]
+        features[node_index, NODE_FEATURE_OPEN_NEIGHBOURS] = board.legal_settlement_mask[
+            topology.node_neighbours(node_index)].sum()
+    return features
+
+
+def test_tile_reset_updates_board():
+    game = Game()
+    game.reset(random.Random(0))
+    board = game.board
+    version = board.version
+    tile = next(tile for tile in board.tiles if tile.resource_type == TileType.FOREST)
+    tile.reset(TileType.MOUNTAIN, 12)
+
+    assert tile.resource_type == TileType.MOUNTAIN and tile.dice_value == 12
+    assert board.zobrist_key == board.compute_zobrist_key()
+    assert board.tile_version[tile.index] > version
+    start, end = board.production_indptr[12], board.production_indptr[13]
+    assert tile.index in board.production_tiles[start:end]
+    assert (board.production_resources[board.production_tiles == tile.index] == TileType.MOUNTAIN.value).all()
+
+
+def test_settlement_masks_match_recomputation(random_games):
+    for game in random_games(num_games=5, num_actions=300):
+        free, settlements = expected_settlements(game.board)
+        assert np.array_equal(game.board.legal_settlement_mask, free)
+        assert np.array_equal(game.board.player_settlement_mask, settlements)
+
+
+def test_settlement_masks_after_removals(random_games):
+    *_, game = random_games(num_games=1, num_actions=300, seed=1)
+    for _ in range(300):
+        game.undo()
+        free, settlements = expected_settlements(game.board)
+        assert np.array_equal(game.board.legal_settlement_mask, free)
+        assert np.array_equal(game.board.player_settlement_mask, settlements)
+
+
+def test_road_frontier_matches_recomputation(random_games):
+    for game in random_games(num_games=5, num_actions=300, seed=2):
+        assert np.array_equal(game.board.road_frontier, expected_roads(game.board))
+
+
+def test_road_frontier_after_removals(random_games):
+    *_, game = random_games(num_games=1, num_actions=300, seed=3)
+    for _ in range(300):
+        game.undo()
+        assert np.array_equal(game.board.road_frontier, expected_roads(game.board))
+
+
+def test_road_mask_at_node(random_games):
+    rng = random.Random(5)
+    for game in random_games(num_games=3, num_actions=100, seed=4):
+        board = game.board
+        node_index = rng.randrange(len(board.nodes))
+        mask = board.get_legal_road_mask(game.current_player, node_index)
+        expected = np.zeros(len(board.edges), dtype=bool)
+        node_edges = board.topology.node_edges(node_index)
+        expected[node_edges] = expected_roads(board)[game.current_player, node_edges]
+        assert np.array_equal(mask, expected)
+
+
+def test_produce_matches_tile_loop(random_games):
+    for index, game in enumerate(random_games(num_games=3, num_actions=300, seed=6)):
+        if index % 20:
+            continue
+        board = game.board
+        for dice_total in range(2, 13):
+            expected = np.zeros((NUM_PLAYERS, NUM_RESOURCES), dtype=np.int16)
+            for tile in board.tiles:
+                if tile.dice_value != dice_total or tile.index == board.robber_tile:
+                    continue
+                for node in tile.nodes:
+                    owner = board.node_owner[node.index]
+                    if owner != NO_OWNER:
+                        expected[owner, tile.resource_type.value] += board.node_level[node.index]
+
+            resources = board.resources.copy()
+            assert np.array_equal(board.produce(dice_total), expected)
+            assert np.array_equal(board.resources, resources + expected)
+            board.add_resources(-expected)
+
+
+def test_node_features_match_recomputation(random_games):
+    for game in random_games(num_games=5, num_actions=300, seed=12):
+        assert np.array_equal(game.board.node_features, expected_node_features(game.board))
+
+
+def test_node_features_after_removals(random_games):
+    *_, game = random_games(num_games=1, num_actions=300, seed=13)
+    for _ in range(300):
+        game.undo()
+        assert np.array_equal(game.board.node_features, expected_node_features(game.board))
+
+
+def test_node_features_after_board_changes():
+    game = Game()
+    game.reset(random.Random(14))
+    board = game.board
+    snapshot = game.snapshot()
+    expected = expected_node_features(board)
+    assert np.array_equal(board.node_features, expected)
+
+    board.place_settlement(int(np.argmax(board.node_features[:, NODE_FEATURE_PIPS])), 0)
+    assert np.array_equal(board.node_features, expected_node_features(board))
+    board.move_robber((board.robber_tile + 1) % len(board.tiles))
+    assert np.array_equal(board.node_features, expected_node_features(board))
+    next(tile for tile in board.tiles if tile.dice_value).reset(TileType.HILL, 6)
+    assert np.array_equal(board.node_features, expected_node_features(board))
+
+    game.restore(snapshot)
+    assert np.array_equal(board.node_features, expected)
+
+
+def test_zobrist_key_matches_recomputation(random_games):
+    for game in random_games(num_games=5, num_actions=300, seed=7):
+        assert game.board.zobrist_key == game.board.compute_zobrist_key()
+
+
+def test_zobrist_key_with_extreme_resource_counts():
+    game = Game()
+    game.reset(random.Random(8))
+    board = game.board
+    keys = {}
+    for count in (70, -2, 3, 0, -1, 63, 64):
+        board.set_resource(1, 2, count)
+        assert board.zobrist_key == board.compute_zobrist_key()
+        keys[count] = board.zobrist_key
+
+    # Counts out of range share the key of the nearest count in range
+    assert keys[-2] == keys[-1] == keys[0]
+    assert keys[63] == keys[64] == keys[70]
+    assert keys[-1] != keys[63]
+
+
+def test_player_reset_updates_zobrist_key(random_games):
+    *_, game = random_games(num_games=1, num_actions=200, seed=9)
+    for player in game.players:
+        player.reset()
+        assert game.board.zobrist_key == game.board.compute_zobrist_key()
+
+
+def test_longest_road_matches_search(random_games):
+    longest = 0
+    for game in random_games(num_games=5, num_actions=300, seed=10):
+        board = game.board
+        for player_index in range(NUM_PLAYERS):
+            assert board.get_longest_road(player_index) == expected_longest_road(board, player_index)
+            longest = max(longest, board.get_longest_road(player_index))
+    assert longest > 2 # The games got past the starting roads
+
+
+def test_longest_road_after_removals(random_games):
+    *_, game = random_games(num_games=1, num_actions=300, seed=11)
+    for _ in range(150):
+        game.undo()
+        for player_index in range(NUM_PLAYERS):
+            assert game.board.get_longest_road(player_index) == expected_longest_road(game.board, player_index)
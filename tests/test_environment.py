@@ -0,0 +1,99 @@
+import numpy as np
+from Environment.environment import CatanEnvironment
+from Environment.observations import decode_categorical
+from constants import NO_OWNER, NUM_PLAYERS
+
+
+def expected_float_obs(board, player):
+    """
+    Encodes a board from scratch, from the perspective of the player.
+
+    :param board: The board
+    :param player: The observing player
+    :return: Dict of the tile, node, and edge observations
+    """
+    tiles = np.zeros((len(board.tiles), 8), dtype=np.float32)
+    tiles[np.arange(len(board.tiles)), board.tile_resource] = 1
+    tiles[:, 6] = board.tile_dice / 12
+    tiles[board.robber_tile, 7] = 1
+
+    nodes = np.zeros((len(board.nodes), 8), dtype=np.float32)
+    for node_index, (owner, level) in enumerate(zip(board.node_owner, board.node_level)):
+        nodes[node_index, 0 if owner == NO_OWNER else (owner - player) % NUM_PLAYERS + 1] = 1
+        nodes[node_index, 5 + level] = 1
+
+    edges = np.zeros((len(board.edges), 4), dtype=np.float32)
+    for edge_index, owner in enumerate(board.edge_owner):
+        if owner != NO_OWNER:
+            edges[edge_index, (owner - player) % NUM_PLAYERS] = 1
+    return {"tiles": tiles, "nodes": nodes, "edges": edges}
+
+
+def random_episode(env, num_steps, seed):
+    """
+    Steps the environment with random legal actions, resetting finished episodes.
+
+    :param env: The CatanEnvironment
+    :param num_steps: Number of steps
+    :param seed: Seed of the first reset and the actions
+    :return: Generator of the observation after the reset and each step
+    """
+    rng = np.random.default_rng(seed)
+    obs, info = env.reset(seed=seed)
+    yield obs
+    for _ in range(num_steps):
+        obs, _, terminated, truncated, info = env.step(rng.choice(np.flatnonzero(info["action_mask"])))
+        yield obs
+        if terminated or truncated:
+            obs, info = env.reset()
+            yield obs
+
+
+def test_incremental_obs_matches_full_encoding():
+    env = CatanEnvironment()
+    perspectives = set()
+    for obs in random_episode(env, num_steps=1000, seed=0):
+        perspectives.add(env.obs_player)
+        expected = expected_float_obs(env.game.board, env.game.current_player)
+        for key in expected:
+            assert np.array_equal(obs[key], expected[key]), key
+    assert perspectives == set(range(NUM_PLAYERS))
+
+
+def test_decoded_categorical_obs_matches_float_obs():
+    float_env = CatanEnvironment()
+    categorical_env = CatanEnvironment(obs_mode="categorical")
+    batch = {"float": [], "categorical": []}
+    for float_obs, categorical_obs in zip(random_episode(float_env, num_steps=500, seed=0),
+                                          random_episode(categorical_env, num_steps=500, seed=0)):
+        assert all(value.dtype == np.int8 for value in categorical_obs.values())
+        decoded = decode_categorical(categorical_obs)
+        for key in float_obs:
+            assert decoded[key].dtype == np.float32, key
+            assert np.array_equal(decoded[key], float_obs[key]), key
+        batch["float"].append({key: value.copy() for key, value in float_obs.items()})
+        batch["categorical"].append({key: value.copy() for key, value in categorical_obs.items()})
+
+    decoded = decode_categorical({key: np.stack([obs[key] for obs in batch["categorical"]]) for key in batch["categorical"][0]})
+    for key in decoded:
+        assert np.array_equal(decoded[key], np.stack([obs[key] for obs in batch["float"]])), key
+
+
+def test_graph_obs_shares_static_edge_index():
+    env = CatanEnvironment(obs_mode="graph")
+    obs, _ = env.reset(seed=0)
+    static_keys = [key for key in obs if key.startswith("edge_index_")] + ["road_index"]
+    static = {key: obs[key] for key in static_keys}
+    expected = {key: value.copy() for key, value in static.items()}
+    other_obs, _ = CatanEnvironment(obs_mode="graph").reset(seed=1)
+
+    for obs in random_episode(env, num_steps=500, seed=2):
+        assert env.observation_space.contains(obs)
+        float_obs = expected_float_obs(env.game.board, env.game.current_player)
+        for key in float_obs:
+            assert np.array_equal(obs[key], float_obs[key]), key
+        for key in static_keys:
+            assert obs[key] is static[key] and other_obs[key] is static[key], key
+            assert not obs[key].flags.writeable, key
+    for key in static_keys:
+        assert np.array_equal(static[key], expected[key]), key
@@ -0,0 +1,72 @@
+import random
+import numpy as np
+from Game.game import Game
+from conftest import legal_actions
+
+
+def full_state(game):
+    """
+    :param game: The Game
+    :return: Everything restoring a game has to bring back: the whole board
+        buffer (derived legality state included), the robber, the Zobrist key,
+        and the turn state
+    """
+    return (game.board._state.tobytes(), game.board.robber_tile, game.board.zobrist_key, game.zobrist_key,
+            game._get_turn_state())
+
+
+def test_undo_restores_state():
+    rng = random.Random(0)
+    game = Game()
+    for _ in range(5):
+        game.reset(rng)
+        history = []
+        for _ in range(300):
+            history.append(full_state(game))
+            game.apply(*rng.choice(legal_actions(game, rng)))
+        for state in reversed(history):
+            game.undo()
+            assert full_state(game) == state
+
+
+def test_restore_returns_to_snapshot(random_games):
+    *_, game = random_games(num_games=1, num_actions=100, seed=4)
+    snapshot = game.snapshot()
+    state = full_state(game)
+    rng = random.Random(5)
+    for _ in range(100):
+        game.play(*rng.choice(legal_actions(game, rng)))
+    game.restore(snapshot)
+    assert full_state(game) == state
+
+
+def test_clone_is_independent(random_games):
+    *_, game = random_games(num_games=1, num_actions=200, seed=2)
+    clone = game.clone()
+    assert full_state(clone) == full_state(game)
+
+    rng = random.Random(3)
+    state = full_state(game)
+    for _ in range(50):
+        clone.play(*rng.choice(legal_actions(clone, rng)))
+    assert full_state(game) == state
+    assert not np.shares_memory(clone.board._state, game.board._state)
+
+
+def test_load_bytes_restores_state(random_games):
+    loaded = Game()
+    for index, game in enumerate(random_games(num_games=5, num_actions=300, seed=1)):
+        if index % 10:
+            continue
+        data = game.to_bytes()
+        assert len(data) == game.state_size
+        loaded.load_bytes(data)
+        assert full_state(loaded) == full_state(game)
+        assert loaded.to_bytes() == data
+        for player_index in range(len(game.players)):
+            assert loaded.board.get_longest_road(player_index) == game.board.get_longest_road(player_index)
+
+
+def test_serialized_state_leaves_out_derived_state(random_games):
+    *_, game = random_games(num_games=1, num_actions=10)
+    assert game.state_size < game.board._state.nbytes
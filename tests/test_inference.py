@@ -0,0 +1,94 @@
+import threading
+import numpy as np
+import pytest
+from Game.game import Game
+from Game.inference import DecisionBroker, LinearMockPolicy, BrokerSetupAgent
+from constants import NO_OWNER, NUM_ACTIONS, NUM_SETUP_STEPS, NUM_PLAYERS
+
+
+def random_requests(num_requests, observation_size, seed):
+    """
+    Creates random observations, each with a random set of legal actions.
+
+    :param num_requests: Number of requests
+    :param observation_size: Size of each observation
+    :param seed: Seed of the requests
+    :return: List of (observation, action mask) tuples
+    """
+    rng = np.random.default_rng(seed)
+    return [(rng.standard_normal(observation_size).astype(np.float32), rng.random(NUM_ACTIONS) < 0.2)
+            for _ in range(num_requests)]
+
+
+def test_batches_concurrent_requests():
+    policy = LinearMockPolicy(16, seed=0)
+    reference = LinearMockPolicy(16, seed=0)
+    requests = random_requests(200, 16, seed=1)
+
+    with DecisionBroker(policy, max_batch_size=64, max_wait=0.05) as broker:
+        futures = [broker.submit(obs, mask) for obs, mask in requests]
+        actions = [future.result(timeout=10) for future in futures]
+
+    for (obs, mask), action in zip(requests, actions):
+        assert action == reference(obs[None], mask[None])[0]
+    assert broker.num_decisions == 200
+    assert max(policy.batch_sizes) <= 64
+    assert broker.mean_batch_size > 1
+
+
+def test_policy_error_only_fails_its_batch():
+    def flaky_policy(obs, action_mask):
+        if obs[:, 0].min() < 0:
+            raise ValueError("Negative observation")
+        return np.argmax(action_mask, axis=1)
+
+    mask = np.zeros(NUM_ACTIONS, dtype=bool)
+    mask[7] = True
+    with DecisionBroker(flaky_policy, max_wait=0.05) as broker:
+        failed = [broker.submit(np.full(4, -1.0), mask) for _ in range(3)]
+        for future in failed:
+            with pytest.raises(ValueError, match="Negative observation"):
+                future.result(timeout=10)
+        assert broker.decide(np.ones(4), mask) == 7
+        assert broker.num_decisions == 1
+
+
+def test_wrong_number_of_actions_fails_the_batch():
+    mask = np.ones(NUM_ACTIONS, dtype=bool)
+    with DecisionBroker(lambda obs, action_mask: [0], max_wait=0.05) as broker:
+        futures = [broker.submit(np.zeros(4), mask) for _ in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError, match="1 actions for a batch of 3"):
+                future.result(timeout=10)
+        assert broker.decide(np.zeros(4), mask) == 0
+
+
+def test_submit_after_close_raises():
+    broker = DecisionBroker(LinearMockPolicy(4, seed=0))
+    obs, mask = random_requests(1, 4, seed=0)[0]
+    future = broker.submit(obs, mask)
+    broker.close()
+    assert future.result(timeout=10) in np.flatnonzero(mask)
+    with pytest.raises(RuntimeError, match="closed"):
+        broker.submit(obs, mask)
+
+
+def test_setup_agent_plays_games_on_many_threads():
+    policy = LinearMockPolicy(BrokerSetupAgent.OBSERVATION_SIZE, seed=0)
+    games = [Game() for _ in range(16)]
+    for game in games:
+        game.reset()
+    with DecisionBroker(policy, max_wait=0.02) as broker:
+        agent = BrokerSetupAgent(broker)
+        threads = [threading.Thread(target=game.run_starting_positions, args=(agent,)) for game in games]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for game in games:
+        assert game.setup_step == NUM_SETUP_STEPS
+        assert (game.board.node_owner != NO_OWNER).sum() == 2 * NUM_PLAYERS
+        assert (game.board.edge_owner != NO_OWNER).sum() <= 2 * NUM_PLAYERS
+    assert broker.num_decisions >= len(games) * 2 * NUM_PLAYERS
+    assert broker.mean_batch_size > 1
@@ -0,0 +1,62 @@
+import random
+import numpy as np
+import pytest
+from Game.game import Game
+from playout import PlayoutSimulator
+from constants import NO_OWNER, NUM_PLAYERS, VICTORY_POINTS_TO_WIN
+
+
+def victory_points(board):
+    """
+    :param board: The board
+    :return: Array of each player's points from buildings
+    """
+    owned = board.node_owner != NO_OWNER
+    return np.bincount(board.node_owner[owned], weights=board.node_level[owned], minlength=NUM_PLAYERS)
+
+
+@pytest.mark.parametrize("policy", ["random", "greedy"])
+def test_run_summarizes_playouts(policy):
+    game = Game()
+    game.reset(random.Random(0))
+    state = game.to_bytes()
+    results = PlayoutSimulator(policy, seed=0).run(game, 50)
+    assert game.to_bytes() == state
+
+    winners, points, turns = results["winners"], results["victory_points"], results["turns"]
+    assert winners.shape == (50,) and points.shape == (50, NUM_PLAYERS) and turns.shape == (50,)
+    won = winners != NO_OWNER
+    assert won.any()
+    assert (points[won, winners[won]] >= VICTORY_POINTS_TO_WIN).all()
+    assert (points[~won] < VICTORY_POINTS_TO_WIN).all()
+    assert np.isclose(results["win_rate"].sum() + results["stopped_rate"], 1)
+    assert np.allclose(results["victory_point_distribution"].sum(axis=1), 1)
+
+
+def test_playouts_from_random_positions(random_games):
+    simulator = PlayoutSimulator(seed=0)
+    for step, game in enumerate(random_games(2, 300, seed=1)):
+        if step % 25:
+            continue
+        state = game.to_bytes()
+        turn_state = (game.current_player, game.setup_step, game.turn, game.has_rolled, game.robber_pending)
+        winner, points, turn = simulator.playout(game)
+        assert game.to_bytes() == state
+        assert (game.current_player, game.setup_step, game.turn, game.has_rolled, game.robber_pending) == turn_state
+
+        assert (np.array(points) >= victory_points(game.board)).all()
+        assert turn >= game.turn
+        if winner != NO_OWNER:
+            assert points[winner] >= VICTORY_POINTS_TO_WIN
+
+
+def test_seed_makes_runs_reproducible():
+    game = Game()
+    game.reset(random.Random(0))
+    game.run_starting_positions()
+    first = PlayoutSimulator("greedy", seed=3).run(game, 20)
+    second = PlayoutSimulator("greedy", seed=3).run(game, 20)
+    other = PlayoutSimulator("greedy", seed=4).run(game, 20)
+    for key in first:
+        assert np.array_equal(first[key], second[key]), key
+    assert not np.array_equal(first["turns"], other["turns"])
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from Environment.environment import CatanEnvironment
+from Game.profiling import Profiler
+
+
+def test_profile_includes_current_step():
+    env = CatanEnvironment()
+    env.enable_profiling()
+    _, info = env.reset(seed=0)
+    assert info["profile"]["env.reset"]["calls"] == 1
+
+    for calls in range(1, 4):
+        _, _, _, _, info = env.step(np.flatnonzero(info["action_mask"])[0])
+        assert info["profile"]["env.step"]["calls"] == calls
+        assert info["profile"]["env.step"]["total_s"] > 0
+
+
+def test_second_profiler_is_rejected():
+    env = CatanEnvironment()
+    profiler = env.enable_profiling()
+    profiler.attach(env.game.board, {"produce": "board.produce"}) # Already attached, so nothing happens
+    with pytest.raises(RuntimeError):
+        Profiler().attach(env.game.board, {"produce": "board.produce"})
+
+    env.disable_profiling()
+    assert "produce" not in vars(env.game.board)
+    Profiler().attach(env.game.board, {"produce": "board.produce"})
+
+
+def test_shared_profiler_detaches_one_environment():
+    profiler = Profiler()
+    first, second = CatanEnvironment(), CatanEnvironment()
+    first.enable_profiling(profiler)
+    second.enable_profiling(profiler)
+    first.disable_profiling()
+
+    first.reset(seed=0)
+    second.reset(seed=0)
+    assert profiler.stats()["env.reset"]["calls"] == 1
+    assert "_step" not in vars(first) and "_step" in vars(second)
@@ -0,0 +1,52 @@
+import json
+import os
+import numpy as np
+import pytest
+from recorder import FrameRecorder
+
+
+def frames(count):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, size=(12, 20, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def test_png_frames(tmp_path):
+    pygame = pytest.importorskip("pygame")
+    recorder = FrameRecorder(str(tmp_path), "png", block=True)
+    expected = frames(5)
+    for frame in expected:
+        assert recorder.submit(frame)
+    assert recorder.close() == {"submitted": 5, "written": 5, "dropped": 0}
+
+    for index, frame in enumerate(expected):
+        image = pygame.image.load(str(tmp_path / f"frame_{index:06d}.png"))
+        assert np.array_equal(pygame.surfarray.array3d(image).transpose(1, 0, 2), frame)
+
+
+def test_raw_frames(tmp_path):
+    recorder = FrameRecorder(str(tmp_path), "raw", block=True)
+    expected = frames(4)
+    for frame in expected:
+        recorder.submit(frame)
+    recorder.flush()
+    recorder.close()
+
+    with open(tmp_path / "frames.json") as file:
+        header = json.load(file)
+    written = np.memmap(tmp_path / "frames.raw", dtype=header["dtype"], mode="r", shape=tuple(header["shape"]))
+    assert np.array_equal(written, np.stack(expected))
+
+
+@pytest.mark.parametrize("block", [False, True])
+def test_write_error_is_raised(tmp_path, block):
+    # A directory where the first frame goes makes writing it fail
+    os.mkdir(tmp_path / "frame_000000.png")
+    recorder = FrameRecorder(str(tmp_path), "png", max_queue=2, block=block)
+    recorder.submit(frames(1)[0])
+    with pytest.raises(RuntimeError):
+        recorder.flush()
+    with pytest.raises(RuntimeError):
+        recorder.submit(frames(1)[0])
+    with pytest.raises(RuntimeError):
+        recorder.close()
+    assert recorder.frames_written == 0
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from conftest import GAME_DIR
+
+pygame = pytest.importorskip("pygame")
+
+
+@pytest.fixture
+def rgb_environment(monkeypatch):
+    """
+    A CatanEnvironment rendering offscreen. The renderer loads its assets
+    relative to the Game directory.
+    """
+    from Environment.environment import CatanEnvironment
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    monkeypatch.chdir(GAME_DIR)
+    env = CatanEnvironment(render_mode="rgb_array")
+    yield env
+    env.close()
+
+
+def test_render_returns_frame_without_display(rgb_environment):
+    rgb_environment.reset(seed=0)
+    frame = rgb_environment.render()
+    assert frame.shape == (900, 1500, 3) and frame.dtype == np.uint8
+    assert frame.any()
+    assert pygame.display.get_surface() is None
+
+
+def test_partial_redraw_matches_full_redraw(rgb_environment):
+    env = rgb_environment
+    rng = np.random.default_rng(0)
+    _, info = env.reset(seed=0)
+    env.render()
+    for step in range(300):
+        _, _, terminated, truncated, info = env.step(rng.choice(np.flatnonzero(info["action_mask"])))
+        if terminated or truncated:
+            break
+        frame = env.render().copy()
+        if step % 25 == 0:
+            # Redraw everything and compare
+            env.game_visual._drawn_version = -1
+            assert np.array_equal(env.render(), frame)
+    assert (env.game.board.edge_owner >= 0).any()
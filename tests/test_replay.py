@@ -0,0 +1,48 @@
+import random
+import pytest
+from Game.game import Game
+from replay import ReplayWriter, ReplayReader
+from conftest import legal_actions
+
+
+@pytest.fixture
+def recorded_game(tmp_path):
+    """
+    Records a random game, keeping the serialized state before every action
+    and at the start of every turn.
+
+    :return: Tuple of (replay path, states by record, states by turn)
+    """
+    rng = random.Random(0)
+    game = Game()
+    game.reset(rng)
+    path = str(tmp_path / "game.rpl")
+    record_states, turn_states = [], {0: game.to_bytes()}
+    with ReplayWriter(path, game, seed=0, checkpoint_interval=5) as writer:
+        for _ in range(600):
+            record_states.append(game.to_bytes())
+            turn = game.turn
+            writer.play(*rng.choice(legal_actions(game, rng)))
+            if game.turn != turn:
+                turn_states[game.turn] = game.to_bytes()
+    record_states.append(game.to_bytes())
+    return path, record_states, turn_states
+
+
+def test_seek_to_record(recorded_game):
+    path, record_states, _ = recorded_game
+    reader = ReplayReader(path)
+    assert len(reader) == len(record_states) - 1
+    assert reader.seed == 0 and len(reader.checkpoints) > 2
+
+    game = Game()
+    for record_index, state in enumerate(record_states):
+        assert reader.game_at_record(record_index, game).to_bytes() == state
+
+
+def test_seek_to_turn(recorded_game):
+    path, _, turn_states = recorded_game
+    reader = ReplayReader(path)
+    assert reader.num_turns == max(turn_states)
+    for turn, state in turn_states.items():
+        assert reader.game_at_turn(turn).to_bytes() == state
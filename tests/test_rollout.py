@@ -0,0 +1,75 @@
+import numpy as np
+from Environment.rollout import RolloutRunner, random_policy, worker_seeds
+from Environment.vector_environment import VectorCatanEnv
+
+
+def local_workers(seed, num_workers, games_per_worker):
+    """
+    Creates the environments and policy RNGs the runner's workers use.
+
+    :param seed: Seed of the runner
+    :param num_workers: Number of workers
+    :param games_per_worker: Number of games of each worker
+    :return: List of the (env, first (obs, info), policy rng) of each worker
+    """
+    workers = []
+    for env_seed, policy_seed in worker_seeds(seed, num_workers):
+        env = VectorCatanEnv(games_per_worker)
+        workers.append((env, env.reset(seed=env_seed), np.random.default_rng(policy_seed)))
+    return workers
+
+
+def test_worker_seeds_are_independent():
+    seeds = worker_seeds(3, 4)
+    env_seeds = [env_seed for env_seed, _ in seeds]
+    assert env_seeds == [env_seed for env_seed, _ in worker_seeds(3, 4)]
+    assert len(set(env_seeds)) == len(env_seeds)
+
+    streams = [np.random.default_rng(env_seed).random(8) for env_seed in env_seeds]
+    streams += [np.random.default_rng(policy_seed).random(8) for _, policy_seed in seeds]
+    assert len({stream.tobytes() for stream in streams}) == len(streams)
+
+
+def test_lockstep_matches_local_environments():
+    num_workers, games_per_worker, seed = 2, 4, 3
+    local = [(env, obs, info) for env, (obs, info), _ in local_workers(seed, num_workers, games_per_worker)]
+    rng = np.random.default_rng(0)
+
+    with RolloutRunner(num_workers, games_per_worker, ring_size=4, seed=seed) as runner:
+        obs, info = runner.reset()
+        for _ in range(200):
+            for index, (_, local_obs, local_info) in enumerate(local):
+                games = slice(index * games_per_worker, (index + 1) * games_per_worker)
+                assert np.array_equal(info["action_mask"][games], local_info["action_mask"])
+                assert np.array_equal(info["current_player"][games], local_info["current_player"])
+                for key in local_obs:
+                    assert np.array_equal(obs[key][games], local_obs[key])
+
+            actions = random_policy(obs, info["action_mask"], rng)
+            obs, rewards, terminated, truncated, info = runner.step(actions)
+            for index, (env, _, _) in enumerate(local):
+                games = slice(index * games_per_worker, (index + 1) * games_per_worker)
+                local_obs, local_rewards, local_terminated, local_truncated, local_info = env.step(actions[games])
+                assert np.array_equal(rewards[games], local_rewards)
+                assert np.array_equal(terminated[games], local_terminated)
+                assert np.array_equal(truncated[games], local_truncated)
+                local[index] = (env, local_obs, local_info)
+
+
+def test_async_workers_use_their_policy_seed():
+    num_workers, games_per_worker, seed = 2, 4, 5
+    local = local_workers(seed, num_workers, games_per_worker)
+
+    with RolloutRunner(num_workers, games_per_worker, ring_size=4, mode="async", seed=seed) as runner:
+        for _ in range(50):
+            slot = runner.collect()
+            for index, (env, (local_obs, local_info), rng) in enumerate(local):
+                games = slice(index * games_per_worker, (index + 1) * games_per_worker)
+                for key in local_obs:
+                    assert np.array_equal(slot[key][games], local_obs[key])
+                actions = random_policy(local_obs, local_info["action_mask"], rng)
+                assert np.array_equal(slot["action"][games], actions)
+
+                local_obs, local_rewards, _, _, local_info = env.step(actions)
+                assert np.array_equal(slot["reward"][games], local_rewards)
+                local[index] = (env, (local_obs, local_info), rng)
@@ -0,0 +1,45 @@
+import random
+from Game.game import Game
+from setup_agent import MCTSSetupAgent
+from zobrist import TranspositionTable
+
+
+def new_game(seed):
+    game = Game()
+    game.reset(random.Random(seed))
+    return game
+
+
+def test_time_budget_does_not_reuse_entries():
+    game = new_game(0)
+    table = TranspositionTable(1024)
+    table.store(game.zobrist_key, 0.0, 1, MCTSSetupAgent._encode_move((0, None)))
+
+    agent = MCTSSetupAgent(time_budget=0.02, transposition_table=table, seed=0)
+    agent.get_starting_position(game)
+    assert agent.last_iterations > 1
+
+
+def test_iteration_budget_reuses_deeper_entries():
+    game = new_game(1)
+    table = TranspositionTable(1024)
+    searcher = MCTSSetupAgent(time_budget=None, max_iterations=200, transposition_table=table, seed=0)
+    searcher.get_starting_position(game)
+
+    # An entry searched for fewer iterations than the budget is searched again
+    deeper = MCTSSetupAgent(time_budget=None, max_iterations=400, transposition_table=table, seed=0)
+    deeper.get_starting_position(game)
+    assert deeper.last_iterations == 400
+
+    shallower = MCTSSetupAgent(time_budget=None, max_iterations=100, transposition_table=table, seed=0)
+    assert shallower.get_starting_position(game) == deeper.get_starting_position(game)
+    assert shallower.last_iterations == 0
+
+
+def test_search_leaves_game_unchanged():
+    game = new_game(2)
+    state, key = game.to_bytes(), game.zobrist_key
+    settlement, road = MCTSSetupAgent(time_budget=None, max_iterations=100, seed=0).get_starting_position(game)
+    assert game.to_bytes() == state and game.zobrist_key == key
+    assert game.board.legal_settlement_mask[settlement]
+    assert road is None or road in game.board.topology.node_edges(settlement)
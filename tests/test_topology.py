@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from topology import get_topology_index, create_four_player_board
+from constants import NUM_NODES, NUM_EDGES
+
+
+def test_index_is_shared():
+    first, second = create_four_player_board(), create_four_player_board()
+    assert first.topology is second.topology is get_topology_index()
+
+
+def test_index_is_read_only():
+    topology = get_topology_index()
+    with pytest.raises(ValueError):
+        topology.edge_to_nodes[0, 0] = 1
+    with pytest.raises(ValueError):
+        topology.graph_edge_index[("node", "road", "node")][0, 0] = 1
+
+
+def test_relations_are_consistent():
+    topology = get_topology_index()
+    for node_index in range(NUM_NODES):
+        for edge_index in topology.node_edges(node_index):
+            assert node_index in topology.edge_to_nodes[edge_index]
+        for neighbour in topology.node_neighbours(node_index):
+            assert node_index in topology.node_neighbours(neighbour)
+        assert list(topology.node_edges(node_index)) == list(topology.node_edges_tuples[node_index])
+    for edge_index in range(NUM_EDGES):
+        assert tuple(topology.edge_to_nodes[edge_index]) == topology.edge_nodes_tuples[edge_index]
+    assert np.array_equal(topology.tile_node_incidence.sum(axis=0), [len(topology.node_tiles(node_index))
+                                                                     for node_index in range(NUM_NODES)])
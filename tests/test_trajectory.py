@@ -0,0 +1,72 @@
+import numpy as np
+from Environment.environment import CatanEnvironment
+from Environment.trajectory import TrajectoryDataset, TrajectoryWriter, get_transition_fields
+from Environment.vector_environment import VectorCatanEnv
+
+
+def read_all(dataset):
+    """
+    Concatenates every shard of a dataset.
+
+    :param dataset: The TrajectoryDataset
+    :return: Dict of field name -> array of all transitions
+    """
+    shards = list(dataset.iter_shards())
+    return {name: np.concatenate([shard[name] for shard in shards]) for name in dataset.fields}
+
+
+def test_round_trip(tmp_path):
+    env = CatanEnvironment()
+    rng = np.random.default_rng(0)
+    obs, info = env.reset(seed=0)
+    transitions = []
+    with TrajectoryWriter(str(tmp_path), get_transition_fields(env.observation_space), shard_size=100) as writer:
+        for _ in range(250):
+            action = rng.choice(np.flatnonzero(info["action_mask"]))
+            step_obs = {key: value.copy() for key, value in obs.items()}
+            action_mask = info["action_mask"].copy()
+            obs, reward, terminated, truncated, info = env.step(action)
+            writer.add(step_obs, action_mask, action, reward, terminated, truncated)
+            transitions.append((step_obs, action_mask, action, reward, terminated, truncated))
+            if terminated or truncated:
+                obs, info = env.reset()
+
+    dataset = TrajectoryDataset(str(tmp_path))
+    assert len(dataset) == 250
+    assert [shard["size"] for shard in dataset.shards] == [100, 100, 50]
+
+    rows = read_all(dataset)
+    for row, (step_obs, action_mask, action, reward, terminated, truncated) in enumerate(transitions):
+        for key, value in step_obs.items():
+            assert np.array_equal(rows[f"obs_{key}"][row], value), key
+        assert np.array_equal(rows["action_mask"][row], action_mask)
+        assert rows["action"][row] == action
+        assert rows["reward"][row] == np.float32(reward)
+        assert rows["terminated"][row] == terminated
+        assert rows["truncated"][row] == truncated
+
+
+def test_add_batch_splits_across_shards(tmp_path):
+    vector_env = VectorCatanEnv(8)
+    rng = np.random.default_rng(0)
+    obs, info = vector_env.reset(seed=0)
+    batches = []
+    writer = TrajectoryWriter(str(tmp_path), get_transition_fields(vector_env.single_observation_space), shard_size=20)
+    for _ in range(6):
+        actions = np.array([rng.choice(np.flatnonzero(mask)) for mask in info["action_mask"]])
+        step_obs = {key: value.copy() for key, value in obs.items()}
+        action_mask = info["action_mask"].copy()
+        obs, reward, terminated, truncated, info = vector_env.step(actions)
+        writer.add_batch(step_obs, action_mask, actions, reward, terminated, truncated)
+        batches.append((step_obs, action_mask, actions))
+    writer.close()
+
+    dataset = TrajectoryDataset(str(tmp_path))
+    assert len(dataset) == 48
+    assert [shard["size"] for shard in dataset.shards] == [20, 20, 8]
+
+    rows = read_all(dataset)
+    for key in batches[0][0]:
+        assert np.array_equal(rows[f"obs_{key}"], np.concatenate([batch[0][key] for batch in batches])), key
+    assert np.array_equal(rows["action_mask"], np.concatenate([batch[1] for batch in batches]))
+    assert np.array_equal(rows["action"], np.concatenate([batch[2] for batch in batches]))
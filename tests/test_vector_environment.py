@@ -0,0 +1,124 @@
+import gymnasium as gym
+import numpy as np
+from Environment.environment import CatanEnvironment
+from Environment.vector_environment import VectorCatanEnv
+from constants import NUM_SETUP_STEPS, END_TURN_ACTION
+
+
+def load_game(env, vector_env, game_index):
+    """
+    Copies one game of the vector environment into the single environment.
+
+    :param env: The CatanEnvironment
+    :param vector_env: The VectorCatanEnv
+    :param game_index: Index of the game in the vector environment
+    :return: None
+    """
+    game = env.game
+    board = game.board
+    board.node_owner[:] = vector_env.node_owner[game_index]
+    board.node_level[:] = vector_env.node_level[game_index]
+    board.edge_owner[:] = vector_env.edge_owner[game_index]
+    board.tile_resource[:] = vector_env.tile_resource[game_index]
+    board.tile_dice[:] = vector_env.tile_dice[game_index]
+    board.resources[:] = vector_env.resources[game_index]
+    board.robber_tile = int(vector_env.robber[game_index])
+
+    setup_step = int(vector_env.setup_step[game_index])
+    game.current_player = int(vector_env.current_player[game_index])
+    game.setup_step = setup_step
+    game.last_settlement = int(vector_env.last_settlement[game_index]) if setup_step % 2 else None
+    game.turn = int(vector_env.turn[game_index])
+    game.has_rolled = setup_step >= NUM_SETUP_STEPS
+    game.robber_pending = False
+
+    # Rebuild the derived board state from the pieces just copied
+    game.load_bytes(game.to_bytes())
+    env.obs_player = game.current_player
+    env._compute_action_mask()
+
+
+def random_actions(action_mask, rng):
+    """
+    :param action_mask: Batched action mask
+    :param rng: numpy Generator
+    :return: A random legal action for every game, building more often than ending the turn
+    """
+    scores = rng.random(action_mask.shape) * action_mask
+    scores[:, END_TURN_ACTION] *= 0.3
+    return scores.argmax(axis=1)
+
+
+def test_matches_single_environment():
+    num_games = 4
+    vector_env = VectorCatanEnv(num_games)
+    env = CatanEnvironment()
+    env.reset(seed=0)
+    obs, info = vector_env.reset(seed=0)
+    rng = np.random.default_rng(0)
+
+    finished = 0
+    for _ in range(1500):
+        # Step each game in the single environment from the vector environment's position
+        actions = random_actions(info["action_mask"], rng)
+        expected = []
+        for game_index in range(num_games):
+            load_game(env, vector_env, game_index)
+            assert np.array_equal(env.action_mask, info["action_mask"][game_index])
+            single_obs = env._get_obs()
+            for key in ("nodes", "edges"):
+                assert np.array_equal(single_obs[key], obs[key][game_index])
+
+            single_obs, reward, terminated, truncated, _ = env.step(actions[game_index])
+            board = env.game.board
+            expected.append(({key: value.copy() for key, value in single_obs.items()}, reward, terminated, truncated,
+                             board.node_owner.copy(), board.node_level.copy(), board.edge_owner.copy(),
+                             # The dice differ, so the resources only match if nobody rolled
+                             board.resources.copy() if env.dice == 0 else None))
+
+        obs, rewards, terminated, truncated, info = vector_env.step(actions)
+        for game_index, (single_obs, reward, single_terminated, single_truncated,
+                         node_owner, node_level, edge_owner, resources) in enumerate(expected):
+            assert rewards[game_index] == reward
+            assert terminated[game_index] == single_terminated
+            assert truncated[game_index] == single_truncated
+            if terminated[game_index] or truncated[game_index]:
+                # The game was reset, and its last observation is in the info
+                finished += 1
+                for key in ("nodes", "edges"):
+                    assert np.array_equal(info["final_obs"][game_index][key], single_obs[key])
+                continue
+
+            assert np.array_equal(vector_env.node_owner[game_index], node_owner)
+            assert np.array_equal(vector_env.node_level[game_index], node_level)
+            assert np.array_equal(vector_env.edge_owner[game_index], edge_owner)
+            if resources is not None:
+                assert np.array_equal(vector_env.resources[game_index], resources)
+    assert finished > 0
+
+
+
+def test_same_step_autoreset():
+    vector_env = VectorCatanEnv(8)
+    assert vector_env.metadata["autoreset_mode"] == gym.vector.AutoresetMode.SAME_STEP
+    obs, info = vector_env.reset(seed=1)
+    rng = np.random.default_rng(1)
+
+    finished = 0
+    while finished < 3:
+        obs, rewards, terminated, truncated, info = vector_env.step(random_actions(info["action_mask"], rng))
+        done = terminated | truncated
+        if not done.any():
+            assert "final_obs" not in info
+            continue
+
+        finished += done.sum()
+        assert np.array_equal(info["_final_obs"], done)
+        assert np.array_equal(info["_final_info"], done)
+        for game_index in np.flatnonzero(terminated):
+            player = info["final_info"]["acting_player"][game_index]
+            assert info["final_info"]["victory_points"][game_index, player] >= 10
+            # The returned observation is the empty board of a new game, the final one is not
+            assert vector_env.setup_step[game_index] == 0
+            assert obs["nodes"][game_index, :, 0].all()
+            assert not info["final_obs"][game_index]["nodes"][:, 0].all()